@@ -9,4 +9,58 @@ __version__ = "0.1.1"
 __author__ = "Viadishwar"
 __email__ = "viekayy.1234@gmail.com"
 
-from pycommentcleaner.core import clean_file, clean_code
\ No newline at end of file
+import sys
+from typing import Any, List
+
+# Public names and the modules they live in. They are imported on first
+# access, so "import pycommentcleaner" (and the command line's --help and
+# --version) does not pay for tokenize, logging or asyncio.
+_LAZY_ATTRIBUTES = {
+    "aclean_files": "pycommentcleaner.aio",
+    "clean_archive": "pycommentcleaner.archive",
+    "CheckResult": "pycommentcleaner.check",
+    "check_files": "pycommentcleaner.check",
+    "has_comments": "pycommentcleaner.check",
+    "ResultCache": "pycommentcleaner.cache",
+    "Cleaner": "pycommentcleaner.cleaner",
+    "CleanResult": "pycommentcleaner.cleaner",
+    "clean_file": "pycommentcleaner.core",
+    "clean_byte_stream": "pycommentcleaner.core",
+    "clean_bytes": "pycommentcleaner.core",
+    "clean_code": "pycommentcleaner.core",
+    "clean_files": "pycommentcleaner.core",
+    "clean_notebook": "pycommentcleaner.notebook",
+    "clean_paths": "pycommentcleaner.core",
+    "clean_stream": "pycommentcleaner.core",
+    "IncrementalCleaner": "pycommentcleaner.incremental",
+    "iter_python_files": "pycommentcleaner.discovery",
+    "minify_code": "pycommentcleaner.minify",
+    "shard_files": "pycommentcleaner.shard",
+}
+
+__all__ = sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import a public name from its module on first access.
+    """
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+# Module __getattr__ needs Python 3.7; import everything up front before that
+if sys.version_info < (3, 7):
+    for _name in _LAZY_ATTRIBUTES:
+        __getattr__(_name)
+    del _name
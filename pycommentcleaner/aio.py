@@ -0,0 +1,285 @@
+"""
+asyncio interface for cleaning many files on slow filesystems.
+
+When most of the time goes to waiting on open/read/write, as on network
+filesystems, aclean_files overlaps the I/O of many files while the
+tokenizing runs in an executor, and yields each result as soon as its file
+is done.
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from pycommentcleaner import hooks
+from pycommentcleaner.core import ENGINES, clean_bytes, cleaned_path
+from pycommentcleaner.defaults import DEFAULT_CONCURRENCY, DEFAULT_MAX_INFLIGHT_BYTES, NOTEBOOK_SUFFIX
+from pycommentcleaner.fileio import AtomicFile, break_link
+from pycommentcleaner.notebook import clean_notebook
+
+logger = logging.getLogger(__name__)
+
+
+class _ByteBudget:
+    """
+    Limit on the number of source bytes held in memory at once.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """
+        Args:
+            limit: Maximum number of bytes in flight
+        """
+        self.limit = limit
+        self.used = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size: int) -> None:
+        """
+        Wait until size bytes fit in the budget and take them.
+
+        A file larger than the whole budget is let through on its own, so it
+        cannot block forever.
+
+        Args:
+            size: Number of bytes to take
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+
+    async def release(self, size: int) -> None:
+        """
+        Give back bytes taken with acquire().
+
+        Args:
+            size: Number of bytes to give back
+        """
+        async with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+
+def _read_bytes(file_path: Path) -> bytes:
+    """
+    Read a source file.
+
+    Args:
+        file_path: File to read
+
+    Returns:
+        The file's content
+    """
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+def _write_bytes(
+    file_path: Path,
+    output_path: Path,
+    content: bytes,
+    fsync: bool,
+    preserve: Optional[os.stat_result],
+) -> None:
+    """
+    Write a cleaned file.
+
+    Args:
+        file_path: Input file
+        output_path: File to write
+        content: Cleaned code
+        fsync: Whether to flush the file to disk
+        preserve: Stat result of the input when replacing it in place; the
+                  file is then replaced atomically, keeping permissions and mtime
+    """
+    if preserve is not None:
+        with AtomicFile(output_path, 'wb', fsync=fsync, preserve=preserve) as atomic_file:
+            atomic_file.file.write(content)
+        return
+
+    break_link(file_path, output_path)
+    with open(output_path, 'wb') as file:
+        file.write(content)
+        if fsync:
+            file.flush()
+            os.fsync(file.fileno())
+
+
+async def _aclean_file(
+    file_path: Path,
+    output_path: Optional[Path],
+    engine: str,
+    in_place: bool,
+    fsync: bool,
+    budget: _ByteBudget,
+    io_executor: Executor,
+    executor: Optional[Executor],
+) -> Tuple[str, bool, str]:
+    """
+    Clean one file for aclean_files.
+
+    Returns:
+        Tuple of (file_path, success, message)
+    """
+    loop = asyncio.get_event_loop()
+    observed = bool(hooks.observers)
+    if observed:
+        hooks.file_start(file_path)
+    success = False
+
+    try:
+        if in_place:
+            output_path = file_path
+        elif output_path is None:
+            output_path = cleaned_path(file_path)
+
+        notebook = file_path.suffix.lower() == NOTEBOOK_SUFFIX
+        if file_path.suffix.lower() != '.py' and not notebook:
+            error_msg = f"Not a Python file: {file_path}"
+            logger.error(error_msg)
+            return str(file_path), False, error_msg
+
+        try:
+            input_stat = await loop.run_in_executor(io_executor, file_path.stat)
+        except FileNotFoundError:
+            error_msg = f"File not found: {file_path}"
+            logger.error(error_msg)
+            return str(file_path), False, error_msg
+
+        size = input_stat.st_size
+        await budget.acquire(size)
+        try:
+            content = await loop.run_in_executor(io_executor, _read_bytes, file_path)
+            transform = clean_notebook if notebook else clean_bytes
+            cleaned_content = await loop.run_in_executor(executor, transform, content, engine)
+
+            # Nothing to write back when cleaning did not change the file
+            if in_place and cleaned_content == content:
+                success = True
+                logger.info("Unchanged: %s", file_path)
+                return str(file_path), True, f"Unchanged: {file_path}"
+
+            preserve = input_stat if in_place else None
+            await loop.run_in_executor(
+                io_executor, _write_bytes, file_path, output_path, cleaned_content, fsync, preserve,
+            )
+        finally:
+            await budget.release(size)
+
+        if observed:
+            hooks.bytes_processed(file_path, len(content), len(cleaned_content))
+
+        success = True
+        logger.info("Successfully cleaned %s -> %s", file_path, output_path)
+        return str(file_path), True, f"Successfully cleaned {file_path} -> {output_path}"
+
+    except Exception as e:
+        error_msg = f"Error cleaning file {file_path}: {str(e)}"
+        logger.error(error_msg)
+        return str(file_path), False, error_msg
+
+    finally:
+        if observed:
+            hooks.file_end(file_path, success)
+
+
+async def aclean_files(
+    file_paths: Iterable[Union[str, Path]],
+    output_dir: Optional[Union[str, Path]] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_inflight_bytes: int = DEFAULT_MAX_INFLIGHT_BYTES,
+    executor: Optional[Executor] = None,
+    engine: str = "splice",
+    in_place: bool = False,
+    fsync: bool = False,
+    roots: Sequence[Union[str, Path]] = (),
+) -> AsyncIterator[Tuple[str, bool, str]]:
+    """
+    Remove comments from multiple Python files, overlapping their I/O.
+
+    Up to concurrency files are in progress at once, and reading pauses
+    while the files in progress hold more than max_inflight_bytes of
+    source. file_paths is consumed lazily as files finish. With output_dir,
+    a file whose output would overwrite the output of an earlier file fails
+    instead.
+
+    Example:
+        async for file_path, success, message in aclean_files(paths):
+            ...
+
+    Args:
+        file_paths: Paths to Python files
+        output_dir: Directory where cleaned files will be saved. If None,
+                    files with '_cleaned' suffix will be created in the same directory.
+        concurrency: Maximum number of files in progress
+        max_inflight_bytes: Maximum source bytes held in memory; a single
+                            larger file is still cleaned, on its own
+        executor: Executor the tokenizing runs in, such as a
+                  ProcessPoolExecutor; None uses the event loop's default
+        engine: Cleaning engine (see clean_code)
+        in_place: Replace the files themselves (see clean_file)
+        fsync: Flush each output file to disk
+        roots: Directories the files were found under, whose layout is kept
+               in output_dir (see core.cleaned_path)
+
+    Yields:
+        Tuples of (file_path, success, message), in the order the files finish
+
+    Raises:
+        ValueError: If an argument is out of range or output_dir is
+            combined with in_place
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine!r} (expected one of {', '.join(ENGINES)})")
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be 1 or greater, got {concurrency}")
+    if max_inflight_bytes < 1:
+        raise ValueError(f"max_inflight_bytes must be 1 or greater, got {max_inflight_bytes}")
+    if output_dir and in_place:
+        raise ValueError("output_dir cannot be used when cleaning in place")
+
+    if output_dir:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    budget = _ByteBudget(max_inflight_bytes)
+    # Blocking file calls get their own threads so they do not queue behind tokenizing
+    io_executor = ThreadPoolExecutor(max_workers=concurrency)
+    file_paths = iter(file_paths)
+    pending = set()
+    targets = {}  # type: Dict[Path, Path]
+
+    try:
+        while True:
+            for file_path in file_paths:
+                file_path = Path(file_path)
+                output_path = None
+                if output_dir:
+                    output_path = cleaned_path(file_path, output_dir, roots)
+                    first = targets.setdefault(output_path, file_path)
+                    if first != file_path:
+                        error_msg = f"Cannot clean {file_path}: {output_path} is the output of {first}"
+                        logger.error(error_msg)
+                        yield str(file_path), False, error_msg
+                        continue
+                    if output_path.parent != output_dir:
+                        output_path.parent.mkdir(parents=True, exist_ok=True)
+                pending.add(asyncio.ensure_future(
+                    _aclean_file(file_path, output_path, engine, in_place, fsync, budget, io_executor, executor)
+                ))
+                if len(pending) >= concurrency:
+                    break
+
+            if not pending:
+                return
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        io_executor.shutdown(wait=False)
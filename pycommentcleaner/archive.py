@@ -0,0 +1,496 @@
+"""
+Archive-to-archive cleaning for wheels, sdists and zipapps.
+
+An archive is read member by member and written to a new archive without
+extracting anything to disk. Python members are cleaned in memory,
+optionally in an executor, while later members are read. Other members of
+zip archives (.whl, .zip, .pyz) are copied compressed as they are; tar
+archives are streamed through, recompressed as a whole. The RECORD of a
+wheel is regenerated for the cleaned members.
+"""
+
+import base64
+import csv
+import hashlib
+import io
+import logging
+import os
+import re
+import struct
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import Executor, Future
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from pycommentcleaner.core import ENGINES, clean_bytes
+from pycommentcleaner.defaults import BACKENDS
+from pycommentcleaner.fileio import AtomicFile
+from pycommentcleaner.minify import minify_bytes
+
+logger = logging.getLogger(__name__)
+
+# Longest first, so ".tar.gz" is not taken for ".gz"
+ARCHIVE_SUFFIXES = (".tar.bz2", ".tar.gz", ".tar.xz", ".tgz", ".tar", ".whl", ".zip", ".pyz")
+
+_ZIP_SUFFIXES = (".whl", ".zip", ".pyz")
+_TAR_COMPRESSION = {".tar": "", ".tar.gz": "gz", ".tgz": "gz", ".tar.bz2": "bz2", ".tar.xz": "xz"}
+
+# Python members read ahead while earlier ones are being cleaned
+_MAX_PENDING = 64
+
+# Copy size for members passed through unchanged
+_COPY_BUFFER = 1024 * 1024
+
+_RECORD_NAME = re.compile(r"[^/]+\.dist-info/RECORD$")
+
+# Zip local header flag: CRC and sizes follow the data instead of the header
+_DATA_DESCRIPTOR = 0x08
+
+_ZIP64_EXTRA_ID = 0x0001
+
+
+def archive_suffix(path: Union[str, Path]) -> Optional[str]:
+    """
+    Return the archive suffix of a path.
+
+    Args:
+        path: File path
+
+    Returns:
+        One of ARCHIVE_SUFFIXES, or None if the path is not an archive
+    """
+    name = str(path).lower()
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+def archive_output_path(path: Union[str, Path], output_dir: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Return where the cleaned copy of an archive is written.
+
+    Args:
+        path: Archive path
+        output_dir: Directory for the copy. If None, the copy gets a
+                    '_cleaned' suffix next to the archive.
+
+    Returns:
+        Path of the cleaned archive; in output_dir it keeps its name, so a
+        wheel keeps a valid wheel file name
+    """
+    path = Path(path)
+    if output_dir:
+        return Path(output_dir) / path.name
+    # Slice rather than use the lowered suffix, to keep the name's case
+    split = len(path.name) - len(archive_suffix(path) or path.suffix)
+    return path.parent / f"{path.name[:split]}_cleaned{path.name[split:]}"
+
+
+def _submit(executor: Optional[Executor], data: bytes, transform: Callable[[bytes], bytes]) -> Future:
+    """
+    Start cleaning a Python member.
+
+    Args:
+        executor: Executor to clean in, or None to clean right away
+        data: Member content
+        transform: Picklable function returning the cleaned content
+
+    Returns:
+        Future of the cleaned content
+    """
+    if executor is not None:
+        return executor.submit(transform, data)
+    future = Future()  # type: Future
+    future.set_result(transform(data))
+    return future
+
+
+def _record_hash(data: bytes) -> str:
+    """
+    Hash a member for a wheel RECORD.
+
+    Args:
+        data: Member content
+
+    Returns:
+        "sha256=" followed by the urlsafe base64 digest without padding
+    """
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=")
+    return f"sha256={digest.decode('ascii')}"
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    """
+    Remove the zip64 field from a zip extra field; zipfile writes a new one
+    when the sizes need it.
+
+    Args:
+        extra: Extra field of a member
+
+    Returns:
+        The extra field without its zip64 record
+    """
+    kept = []
+    position = 0
+    while position + 4 <= len(extra):
+        field_id, size = struct.unpack("<HH", extra[position:position + 4])
+        if field_id != _ZIP64_EXTRA_ID:
+            kept.append(extra[position:position + 4 + size])
+        position += 4 + size
+    return b"".join(kept)
+
+
+def _copy_zip_member(source_file: BinaryIO, info: zipfile.ZipInfo, target_zip: zipfile.ZipFile) -> None:
+    """
+    Copy a member's compressed data into another zip without recompressing.
+
+    zipfile has no public way to do this, so the local header is written
+    the way ZipFile.open(..., 'w') writes it, and the member is recorded
+    for the central directory the same way.
+
+    Args:
+        source_file: Open source archive
+        info: Member to copy
+        target_zip: Zip being written
+
+    Raises:
+        zipfile.BadZipFile: If the member's local header is damaged
+    """
+    source_file.seek(info.header_offset)
+    header = source_file.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    source_file.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    copied = zipfile.ZipInfo(info.filename, info.date_time)
+    for attribute in ("compress_type", "comment", "create_system", "create_version", "extract_version",
+                      "internal_attr", "external_attr", "CRC", "compress_size", "file_size"):
+        setattr(copied, attribute, getattr(info, attribute))
+    # The sizes are known now, so they go in the header instead of a descriptor
+    copied.flag_bits = info.flag_bits & ~_DATA_DESCRIPTOR
+    copied.extra = _strip_zip64_extra(info.extra)
+
+    target = target_zip.fp
+    target.seek(target_zip.start_dir)
+    copied.header_offset = target.tell()
+    zip64 = max(copied.file_size, copied.compress_size) > zipfile.ZIP64_LIMIT
+    target.write(copied.FileHeader(zip64))
+    remaining = info.compress_size
+    while remaining:
+        chunk = source_file.read(min(remaining, _COPY_BUFFER))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+        target.write(chunk)
+        remaining -= len(chunk)
+
+    target_zip.start_dir = target.tell()
+    target_zip.filelist.append(copied)
+    target_zip.NameToInfo[copied.filename] = copied
+
+
+def _read_record(source_zip: zipfile.ZipFile, record_name: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Read the hashes and sizes listed in a wheel RECORD.
+
+    Args:
+        source_zip: Wheel being read
+        record_name: Name of its RECORD member
+
+    Returns:
+        Mapping of member name to (hash, size)
+    """
+    text = source_zip.read(record_name).decode("utf-8")
+    return {row[0]: (row[1], row[2]) for row in csv.reader(io.StringIO(text)) if len(row) >= 3}
+
+
+def _clean_zip(source: Path, output_file: BinaryIO, transform: Callable[[bytes], bytes],
+               executor: Optional[Executor]) -> Tuple[int, int]:
+    """
+    Write a cleaned copy of a zip archive.
+
+    Args:
+        source: Zip archive to read
+        output_file: File the new archive is written to
+        transform: Function returning the cleaned content of a member
+        executor: Executor to clean Python members in, or None
+
+    Returns:
+        Tuple of (cleaned members, members copied unchanged)
+    """
+    with open(source, 'rb') as source_file, zipfile.ZipFile(source_file) as source_zip:
+        infos = source_zip.infolist()
+        if any(info.flag_bits & 0x01 for info in infos):
+            raise ValueError("Encrypted archives are not supported")
+
+        record_name = None
+        old_record = {}  # type: Dict[str, Tuple[str, str]]
+        if archive_suffix(source) == ".whl":
+            record_name = next((info.filename for info in infos if _RECORD_NAME.match(info.filename)), None)
+            if record_name is not None:
+                old_record = _read_record(source_zip, record_name)
+
+        # Keep what comes before the zip data, such as a zipapp's shebang line
+        prefix_size = min((info.header_offset for info in infos), default=source_zip.start_dir)
+        source_file.seek(0)
+        output_file.write(source_file.read(prefix_size))
+
+        new_record = {}  # type: Dict[str, Tuple[str, str]]
+        record_info = None
+        cleaned_count = 0
+        copied_count = 0
+
+        with zipfile.ZipFile(output_file, 'w') as target_zip:
+            pending = deque()  # type: Deque[Tuple[zipfile.ZipInfo, Optional[bytes], Optional[Future]]]
+
+            def write_next() -> None:
+                nonlocal cleaned_count, copied_count
+                info, data, future = pending.popleft()
+                cleaned = future.result() if future is not None else None
+                if cleaned is None or cleaned == data:
+                    # Unchanged members keep their compressed bytes
+                    _copy_zip_member(source_file, info, target_zip)
+                    copied_count += 1
+                    return
+                target_info = zipfile.ZipInfo(info.filename, info.date_time)
+                target_info.compress_type = info.compress_type
+                target_info.external_attr = info.external_attr
+                target_info.create_system = info.create_system
+                target_zip.writestr(target_info, cleaned)
+                new_record[info.filename] = (_record_hash(cleaned), str(len(cleaned)))
+                cleaned_count += 1
+
+            for info in infos:
+                if info.filename == record_name:
+                    record_info = info
+                    continue
+                if record_name and info.filename.startswith(record_name + "."):
+                    # RECORD.jws and RECORD.p7s sign the RECORD being replaced
+                    logger.warning("Dropping signature %s of %s", info.filename, source)
+                    continue
+                if not info.is_dir() and info.filename.lower().endswith(".py"):
+                    data = source_zip.read(info)
+                    pending.append((info, data, _submit(executor, data, transform)))
+                    if len(pending) > _MAX_PENDING:
+                        write_next()
+                else:
+                    pending.append((info, None, None))
+                    # Copy straight away unless it has to wait for earlier members
+                    while pending and (pending[0][2] is None or pending[0][2].done()):
+                        write_next()
+            while pending:
+                write_next()
+
+            if record_info is not None:
+                target_zip.writestr(record_info, _record_text(target_zip, source_zip, record_info.filename,
+                                                              old_record, new_record))
+
+    return cleaned_count, copied_count
+
+
+def _record_text(target_zip: zipfile.ZipFile, source_zip: zipfile.ZipFile, record_name: str,
+                 old_record: Dict[str, Tuple[str, str]], new_record: Dict[str, Tuple[str, str]]) -> bytes:
+    """
+    Build the RECORD of a cleaned wheel.
+
+    Args:
+        target_zip: Wheel being written, with every member but RECORD
+        source_zip: Original wheel
+        record_name: Name of the RECORD member
+        old_record: Result of _read_record() for the original wheel
+        new_record: Hashes and sizes of the cleaned members
+
+    Returns:
+        Content of the new RECORD
+    """
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    for info in target_zip.infolist():
+        if info.is_dir():
+            continue
+        name = info.filename
+        entry = new_record.get(name) or old_record.get(name)
+        if entry is None or not entry[0]:
+            data = source_zip.read(name)
+            entry = (_record_hash(data), str(len(data)))
+        writer.writerow((name,) + entry)
+    writer.writerow((record_name, "", ""))
+    return output.getvalue().encode("utf-8")
+
+
+def _clean_tar(source: Path, output_file: BinaryIO, destination: Path, transform: Callable[[bytes], bytes],
+               executor: Optional[Executor]) -> Tuple[int, int]:
+    """
+    Write a cleaned copy of a tar archive, reading and writing it as streams.
+
+    Args:
+        source: Tar archive to read
+        output_file: File the new archive is written to
+        destination: Final path of the new archive, for the gzip header
+        transform: Function returning the cleaned content of a member
+        executor: Executor to clean Python members in, or None
+
+    Returns:
+        Tuple of (cleaned members, members copied unchanged)
+    """
+    compression = _TAR_COMPRESSION[archive_suffix(destination) or ".tar"]
+    cleaned_count = 0
+    copied_count = 0
+
+    with tarfile.open(str(source), "r|*") as source_tar, \
+            tarfile.open(str(destination), f"w|{compression}", fileobj=output_file,
+                         format=tarfile.PAX_FORMAT) as target_tar:
+        pending = deque()  # type: Deque[Tuple[tarfile.TarInfo, Future]]
+
+        def write_next() -> None:
+            nonlocal cleaned_count
+            member, future = pending.popleft()
+            cleaned = future.result()
+            member.size = len(cleaned)
+            target_tar.addfile(member, io.BytesIO(cleaned))
+            cleaned_count += 1
+
+        for member in source_tar:
+            if member.isreg() and member.name.lower().endswith(".py"):
+                pending.append((member, _submit(executor, source_tar.extractfile(member).read(), transform)))
+                if len(pending) > _MAX_PENDING:
+                    write_next()
+                continue
+
+            # The stream cannot go back, so earlier members are written first
+            while pending:
+                write_next()
+            target_tar.addfile(member, source_tar.extractfile(member) if member.isreg() else None)
+            copied_count += 1
+        while pending:
+            write_next()
+
+    return cleaned_count, copied_count
+
+
+def clean_archive(
+    source: Union[str, Path],
+    destination: Optional[Union[str, Path]] = None,
+    engine: str = "splice",
+    executor: Optional[Executor] = None,
+    minify: bool = False,
+) -> Tuple[bool, str]:
+    """
+    Write a copy of an archive with comments removed from its Python members.
+
+    The destination is replaced atomically, so it may be the source itself.
+
+    Args:
+        source: .whl, .zip, .pyz or (compressed) .tar archive
+        destination: Path of the new archive. If None, a copy with
+                     '_cleaned' suffix is created next to the source.
+        engine: Cleaning engine (see clean_code)
+        executor: Executor to clean Python members in, such as a
+                  ProcessPoolExecutor; None cleans them in this thread
+        minify: Also remove docstrings and blank lines (see minify_code)
+
+    Returns:
+        Tuple of (success, message)
+
+    Raises:
+        ValueError: If the engine is not one of ENGINES
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine!r} (expected one of {', '.join(ENGINES)})")
+
+    source = Path(source)
+    destination = Path(destination) if destination else archive_output_path(source)
+    suffix = archive_suffix(source)
+    if suffix is None:
+        error_msg = f"Not an archive: {source}"
+        logger.error(error_msg)
+        return False, error_msg
+
+    transform = minify_bytes if minify else partial(clean_bytes, engine=engine)  # type: Callable[[bytes], bytes]
+
+    try:
+        # Keep the permissions when replacing the source
+        preserve = os.stat(str(source)) if os.path.abspath(str(source)) == os.path.abspath(str(destination)) else None
+        with AtomicFile(destination, 'wb', preserve=preserve) as atomic_file:
+            if suffix in _ZIP_SUFFIXES:
+                cleaned, copied = _clean_zip(source, atomic_file.file, transform, executor)
+            else:
+                cleaned, copied = _clean_tar(source, atomic_file.file, destination, transform, executor)
+    except FileNotFoundError:
+        error_msg = f"File not found: {source}"
+        logger.error(error_msg)
+        return False, error_msg
+    except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+        error_msg = f"Error cleaning archive {source}: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+    logger.info("Cleaned %d members and copied %d of %s -> %s", cleaned, copied, source, destination)
+    verb = "minified" if minify else "cleaned"
+    return True, f"Successfully {verb} {cleaned} Python files in {source} -> {destination}"
+
+
+def clean_archives(
+    archive_paths: Iterable[Union[str, Path]],
+    output_dir: Optional[Union[str, Path]] = None,
+    jobs: Optional[int] = None,
+    backend: str = "process",
+    engine: str = "splice",
+    in_place: bool = False,
+    minify: bool = False,
+) -> List[Tuple[str, bool, str]]:
+    """
+    Clean several archives, sharing one worker pool between them.
+
+    Args:
+        archive_paths: Archives to clean
+        output_dir: Directory where cleaned archives are saved under their
+                    own names. If None, copies with '_cleaned' suffix are
+                    created next to each archive.
+        jobs: Number of parallel workers. None or 1 cleans the members one
+              at a time, 0 uses one worker per CPU.
+        backend: "process", "thread" or "serial"; ignored when running serially
+        engine: Cleaning engine (see clean_code)
+        in_place: Replace the archives themselves
+        minify: Also remove docstrings and blank lines (see minify_code)
+
+    Returns:
+        List of tuples with (archive_path, success, message) for each archive
+
+    Raises:
+        ValueError: If the backend is not one of BACKENDS, jobs is negative,
+            or output_dir is combined with in_place
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend!r} (expected one of {', '.join(BACKENDS)})")
+    if jobs is not None and jobs < 0:
+        raise ValueError(f"jobs must be 0 or greater, got {jobs}")
+    if output_dir and in_place:
+        raise ValueError("output_dir cannot be used when cleaning in place")
+
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    executor = None  # type: Optional[Executor]
+    if jobs != 1 and jobs is not None and backend != "serial":
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        executor_class = ProcessPoolExecutor if backend == "process" else ThreadPoolExecutor
+        executor = executor_class(max_workers=jobs or os.cpu_count() or 1)
+
+    results = []
+    try:
+        for archive_path in archive_paths:
+            destination = archive_path if in_place else archive_output_path(archive_path, output_dir)
+            success, message = clean_archive(
+                archive_path, destination, engine=engine, executor=executor, minify=minify
+            )
+            results.append((str(archive_path), success, message))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
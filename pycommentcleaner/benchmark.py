@@ -0,0 +1,420 @@
+"""
+Throughput benchmarks for pycommentcleaner.
+
+This module measures MB/s, files/s and peak RSS of clean_code, clean_file
+and clean_files over a synthetic corpus with a chosen size and comment
+density, or over the installed CPython standard library. It checks that
+every cleaned output parses to the same AST as its input, can save the
+results as a JSON baseline, and fails when throughput drops more than a
+threshold below a saved baseline.
+
+Run it with:
+
+    python -m pycommentcleaner.benchmark --corpus synthetic --save-baseline bench.json
+    python -m pycommentcleaner.benchmark --corpus synthetic --baseline bench.json
+"""
+
+import argparse
+import ast
+import json
+import multiprocessing
+import random
+import sys
+import sysconfig
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from pycommentcleaner.core import ENGINES, clean_code, clean_file, clean_files
+from pycommentcleaner.discovery import DEFAULT_EXCLUDE, iter_python_files
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+DEFAULT_THRESHOLD = 0.2
+
+# Directories of the standard library that hold deliberately broken or
+# third-party code
+STDLIB_EXCLUDE = DEFAULT_EXCLUDE + ("test", "tests", "idle_test", "site-packages", "dist-packages")
+
+_COMMENTS = (
+    "# TODO: revisit this",
+    "# noqa: E501",
+    "# type: ignore",
+    "# Compute the running total",
+    "# pragma: no cover",
+    "#: documented attribute",
+)
+
+_STATEMENTS = (
+    "total = total + value * {n}",
+    "name = \"value # {n} is not a comment\"",
+    "items = [item for item in range({n}) if item % 2]",
+    "mapping = {{'key': {n}, 'hash': '#'}}",
+    "result = func(total, name,\n{indent}    keyword={n})",
+    "text = f\"{{total}} items # {n}\"",
+)
+
+
+def generate_source(lines: int, comment_density: float, rng: random.Random) -> str:
+    """
+    Generate a synthetic Python module.
+
+    Args:
+        lines: Approximate number of lines
+        comment_density: Fraction of statements that carry a comment, with
+                         about half of them on a line of their own
+        rng: Random number generator
+
+    Returns:
+        Python source code
+    """
+    out = ['"""Synthetic module. # not a comment"""', "", "import os  # imports", ""]
+    count = 0
+    while len(out) < lines:
+        out.append(f"class Model{count}:")
+        out.append(f'    """Model {count}.\n\n    # kept in the docstring\n    """')
+        out.append("")
+        out.append(f"    def method_{count}(self, total, value):")
+        for n in range(rng.randint(3, 12)):
+            statement = rng.choice(_STATEMENTS).format(n=n, indent="        ")
+            if rng.random() < comment_density:
+                comment = rng.choice(_COMMENTS)
+                if rng.random() < 0.5:
+                    out.append(f"        {comment}")
+                    out.append(f"        {statement}")
+                else:
+                    out.append(f"        {statement}  {comment}")
+            else:
+                out.append(f"        {statement}")
+        out.append("        return total")
+        out.append("")
+        count += 1
+    return "\n".join(out) + "\n"
+
+
+def generate_corpus(
+    directory: Path,
+    files: int = 200,
+    lines_per_file: int = 300,
+    comment_density: float = 0.3,
+    seed: int = 0,
+) -> List[Path]:
+    """
+    Write a synthetic corpus of Python files.
+
+    Args:
+        directory: Directory to write the files into
+        files: Number of files
+        lines_per_file: Approximate number of lines per file
+        comment_density: Fraction of statements that carry a comment
+        seed: Seed for the random number generator, so corpora are reproducible
+
+    Returns:
+        Paths of the generated files
+    """
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index in range(files):
+        path = directory / f"module_{index:05d}.py"
+        # Vary sizes so the corpus is not perfectly uniform
+        lines = max(10, int(lines_per_file * rng.uniform(0.25, 1.75)))
+        path.write_text(generate_source(lines, comment_density, rng), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def stdlib_corpus(limit: Optional[int] = None) -> List[Path]:
+    """
+    Collect the Python files of the running interpreter's standard library.
+
+    Args:
+        limit: Maximum number of files
+
+    Returns:
+        Paths of standard library modules that decode as UTF-8
+    """
+    paths = []
+    for path in iter_python_files([sysconfig.get_paths()["stdlib"]], exclude=STDLIB_EXCLUDE, use_gitignore=False):
+        try:
+            path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        paths.append(path)
+        if limit is not None and len(paths) >= limit:
+            break
+    return paths
+
+
+def _parse(source: str) -> Optional[str]:
+    """
+    Dump the AST of source code.
+
+    Args:
+        source: Python source code
+
+    Returns:
+        The AST dump, or None if the source does not parse
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return ast.dump(ast.parse(source))
+    except (SyntaxError, ValueError):
+        return None
+
+
+def verify(paths: Sequence[Path], engine: str = "splice") -> List[str]:
+    """
+    Check that cleaning leaves the AST of every file unchanged.
+
+    Files that do not parse before cleaning are skipped.
+
+    Args:
+        paths: Files to check
+        engine: Cleaning engine
+
+    Returns:
+        Paths of the files whose cleaned AST differs from the original
+    """
+    failures = []
+    for path in paths:
+        source = path.read_text(encoding="utf-8")
+        expected = _parse(source)
+        if expected is not None and _parse(clean_code(source, engine=engine)) != expected:
+            failures.append(str(path))
+    return failures
+
+
+def _peak_rss_kb() -> Optional[int]:
+    """
+    Return the peak resident set size of the current process.
+
+    Returns:
+        Peak RSS in KiB, or None where the resource module is unavailable
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _measure(target: str, paths: List[Path], engine: str, jobs: int, repeat: int) -> Dict[str, Any]:
+    """
+    Time one benchmark target, keeping the best of several runs.
+
+    Args:
+        target: "clean_code", "clean_file" or "clean_files"
+        paths: Files of the corpus
+        engine: Cleaning engine
+        jobs: Number of workers for clean_files
+        repeat: Number of runs
+
+    Returns:
+        Dictionary with seconds, bytes, files and peak_rss_kb
+    """
+    sources = [path.read_text(encoding="utf-8") for path in paths] if target == "clean_code" else None
+    total_bytes = sum(path.stat().st_size for path in paths)
+
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as output_dir:
+            started = perf_counter()
+            if target == "clean_code":
+                for source in sources:
+                    clean_code(source, engine=engine)
+            elif target == "clean_file":
+                for index, path in enumerate(paths):
+                    clean_file(path, Path(output_dir) / f"{index}.py", engine=engine)
+            else:
+                clean_files(paths, output_dir=output_dir, jobs=jobs, engine=engine)
+            elapsed = perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {"seconds": best, "bytes": total_bytes, "files": len(paths), "peak_rss_kb": _peak_rss_kb()}
+
+
+def run_benchmarks(
+    paths: List[Path],
+    engines: Sequence[str] = ENGINES,
+    jobs: int = 0,
+    repeat: int = 3,
+    isolate: bool = True,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run every benchmark target over a corpus.
+
+    Args:
+        paths: Files of the corpus
+        engines: Engines to benchmark
+        jobs: Number of workers for clean_files (0 uses one per CPU)
+        repeat: Number of runs per target; the fastest is kept
+        isolate: Run each target in a fresh process so peak RSS is per target
+
+    Returns:
+        Mapping of benchmark name to seconds, bytes, files, mb_per_s,
+        files_per_s and peak_rss_kb
+    """
+    results = {}
+    for engine in engines:
+        for target in ("clean_code", "clean_file", "clean_files"):
+            name = f"{target}[{engine}]"
+            if isolate:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    measurement = executor.submit(_measure, target, paths, engine, jobs, repeat).result()
+            else:
+                measurement = _measure(target, paths, engine, jobs, repeat)
+
+            seconds = max(measurement["seconds"], 1e-9)
+            measurement["mb_per_s"] = measurement["bytes"] / seconds / (1024 * 1024)
+            measurement["files_per_s"] = measurement["files"] / seconds
+            results[name] = measurement
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[str]:
+    """
+    Find benchmarks whose throughput dropped below a baseline.
+
+    Args:
+        results: Result of run_benchmarks()
+        baseline: Earlier result of run_benchmarks()
+        threshold: Allowed relative drop in MB/s, e.g. 0.2 for 20%
+
+    Returns:
+        One message per regressed benchmark
+    """
+    regressions = []
+    for name, expected in sorted(baseline.items()):
+        actual = results.get(name)
+        if actual is None:
+            continue
+        floor = expected["mb_per_s"] * (1 - threshold)
+        if actual["mb_per_s"] < floor:
+            regressions.append(
+                f"{name}: {actual['mb_per_s']:.2f} MB/s is below {floor:.2f} MB/s "
+                f"(baseline {expected['mb_per_s']:.2f} MB/s, threshold {threshold:.0%})"
+            )
+    return regressions
+
+
+def format_results(results: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Format benchmark results as a table.
+
+    Args:
+        results: Result of run_benchmarks()
+
+    Returns:
+        Table with one row per benchmark
+    """
+    lines = [f"{'benchmark':<28} {'MB/s':>9} {'files/s':>10} {'peak RSS MiB':>13}"]
+    for name, result in results.items():
+        rss = result["peak_rss_kb"]
+        rss_text = f"{rss / 1024:.1f}" if rss is not None else "n/a"
+        lines.append(f"{name:<28} {result['mb_per_s']:>9.2f} {result['files_per_s']:>10.1f} {rss_text:>13}")
+    return "\n".join(lines)
+
+
+def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+
+    Args:
+        args: Command-line arguments (uses sys.argv if None)
+
+    Returns:
+        Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Benchmark pycommentcleaner throughput.")
+    parser.add_argument("--corpus", choices=("synthetic", "stdlib"), default="synthetic",
+                        help="Corpus to benchmark (default: synthetic)")
+    parser.add_argument("--files", type=int, default=200,
+                        help="Number of synthetic files, or maximum number of stdlib files (default: 200)")
+    parser.add_argument("--lines", type=int, default=300,
+                        help="Approximate lines per synthetic file (default: 300)")
+    parser.add_argument("--density", type=float, default=0.3,
+                        help="Fraction of synthetic statements with a comment (default: 0.3)")
+    parser.add_argument("--engine", action="append", choices=ENGINES,
+                        help="Engine to benchmark (default: all, can be repeated)")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="Workers for the clean_files benchmark (default: one per CPU)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per benchmark; the fastest is kept (default: 3)")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="Run in this process (faster, but peak RSS is shared)")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="Skip the AST equivalence check")
+    parser.add_argument("--save-baseline", metavar="FILE",
+                        help="Write the results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="Fail if throughput drops below the results in FILE")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative drop in MB/s (default: %(default)s)")
+    return parser.parse_args(args)
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    """
+    Main entry point for the benchmark command.
+
+    Args:
+        args: Command-line arguments (uses sys.argv if None)
+
+    Returns:
+        Exit code (0 for success, 1 for a failed check or regression)
+    """
+    parsed_args = parse_args(args)
+    engines = parsed_args.engine or list(ENGINES)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if parsed_args.corpus == "synthetic":
+            paths = generate_corpus(Path(temp_dir), parsed_args.files, parsed_args.lines, parsed_args.density)
+        else:
+            paths = stdlib_corpus(parsed_args.files)
+
+        size = sum(path.stat().st_size for path in paths)
+        print(f"Corpus: {parsed_args.corpus}, {len(paths)} files, {size / (1024 * 1024):.2f} MiB")
+
+        exit_code = 0
+        if not parsed_args.no_verify:
+            for engine in engines:
+                failures = verify(paths, engine)
+                for failure in failures:
+                    print(f"AST mismatch after cleaning with {engine}: {failure}", file=sys.stderr)
+                if failures:
+                    exit_code = 1
+
+        results = run_benchmarks(paths, engines, parsed_args.jobs, parsed_args.repeat, not parsed_args.no_isolate)
+
+    print(format_results(results))
+
+    if parsed_args.save_baseline:
+        with open(parsed_args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+    if parsed_args.baseline:
+        with open(parsed_args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        for regression in compare(results, baseline, parsed_args.threshold):
+            print(f"Regression: {regression}", file=sys.stderr)
+            exit_code = 1
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Bytecode emission: compile cleaned source straight to a .pyc file.
+
+A deploy that runs compileall after cleaning reads and parses every file a
+second time. write_pyc compiles the cleaned source while it is still in
+memory and writes the .pyc that the import system looks for, in the
+__pycache__ layout, with a PEP 552 header:
+
+- "timestamp": valid while the source's mtime and size are unchanged
+- "checked-hash": valid while the source's hash matches, checked on import
+- "unchecked-hash": never checked against the source on import
+
+The hash modes need Python 3.7 or later.
+"""
+
+import importlib.util
+import marshal
+import os
+import sys
+from pathlib import Path
+from typing import Optional, Union
+
+from pycommentcleaner.defaults import PYC_INVALIDATION_MODES
+from pycommentcleaner.fileio import atomic_write
+
+# PEP 552 flags word: bit 0 marks a hash-based pyc, bit 1 asks for the check
+_FLAGS = {"timestamp": 0, "checked-hash": 0b11, "unchecked-hash": 0b01}
+
+
+def pyc_path(source_path: Union[str, Path], optimize: int = -1) -> Path:
+    """
+    Return where the import system looks for the .pyc of a source file.
+
+    Args:
+        source_path: Path of the .py file
+        optimize: Optimization level (0, 1 or 2), or -1 for the level of
+                  the running interpreter
+
+    Returns:
+        Path of the .pyc in the __pycache__ directory next to the source
+    """
+    if optimize < 0:
+        return Path(importlib.util.cache_from_source(str(source_path)))
+    return Path(importlib.util.cache_from_source(str(source_path), optimization=optimize or ""))
+
+
+def _header(
+    source: bytes,
+    source_path: Union[str, Path],
+    invalidation: str,
+    source_stat: Optional[os.stat_result],
+) -> bytes:
+    """
+    Build the header of a .pyc.
+
+    Args:
+        source: Source as it is saved, for the hash modes
+        source_path: Path of the saved source
+        invalidation: One of PYC_INVALIDATION_MODES
+        source_stat: Stat result of the saved source for the "timestamp"
+                     mode; read from source_path if None
+
+    Returns:
+        The PEP 552 header
+    """
+    header = bytearray(importlib.util.MAGIC_NUMBER)
+    # Python 3.6 headers have no flags word
+    if sys.version_info >= (3, 7):
+        header += _FLAGS[invalidation].to_bytes(4, "little")
+    if invalidation == "timestamp":
+        if source_stat is None:
+            source_stat = os.stat(str(source_path))
+        header += (int(source_stat.st_mtime) & 0xFFFFFFFF).to_bytes(4, "little")
+        header += (source_stat.st_size & 0xFFFFFFFF).to_bytes(4, "little")
+    else:
+        header += importlib.util.source_hash(source)
+    return bytes(header)
+
+
+def pyc_is_current(
+    source_path: Union[str, Path],
+    invalidation: str = "timestamp",
+    optimize: int = -1,
+    source_stat: Optional[os.stat_result] = None,
+) -> bool:
+    """
+    Check whether a source file's .pyc is the one write_pyc would write.
+
+    Only the header is compared, so a .pyc written for the saved source
+    with the same options is current.
+
+    Args:
+        source_path: Path of the saved source
+        invalidation: One of PYC_INVALIDATION_MODES
+        optimize: Optimization level (0, 1 or 2), or -1 for the level of
+                  the running interpreter
+        source_stat: Stat result of the saved source for the "timestamp"
+                     mode; read from source_path if None
+
+    Returns:
+        True if the .pyc exists and matches the source
+    """
+    if invalidation not in PYC_INVALIDATION_MODES or (invalidation != "timestamp" and sys.version_info < (3, 7)):
+        return False
+    try:
+        source = b""
+        if invalidation != "timestamp":
+            with open(str(source_path), "rb") as file:
+                source = file.read()
+        expected = _header(source, source_path, invalidation, source_stat)
+        with open(str(pyc_path(source_path, optimize)), "rb") as file:
+            return file.read(len(expected)) == expected
+    except OSError:
+        return False
+
+
+def write_pyc(
+    source: bytes,
+    source_path: Union[str, Path],
+    invalidation: str = "timestamp",
+    optimize: int = -1,
+    source_stat: Optional[os.stat_result] = None,
+) -> Path:
+    """
+    Compile Python source and write its .pyc, as py_compile would.
+
+    Args:
+        source: Source as it is saved at source_path
+        source_path: Path of the saved source, used for the .pyc location
+                     and in tracebacks
+        invalidation: One of PYC_INVALIDATION_MODES
+        optimize: Optimization level (0, 1 or 2), or -1 for the level of
+                  the running interpreter
+        source_stat: Stat result of the saved source for the "timestamp"
+                     mode; read from source_path if None
+
+    Returns:
+        Path of the written .pyc
+
+    Raises:
+        ValueError: If the invalidation mode is unknown or not supported by
+            this Python
+        SyntaxError: If the source does not compile
+    """
+    if invalidation not in PYC_INVALIDATION_MODES:
+        raise ValueError(
+            f"Unknown invalidation mode: {invalidation!r} (expected one of {', '.join(PYC_INVALIDATION_MODES)})"
+        )
+    if invalidation != "timestamp" and sys.version_info < (3, 7):
+        raise ValueError(f"The {invalidation} invalidation mode needs Python 3.7 or later")
+
+    code = compile(source, str(source_path), "exec", dont_inherit=True, optimize=optimize)
+
+    header = _header(source, source_path, invalidation, source_stat)
+
+    target = pyc_path(source_path, optimize)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(target, header + marshal.dumps(code))
+    return target
@@ -0,0 +1,420 @@
+"""
+Persistent cache of cleaning results.
+
+The cache lets repeated runs skip files whose cleaned output is already
+current. Each input file has a small entry recording its stat signature
+(mtime, size, inode), the hash of its content and the stat signature of
+the output written for it. Cleaned outputs are also stored by content
+hash, so identical sources are only tokenized once.
+
+All writes go through a temporary file and a rename, and unreadable or
+vanished files are treated as cache misses, so several processes can use
+the same cache directory at once. MemoryCache keeps the same records in
+memory instead, for long-running processes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from pycommentcleaner import __version__
+from pycommentcleaner.defaults import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from pycommentcleaner.fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Files modified this close to when their entry was written may change again
+# within the same timestamp tick, so their stat signature is not trusted
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+def _stat_signature(stat: os.stat_result) -> Tuple[int, int, int]:
+    """
+    Return the parts of a stat result that change when a file is rewritten.
+
+    Args:
+        stat: Result of os.stat
+
+    Returns:
+        Tuple of (mtime_ns, size, inode)
+    """
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class ResultCache:
+    """
+    On-disk cache of cleaned outputs shared between runs and processes.
+    """
+
+    def __init__(self, directory: Union[str, Path] = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Create a cache in a directory.
+
+        Args:
+            directory: Directory holding the cache, created on first write
+            max_bytes: Size the cache is trimmed to by prune()
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def __repr__(self) -> str:
+        return f"ResultCache({str(self.directory)!r}, max_bytes={self.max_bytes})"
+
+    @staticmethod
+    def _hash(*parts: Union[str, bytes]) -> str:
+        """
+        Hash strings and bytes into a hex digest.
+
+        Args:
+            parts: Values to hash, in order
+
+        Returns:
+            Hex digest of the values
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        for part in parts:
+            digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def content_digest(self, data: bytes) -> str:
+        """
+        Hash the content of a source file.
+
+        Args:
+            data: Source file content
+
+        Returns:
+            Hex digest of the content
+        """
+        return self._hash(data)
+
+    def options_key(self, options: Dict[str, Any]) -> str:
+        """
+        Hash the cleaning options together with the package version.
+
+        Args:
+            options: Options that affect the cleaned output
+
+        Returns:
+            Hex digest identifying the options
+        """
+        return self._hash(__version__, json.dumps(options, sort_keys=True, default=str))
+
+    def _path(self, kind: str, key: str) -> Path:
+        """
+        Return the path of a cache file, fanned out over subdirectories.
+
+        Args:
+            kind: "entries" or "objects"
+            key: Hex key of the cache file
+
+        Returns:
+            Path of the cache file
+        """
+        return self.directory / kind / key[:2] / key
+
+    def _write(self, path: Path, data: bytes) -> None:
+        """
+        Atomically write a cache file, creating its directory if needed.
+
+        Args:
+            path: Cache file path
+            data: Content to write
+        """
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, data)
+        except OSError as e:
+            logger.warning(f"Cannot write cache file {path}: {e}")
+
+    def entry_key(self, file_path: Union[str, Path], output_path: Union[str, Path], options_key: str) -> str:
+        """
+        Return the key of the entry for an input and output pair.
+
+        Args:
+            file_path: Input file
+            output_path: Output file
+            options_key: Result of options_key()
+
+        Returns:
+            Hex key of the entry
+        """
+        return self._hash(os.path.abspath(str(file_path)), os.path.abspath(str(output_path)), options_key)
+
+    def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Load an entry.
+
+        Args:
+            key: Result of entry_key()
+
+        Returns:
+            The entry, or None if it is missing or unreadable
+        """
+        path = self._path("entries", key)
+        try:
+            with open(path, "rb") as file:
+                entry = json.loads(file.read().decode("utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) else None
+
+    def put_entry(self, key: str, input_stat: os.stat_result, digest: str, output_stat: os.stat_result) -> None:
+        """
+        Record that an output is current for an input.
+
+        Args:
+            key: Result of entry_key()
+            input_stat: Stat result of the input file
+            digest: Result of content_digest() for the input content
+            output_stat: Stat result of the output file after writing it
+        """
+        entry = {
+            "input": _stat_signature(input_stat),
+            "digest": digest,
+            "output": _stat_signature(output_stat),
+            "recorded_ns": int(time.time() * 1e9),
+        }
+        self._write(self._path("entries", key), json.dumps(entry).encode("utf-8"))
+
+    @staticmethod
+    def _output_matches(entry: Dict[str, Any], output_path: Union[str, Path]) -> bool:
+        """
+        Check that the output recorded in an entry is still on disk unchanged.
+
+        Args:
+            entry: Result of get_entry()
+            output_path: Output file
+
+        Returns:
+            True if the output file has the recorded stat signature
+        """
+        try:
+            output_stat = os.stat(str(output_path))
+        except OSError:
+            return False
+        return list(_stat_signature(output_stat)) == entry.get("output")
+
+    def is_current(self, entry: Optional[Dict[str, Any]], input_stat: os.stat_result, output_path: Union[str, Path]) -> bool:
+        """
+        Check with stat calls only whether an output is current.
+
+        Args:
+            entry: Result of get_entry()
+            input_stat: Stat result of the input file
+            output_path: Output file
+
+        Returns:
+            True if neither the input nor the output changed since the entry
+            was recorded
+        """
+        if not entry or list(_stat_signature(input_stat)) != entry.get("input"):
+            return False
+        # A file rewritten within the same timestamp tick would look unchanged
+        if input_stat.st_mtime_ns >= entry.get("recorded_ns", 0) - RACY_WINDOW_NS:
+            return False
+        return self._output_matches(entry, output_path)
+
+    def is_current_digest(self, entry: Optional[Dict[str, Any]], digest: str, output_path: Union[str, Path]) -> bool:
+        """
+        Check by content hash whether an output is current.
+
+        Args:
+            entry: Result of get_entry()
+            digest: Result of content_digest() for the input content
+            output_path: Output file
+
+        Returns:
+            True if the input content and the output are unchanged since the
+            entry was recorded
+        """
+        if not entry or entry.get("digest") != digest:
+            return False
+        return self._output_matches(entry, output_path)
+
+    def get_output(self, digest: str, options_key: str) -> Optional[bytes]:
+        """
+        Load a cleaned output stored for a source content.
+
+        Args:
+            digest: Result of content_digest() for the source content
+            options_key: Result of options_key()
+
+        Returns:
+            The cleaned output, or None if it is not cached
+        """
+        path = self._path("objects", self._hash(digest, options_key))
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put_output(self, digest: str, options_key: str, data: bytes) -> None:
+        """
+        Store the cleaned output for a source content.
+
+        Args:
+            digest: Result of content_digest() for the source content
+            options_key: Result of options_key()
+            data: Cleaned output
+        """
+        self._write(self._path("objects", self._hash(digest, options_key)), data)
+
+    def prune(self) -> int:
+        """
+        Delete the least recently used cache files until the cache fits in
+        max_bytes.
+
+        Returns:
+            Number of bytes freed
+        """
+        files = []
+        total = 0
+        for kind in ("entries", "objects"):
+            root = self.directory / kind
+            if not root.is_dir():
+                continue
+            for directory in os.scandir(root):
+                if not directory.is_dir():
+                    continue
+                for entry in os.scandir(directory.path):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        freed = 0
+        if total <= self.max_bytes:
+            return freed
+
+        files.sort()
+        for _, size, path in files:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            freed += size
+
+        logger.info(f"Pruned {freed} bytes from cache {self.directory}")
+        return freed
+
+
+# Rough per-entry overhead counted against MemoryCache.max_bytes
+_MEMORY_ENTRY_BYTES = 256
+
+
+class MemoryCache(ResultCache):
+    """
+    In-memory cache for long-running processes such as the daemon.
+
+    Works like ResultCache without touching the disk. Entries and outputs
+    share one least-recently-used order and are evicted as soon as the
+    cache grows past max_bytes. Safe to use from several threads.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Create an empty cache.
+
+        Args:
+            max_bytes: Size the cache is kept under
+        """
+        super().__init__(directory="", max_bytes=max_bytes)
+        self.size = 0
+        self._items = OrderedDict()  # type: OrderedDict[Tuple[str, str], Tuple[Any, int]]
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"MemoryCache(max_bytes={self.max_bytes})"
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _get(self, kind: str, key: str) -> Any:
+        """
+        Look up an item and mark it as recently used.
+
+        Args:
+            kind: "entries" or "objects"
+            key: Hex key of the item
+
+        Returns:
+            The item, or None if it is not cached
+        """
+        with self._lock:
+            item = self._items.get((kind, key))
+            if item is None:
+                return None
+            self._items.move_to_end((kind, key))
+            return item[0]
+
+    def _put(self, kind: str, key: str, value: Any, size: int) -> None:
+        """
+        Store an item, evicting the least recently used ones if needed.
+
+        Args:
+            kind: "entries" or "objects"
+            key: Hex key of the item
+            value: Item to store
+            size: Bytes counted for the item
+        """
+        with self._lock:
+            previous = self._items.pop((kind, key), None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._items[(kind, key)] = (value, size)
+            self.size += size
+            self._evict()
+
+    def _evict(self) -> int:
+        """
+        Drop the least recently used items until the cache fits in
+        max_bytes. The caller holds the lock.
+
+        Returns:
+            Number of bytes freed
+        """
+        freed = 0
+        while self.size > self.max_bytes and self._items:
+            _, (_, size) = self._items.popitem(last=False)
+            self.size -= size
+            freed += size
+        return freed
+
+    def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._get("entries", key)
+
+    def put_entry(self, key: str, input_stat: os.stat_result, digest: str, output_stat: os.stat_result) -> None:
+        # Lists, as in entries read back from JSON
+        entry = {
+            "input": list(_stat_signature(input_stat)),
+            "digest": digest,
+            "output": list(_stat_signature(output_stat)),
+            "recorded_ns": int(time.time() * 1e9),
+        }
+        self._put("entries", key, entry, _MEMORY_ENTRY_BYTES)
+
+    def get_output(self, digest: str, options_key: str) -> Optional[bytes]:
+        return self._get("objects", self._hash(digest, options_key))
+
+    def put_output(self, digest: str, options_key: str, data: bytes) -> None:
+        self._put("objects", self._hash(digest, options_key), data, len(data) + _MEMORY_ENTRY_BYTES)
+
+    def prune(self) -> int:
+        with self._lock:
+            return self._evict()
@@ -0,0 +1,174 @@
+"""
+Check mode: find the files that still have comments without writing anything.
+
+Lint gates only need a yes or no per file, so a file without a single '#'
+byte is passed without tokenizing it, and tokenizing stops at the first
+comment. Counting what cleaning would remove needs the whole file and is
+only done when asked for.
+"""
+
+import logging
+import os
+import tokenize
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Union
+
+from pycommentcleaner.core import CHUNKS_PER_WORKER, _comment_byte_spans, _is_coding_cookie, _unsafe_error_token
+from pycommentcleaner.defaults import BACKENDS, NOTEBOOK_SUFFIX
+from pycommentcleaner.notebook import clean_notebook_counted
+
+logger = logging.getLogger(__name__)
+
+
+class CheckResult(NamedTuple):
+    """
+    Result of checking one file.
+
+    Attributes:
+        file_path: The file checked
+        has_comments: Whether cleaning would change the file
+        comments: Number of comments, or None if they were not counted
+        comment_bytes: Number of bytes cleaning would remove, or None if
+                       they were not counted
+        size: Size of the file in bytes
+        error: Why the file could not be checked, or None
+    """
+
+    file_path: str
+    has_comments: bool
+    comments: Optional[int]
+    comment_bytes: Optional[int]
+    size: int
+    error: Optional[str]
+
+
+def has_comments(data: bytes) -> bool:
+    """
+    Check whether Python source has comments, reading as little as possible.
+
+    Sources without a '#' byte are answered without tokenizing; otherwise
+    tokenizing stops at the first comment. Source that cannot be tokenized
+    before its first comment counts as having none, as cleaning leaves it
+    unchanged, and so does a coding cookie that cleaning keeps.
+
+    Args:
+        data: Python source as bytes
+
+    Returns:
+        True if the source has at least one comment
+    """
+    if b"#" not in data:
+        return False
+    encoding = None
+    try:
+        for tok in tokenize.tokenize(BytesIO(data).readline):
+            if tok.type == tokenize.COMMENT:
+                if not _is_coding_cookie(tok, encoding):
+                    return True
+            elif tok.type == tokenize.ERRORTOKEN and _unsafe_error_token(tok):
+                return False
+            elif tok.type == tokenize.ENCODING:
+                encoding = tok.string
+    except (tokenize.TokenError, SyntaxError) as e:
+        logger.error(f"Tokenization error: {e}")
+    return False
+
+
+def check_file(file_path: Union[str, Path], stats: bool = False) -> CheckResult:
+    """
+    Check whether a Python file has comments.
+
+    The code cells of a Jupyter notebook (.ipynb) are always counted, as
+    the notebook has to be parsed whole anyway.
+
+    Args:
+        file_path: Path to the Python file
+        stats: Also count the comments and the bytes cleaning would remove,
+               which tokenizes files with comments completely
+
+    Returns:
+        The result for the file
+    """
+    file_path = Path(file_path)
+    notebook = file_path.suffix.lower() == NOTEBOOK_SUFFIX
+    if file_path.suffix.lower() != '.py' and not notebook:
+        error_msg = f"Not a Python file: {file_path}"
+        logger.error(error_msg)
+        return CheckResult(str(file_path), False, None, None, 0, error_msg)
+
+    try:
+        with open(file_path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        error_msg = f"File not found: {file_path}"
+        logger.error(error_msg)
+        return CheckResult(str(file_path), False, None, None, 0, error_msg)
+    except OSError as e:
+        error_msg = f"Error checking file {file_path}: {str(e)}"
+        logger.error(error_msg)
+        return CheckResult(str(file_path), False, None, None, 0, error_msg)
+
+    if b"#" not in data:
+        return CheckResult(str(file_path), False, 0, 0, len(data), None)
+    if notebook:
+        _, comments, comment_bytes = clean_notebook_counted(data)
+        return CheckResult(str(file_path), comments > 0, comments, comment_bytes, len(data), None)
+    if not stats:
+        return CheckResult(str(file_path), has_comments(data), None, None, len(data), None)
+
+    try:
+        spans = _comment_byte_spans(data)
+    except (tokenize.TokenError, SyntaxError) as e:
+        logger.error(f"Tokenization error in {file_path}: {e}")
+        spans = []
+    comment_bytes = sum(end - start for start, end in spans)
+    return CheckResult(str(file_path), bool(spans), len(spans), comment_bytes, len(data), None)
+
+
+def check_files(
+    file_paths: Iterable[Union[str, Path]],
+    jobs: Optional[int] = None,
+    backend: str = "process",
+    stats: bool = False,
+) -> List[CheckResult]:
+    """
+    Check multiple Python files for comments.
+
+    Args:
+        file_paths: Paths to Python files
+        jobs: Number of parallel workers. None or 1 checks the files one at a
+              time, 0 uses one worker per CPU.
+        backend: "process", "thread" or "serial"; ignored when running serially
+        stats: Count the comments and bytes too (see check_file)
+
+    Returns:
+        Results in the same order as file_paths
+
+    Raises:
+        ValueError: If the backend is not one of BACKENDS or jobs is negative
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend!r} (expected one of {', '.join(BACKENDS)})")
+    if jobs is not None and jobs < 0:
+        raise ValueError(f"jobs must be 0 or greater, got {jobs}")
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if not jobs or jobs == 1 or backend == "serial":
+        return [check_file(file_path, stats=stats) for file_path in file_paths]
+
+    path_list = list(file_paths)
+    if not path_list:
+        return []
+
+    workers = min(jobs, len(path_list))
+    chunksize = max(1, len(path_list) // (workers * CHUNKS_PER_WORKER))
+
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    executor_class = ProcessPoolExecutor if backend == "process" else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        return list(executor.map(partial(check_file, stats=stats), path_list, chunksize=chunksize))
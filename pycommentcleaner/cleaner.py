@@ -0,0 +1,176 @@
+"""
+Reusable cleaner for embedding pycommentcleaner in long-running processes.
+
+A Cleaner validates its options once and reuses its working lists across
+calls, and returns compact CleanResult tuples carrying the cleaned code,
+the number of comments removed and the size reduction, so callers do not
+need to compare strings to find out what changed.
+"""
+
+import logging
+import tokenize
+from typing import Iterable, Iterator, NamedTuple, Union
+
+from pycommentcleaner import hooks
+from pycommentcleaner.core import (
+    ENGINES,
+    _byte_tokens,
+    _clean_bytes_observed,
+    _clean_code_observed,
+    _code_tokens,
+    _comment_byte_spans,
+    _comment_spans,
+    _splice_byte_spans,
+    _splice_offsets,
+    _splice_spans,
+    _untokenize_bytes,
+)
+from pycommentcleaner.scanner import scan_comment_bytes, scan_comments
+
+logger = logging.getLogger(__name__)
+
+
+class CleanResult(NamedTuple):
+    """
+    Result of cleaning one piece of code.
+
+    Attributes:
+        output: Code with comments removed (str for clean, bytes for clean_bytes)
+        comments: Number of comments removed
+        byte_delta: Number of bytes removed, measured in UTF-8 for str input
+    """
+
+    output: Union[str, bytes]
+    comments: int
+    byte_delta: int
+
+
+class Cleaner:
+    """
+    Comment remover holding its options across many calls.
+    """
+
+    def __init__(self, engine: str = "splice") -> None:
+        """
+        Create a cleaner.
+
+        Args:
+            engine: Cleaning engine (see clean_code)
+
+        Raises:
+            ValueError: If the engine is not one of ENGINES
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine!r} (expected one of {', '.join(ENGINES)})")
+        self.engine = engine
+        # Working lists, cleared and refilled by every call
+        self._comments = []
+        self._spans = []
+        self._byte_spans = []
+
+    def __repr__(self) -> str:
+        return f"Cleaner(engine={self.engine!r})"
+
+    def _clean(self, code: str) -> str:
+        """
+        Remove comments, leaving the removed comments in self._comments.
+
+        Args:
+            code: Python code as a string
+
+        Returns:
+            Python code with comments removed
+        """
+        comments = self._comments
+        comments.clear()
+        self._spans.clear()
+
+        if hooks.observers:
+            return _clean_code_observed(code, self.engine, comments)
+        if self.engine == "scan":
+            offsets = scan_comments(code, comments)
+            if offsets is not None:
+                return _splice_offsets(code, offsets)
+        elif self.engine == "untokenize":
+            return tokenize.untokenize(_code_tokens(code, comments))
+        return _splice_spans(code, _comment_spans(code, comments, self._spans))
+
+    def clean(self, code: str) -> CleanResult:
+        """
+        Remove comments from Python code.
+
+        Code that cannot be tokenized is returned unchanged with no comments
+        removed, as with clean_code.
+
+        Args:
+            code: Python code as a string
+
+        Returns:
+            The cleaned code, the number of comments removed and the number
+            of UTF-8 bytes removed
+        """
+        try:
+            output = self._clean(code)
+        except tokenize.TokenError as e:
+            logger.error(f"Tokenization error: {e}")
+            return CleanResult(code, 0, 0)
+        except Exception as e:
+            logger.error(f"Unexpected error during code cleaning: {e}")
+            return CleanResult(code, 0, 0)
+
+        comments = self._comments
+        if self.engine == "untokenize":
+            byte_delta = len(code.encode("utf-8")) - len(output.encode("utf-8"))
+        else:
+            byte_delta = sum(len(text.encode("utf-8")) for _, _, text in comments)
+        return CleanResult(output, len(comments), byte_delta)
+
+    def clean_many(self, codes: Iterable[str]) -> Iterator[CleanResult]:
+        """
+        Remove comments from many pieces of Python code.
+
+        Args:
+            codes: Python code strings, consumed lazily
+
+        Yields:
+            One CleanResult per input, in order
+        """
+        clean = self.clean
+        for code in codes:
+            yield clean(code)
+
+    def clean_bytes(self, data: bytes) -> CleanResult:
+        """
+        Remove comments from encoded Python source.
+
+        The encoding is detected from the BOM or PEP 263 coding cookie, and
+        the output is encoded the same way (see clean_bytes).
+
+        Args:
+            data: Python source as bytes
+
+        Returns:
+            The cleaned source as bytes, the number of comments removed and
+            the number of bytes removed
+        """
+        comments = self._comments
+        comments.clear()
+        try:
+            if hooks.observers:
+                output = _clean_bytes_observed(data, self.engine, comments)
+            elif self.engine == "untokenize":
+                output = _untokenize_bytes(data, _byte_tokens(data, comments))
+            else:
+                spans = scan_comment_bytes(data, comments) if self.engine == "scan" else None
+                if spans is None:
+                    self._byte_spans.clear()
+                    spans = _comment_byte_spans(data, comments, self._byte_spans)
+                output = _splice_byte_spans(data, spans)
+        except tokenize.TokenError as e:
+            logger.error(f"Tokenization error: {e}")
+            return CleanResult(data, 0, 0)
+        except Exception as e:
+            logger.error(f"Unexpected error during code cleaning: {e}")
+            return CleanResult(data, 0, 0)
+
+        return CleanResult(output, len(comments), len(data) - len(output))
@@ -6,22 +6,40 @@ from Python files.
 """
 
 import argparse
-import logging
 import os
 import sys
-from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
 
-from pycommentcleaner.core import clean_file, clean_files
+from pycommentcleaner import __version__
+from pycommentcleaner.defaults import (
+    BACKENDS,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_INFLIGHT_BYTES,
+    LINK_MODES,
+    NOTEBOOK_SUFFIX,
+    PYC_INVALIDATION_MODES,
+)
 
+# The cleaner itself is imported where it is used, so --help and --version
+# answer without loading tokenize, logging or the worker pools
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from pathlib import Path
 
-def configure_logging(verbosity: int) -> None:
+
+def configure_logging(verbosity: int, stream: Optional[TextIO] = None) -> None:
     """
     Configure logging level based on verbosity.
 
     Args:
         verbosity: Verbosity level (0-3)
+        stream: Stream the messages go to (default: standard output)
     """
+    import logging
+    
     log_levels = {
         0: logging.ERROR,
         1: logging.WARNING,
@@ -35,10 +53,30 @@ def configure_logging(verbosity: int) -> None:
     logging.basicConfig(
         level=level,
         format="%(levelname)s: %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)]
+        handlers=[logging.StreamHandler(stream or sys.stdout)]
     )
 
 
+def parse_shard(text: str) -> Tuple[int, int]:
+    """
+    Parse a --shard value such as "2/4".
+
+    Args:
+        text: INDEX/COUNT, with INDEX from 1 to COUNT
+
+    Returns:
+        Tuple of (index, count)
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is malformed or the shard
+            does not exist
+    """
+    index, _, count = text.partition("/")
+    if not (index.isdigit() and count.isdigit() and 1 <= int(index) <= int(count)):
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT with 1 <= INDEX <= COUNT, got {text!r}")
+    return int(index), int(count)
+
+
 def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     """
     Parse command-line arguments.
@@ -55,13 +93,251 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     
     parser.add_argument(
         "files",
-        nargs="+",
-        help="Path(s) to Python file(s) to process"
+        nargs="*",
+        help="Path(s) to Python file(s) or directories to process, or '-' to clean standard input "
+             "to standard output; .whl, .zip, .pyz and .tar(.gz, .bz2, .xz) "
+             "archives are rewritten with their Python members cleaned"
     )
     
     parser.add_argument(
         "-o", "--output-dir",
-        help="Directory where cleaned files will be saved (defaults to same directory as input file)"
+        help="Directory where cleaned files will be saved, keeping the layout of the directories given "
+             "(defaults to same directory as input file)"
+    )
+    
+    parser.add_argument(
+        "--files-from",
+        metavar="FILE",
+        help="Also clean the paths listed in FILE, one per line ('-' reads standard input); "
+             "listed files are filtered by --include and --exclude, relative to the current directory"
+    )
+    
+    parser.add_argument(
+        "-0", "--null",
+        action="store_true",
+        help="Paths in --files-from are separated by NUL characters, as written by "
+             "'find -print0' or 'git ls-files -z'"
+    )
+    
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="Only clean files in directories matching this glob (default: *.py and *.ipynb, can be repeated)"
+    )
+    
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Skip files and directories matching this glob, in addition to the defaults (can be repeated)"
+    )
+    
+    parser.add_argument(
+        "--no-gitignore",
+        action="store_true",
+        help="Do not skip paths matched by .gitignore files"
+    )
+    
+    changes = parser.add_mutually_exclusive_group()
+    changes.add_argument(
+        "--since",
+        metavar="REF",
+        help="Clean only the Python files changed in the git working tree since REF "
+             "(from its merge base with HEAD); files and directories given limit the search"
+    )
+    changes.add_argument(
+        "--staged",
+        action="store_true",
+        help="Clean the staged contents of the Python files changed in the git index, "
+             "writing '_cleaned' files without touching the working tree"
+    )
+    
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of parallel workers (0 uses one per CPU, default: 1)"
+    )
+    
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="process",
+        help="Worker pool used when --jobs is greater than 1 (default: process)"
+    )
+    
+    parser.add_argument(
+        "-i", "--in-place",
+        action="store_true",
+        help="Overwrite the files instead of writing '_cleaned' copies (files without comments are not touched)"
+    )
+    
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="Flush each output file to disk before moving on"
+    )
+    
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Also remove docstrings, blank lines and trailing whitespace, and print the bytes saved per file "
+             "(docstrings are kept in files that use __doc__)"
+    )
+    
+    parser.add_argument(
+        "--pyc",
+        nargs="?",
+        const="timestamp",
+        choices=PYC_INVALIDATION_MODES,
+        metavar="MODE",
+        help="Also compile each cleaned file to a .pyc in __pycache__, invalidated by MODE: "
+             f"{', '.join(PYC_INVALIDATION_MODES)} (default: timestamp)"
+    )
+    
+    parser.add_argument(
+        "--optimize",
+        type=int,
+        choices=(-1, 0, 1, 2),
+        default=-1,
+        metavar="LEVEL",
+        help="Optimization level of the .pyc files (0, 1 or 2; default: that of this interpreter)"
+    )
+    
+    parser.add_argument(
+        "--link-mode",
+        choices=LINK_MODES,
+        default="copy",
+        help="How the output of a file without a '#' is made, without tokenizing it: copied by the kernel, "
+             "a copy-on-write reflink, or a hard link to the input (default: copy)"
+    )
+    
+    parser.add_argument(
+        "--strip-outputs",
+        action="store_true",
+        help="Also clear the outputs and execution counts of the code cells of Jupyter notebooks"
+    )
+    
+    parser.add_argument(
+        "--check", "--dry-run",
+        dest="check",
+        action="store_true",
+        help="Write nothing; list the files that have comments and exit with 1 if there are any"
+    )
+    
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="With --check, also count the comments and the bytes cleaning would remove"
+    )
+    
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Clean files line by line with bounded memory (for very large files)"
+    )
+    
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Overlap file I/O with asyncio for slow (e.g. network) filesystems; "
+             "tokenizing runs in the --backend pool when --jobs is not 1"
+    )
+    
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Files in progress at once with --async (default: %(default)s)"
+    )
+    
+    parser.add_argument(
+        "--max-inflight-mb",
+        type=int,
+        default=DEFAULT_MAX_INFLIGHT_BYTES // (1024 * 1024),
+        metavar="MB",
+        help="Source held in memory at once with --async (default: %(default)s)"
+    )
+    
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="INDEX/COUNT",
+        help="Clean only shard INDEX of COUNT (numbered from 1), splitting the files found between "
+             "COUNT runners by total size; every runner must be given the same paths"
+    )
+    
+    parser.add_argument(
+        "--shard-manifest",
+        metavar="FILE",
+        help="With --shard, write the shard's files, failures, bytes and seconds to FILE as JSON"
+    )
+    
+    parser.add_argument(
+        "--merge-manifests",
+        nargs="+",
+        metavar="FILE",
+        help="Combine the --shard-manifest files of all shards, print a summary and exit with 1 "
+             "if a shard is missing or a file failed"
+    )
+    
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run a server that keeps the cleaner warm and answers --client requests over a Unix socket"
+    )
+    
+    parser.add_argument(
+        "--client",
+        action="store_true",
+        help="Send the files to the daemon instead of cleaning them here (starts one if none is running)"
+    )
+    
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="Unix socket of the daemon (default: pycommentcleaner.sock in $XDG_RUNTIME_DIR, or in a "
+             "pycommentcleaner-<uid> directory only you can use in the temporary directory)"
+    )
+    
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+        metavar="SECONDS",
+        help="Stop the daemon after this long without requests, 0 to never stop (default: %(default)s)"
+    )
+    
+    parser.add_argument(
+        "--cache-dir",
+        nargs="?",
+        const=DEFAULT_CACHE_DIR,
+        metavar="DIR",
+        help=f"Skip files whose output is already current, using a cache in DIR (default: {DEFAULT_CACHE_DIR})"
+    )
+    
+    parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        metavar="MB",
+        help="Size the cache is trimmed to after each run (default: %(default)s)"
+    )
+    
+    parser.add_argument(
+        "--comment-index",
+        metavar="DB",
+        help="Record every removed comment (path, line, column, text) in the SQLite database DB"
+    )
+    
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print files, comments, bytes and time per phase to stderr "
+             "(not collected from process workers; use --backend thread)"
     )
     
     parser.add_argument(
@@ -74,10 +350,14 @@ def parse_args(args: Optional[List[str]] = None) -> argparse.Namespace:
     parser.add_argument(
         "--version",
         action="version",
-        version=f"%(prog)s {__import__('pycommentcleaner').__version__}"
+        version=f"%(prog)s {__version__}"
     )
     
-    return parser.parse_args(args)
+    parsed_args = parser.parse_args(args)
+    if not parsed_args.files and not (parsed_args.daemon or parsed_args.since or parsed_args.staged
+                                      or parsed_args.files_from or parsed_args.merge_manifests):
+        parser.error("the following arguments are required: files")
+    return parsed_args
 
 
 def main(args: Optional[List[str]] = None) -> int:
@@ -93,36 +373,290 @@ def main(args: Optional[List[str]] = None) -> int:
     # Parse command-line arguments
     parsed_args = parse_args(args)
     
-    # Configure logging based on verbosity
-    configure_logging(parsed_args.verbose)
+    if parsed_args.jobs < 0:
+        print("--jobs must be 0 or greater", file=sys.stderr)
+        return 2
+    
+    if parsed_args.in_place and parsed_args.output_dir:
+        print("--in-place cannot be combined with --output-dir", file=sys.stderr)
+        return 2
+    
+    if parsed_args.use_async:
+        if parsed_args.concurrency < 1 or parsed_args.max_inflight_mb < 1:
+            print("--concurrency and --max-inflight-mb must be 1 or greater", file=sys.stderr)
+            return 2
+        if parsed_args.stream or parsed_args.cache_dir:
+            print("--async cannot be combined with --stream or --cache-dir", file=sys.stderr)
+            return 2
+    
+    if parsed_args.staged and (parsed_args.in_place or parsed_args.use_async or parsed_args.client or parsed_args.stream):
+        print("--staged cannot be combined with --in-place, --async, --client or --stream", file=sys.stderr)
+        return 2
+    
+    if parsed_args.client and (parsed_args.use_async or parsed_args.stream or parsed_args.cache_dir):
+        print("--client cannot be combined with --async, --stream or --cache-dir", file=sys.stderr)
+        return 2
+    
+    if parsed_args.null and not parsed_args.files_from:
+        print("--null needs --files-from", file=sys.stderr)
+        return 2
+    
+    if parsed_args.files_from and (parsed_args.since or parsed_args.staged):
+        print("--files-from cannot be combined with --since or --staged", file=sys.stderr)
+        return 2
+    
+    if parsed_args.stats and not parsed_args.check:
+        print("--stats needs --check", file=sys.stderr)
+        return 2
+    
+    if parsed_args.check and (parsed_args.output_dir or parsed_args.in_place or parsed_args.staged
+                              or parsed_args.use_async or parsed_args.client or parsed_args.stream
+                              or parsed_args.cache_dir or "-" in parsed_args.files):
+        print("--check cannot be combined with --output-dir, --in-place, --staged, --async, --client, "
+              "--stream, --cache-dir or '-'", file=sys.stderr)
+        return 2
+    
+    if parsed_args.minify and (parsed_args.check or parsed_args.stream or parsed_args.use_async
+                               or parsed_args.client or parsed_args.staged or "-" in parsed_args.files):
+        print("--minify cannot be combined with --check, --stream, --async, --client, --staged or '-'",
+              file=sys.stderr)
+        return 2
+    
+    if parsed_args.pyc and (parsed_args.check or parsed_args.stream or parsed_args.use_async
+                            or parsed_args.client or parsed_args.staged or "-" in parsed_args.files):
+        print("--pyc cannot be combined with --check, --stream, --async, --client, --staged or '-'",
+              file=sys.stderr)
+        return 2
+    
+    if parsed_args.link_mode != "copy" and (parsed_args.check or parsed_args.use_async or parsed_args.client
+                                            or parsed_args.staged or "-" in parsed_args.files):
+        print("--link-mode cannot be combined with --check, --async, --client, --staged or '-'", file=sys.stderr)
+        return 2
+    
+    if parsed_args.strip_outputs and (parsed_args.check or parsed_args.use_async or parsed_args.client
+                                      or parsed_args.staged or "-" in parsed_args.files):
+        print("--strip-outputs cannot be combined with --check, --async, --client, --staged or '-'",
+              file=sys.stderr)
+        return 2
+    
+    if parsed_args.comment_index:
+        process_workers = parsed_args.jobs != 1 and parsed_args.backend == "process"
+        if process_workers or parsed_args.client or parsed_args.cache_dir or parsed_args.check:
+            print("--comment-index only sees comments removed in this process: use --backend thread or "
+                  "serial, and no --client, --cache-dir or --check", file=sys.stderr)
+            return 2
+    
+    if parsed_args.shard_manifest and (not parsed_args.shard or parsed_args.check):
+        print("--shard-manifest needs --shard and cannot be combined with --check", file=sys.stderr)
+        return 2
+    
+    if parsed_args.shard and (parsed_args.staged or "-" in parsed_args.files):
+        print("--shard cannot be combined with --staged or '-'", file=sys.stderr)
+        return 2
+    
+    if parsed_args.merge_manifests:
+        return run_merge(parsed_args)
+    
+    use_filter = "-" in parsed_args.files
+    if use_filter and (len(parsed_args.files) > 1 or parsed_args.files_from or parsed_args.output_dir
+                       or parsed_args.in_place or parsed_args.since or parsed_args.staged or parsed_args.client):
+        print("'-' cannot be combined with other files, --files-from, --output-dir, --in-place, "
+              "--since, --staged or --client", file=sys.stderr)
+        return 2
+    
+    # Configure logging based on verbosity; standard output carries the code when filtering
+    configure_logging(parsed_args.verbose, sys.stderr if use_filter else sys.stdout)
+    
+    if parsed_args.daemon:
+        return run_daemon(parsed_args)
+    
+    run = run_filter if use_filter else process_files
+    if not (parsed_args.profile or parsed_args.comment_index):
+        return run(parsed_args)
     
-    # Get file paths from arguments
-    file_paths = [Path(file_path) for file_path in parsed_args.files]
+    # Gather totals, phase timings and comments through the instrumentation hooks
+    from pycommentcleaner import hooks
     
-    # Process multiple files
-    if len(file_paths) > 1 or parsed_args.output_dir:
-        results = clean_files(file_paths, parsed_args.output_dir)
+    index = None
+    if parsed_args.comment_index:
+        import sqlite3
         
-        # Print results
-        success_count = 0
-        for file_path, success, message in results:
-            if success:
-                success_count += 1
-                if parsed_args.verbose > 0:
-                    print(message)
-            else:
-                print(message, file=sys.stderr)
+        from pycommentcleaner.index import CommentIndex
         
-        # Print summary
-        print(f"Successfully processed {success_count} of {len(file_paths)} files.")
+        try:
+            index = hooks.register(CommentIndex(parsed_args.comment_index))
+        except sqlite3.Error as e:
+            print(f"Cannot open comment index {parsed_args.comment_index}: {e}", file=sys.stderr)
+            return 1
+    
+    totals = hooks.register(hooks.Totals()) if parsed_args.profile else None
+    try:
+        return run(parsed_args)
+    finally:
+        if index is not None:
+            hooks.unregister(index)
+            index.close()
+        if totals is not None:
+            hooks.unregister(totals)
+            print(totals.summary(), file=sys.stderr)
+
+
+def process_files(parsed_args: argparse.Namespace) -> int:
+    """
+    Clean the files named on the command line.
+
+    Args:
+        parsed_args: Parsed command-line arguments
+
+    Returns:
+        Exit code (0 for success, non-zero for errors)
+    """
+    from itertools import chain
+    from pathlib import Path
+    from time import perf_counter
+    
+    from pycommentcleaner.cache import ResultCache
+    from pycommentcleaner.core import clean_file, clean_files
+    from pycommentcleaner.discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, iter_python_files
+    
+    cache = None
+    if parsed_args.cache_dir:
+        cache = ResultCache(parsed_args.cache_dir, max_bytes=parsed_args.cache_max_size * 1024 * 1024)
+    
+    include = parsed_args.include or DEFAULT_INCLUDE
+    if not parsed_args.include and (parsed_args.stream or parsed_args.minify or parsed_args.pyc):
+        # Notebooks cannot be streamed, minified or compiled
+        include = tuple(pattern for pattern in include if not pattern.endswith(NOTEBOOK_SUFFIX))
+    exclude = DEFAULT_EXCLUDE + tuple(parsed_args.exclude)
+    git_mode = bool(parsed_args.since or parsed_args.staged)
+    files = parsed_args.files
+    # Directories the files are found under, whose layout is kept in --output-dir
+    roots = []  # type: List[str]
+    
+    # Archives are rewritten as a whole, whatever mode the other files use
+    archive_results = []  # type: List[Tuple[str, bool, str]]
+    if not git_mode and not parsed_args.check:
+        from pycommentcleaner.archive import archive_suffix, clean_archives
         
-        # Return appropriate exit code
-        return 0 if success_count == len(file_paths) else 1
+        archives = [path for path in files if archive_suffix(path) and not os.path.isdir(path)]
+        if archives and parsed_args.shard:
+            print("--shard cannot be combined with archives", file=sys.stderr)
+            return 2
+        if archives:
+            archive_results = clean_archives(
+                archives,
+                output_dir=parsed_args.output_dir,
+                jobs=parsed_args.jobs,
+                backend=parsed_args.backend,
+                in_place=parsed_args.in_place,
+                minify=parsed_args.minify,
+            )
+            files = [path for path in files if path not in archives]
+            if not files:
+                return report_results(archive_results, parsed_args)
+    
+    # Process multiple files or directories
+    if (git_mode or archive_results or parsed_args.files_from or parsed_args.check or len(files) > 1
+            or parsed_args.output_dir or parsed_args.use_async or parsed_args.client or parsed_args.shard
+            or os.path.isdir(files[0])):
+        started = perf_counter()
+        if git_mode:
+            from pycommentcleaner import git
+            
+            try:
+                file_paths = git.changed_files(
+                    since=parsed_args.since,
+                    staged=parsed_args.staged,
+                    pathspecs=parsed_args.files,
+                    include=include,
+                    exclude=exclude,
+                )
+                if parsed_args.staged:
+                    return report_results(git.clean_staged(file_paths, output_dir=parsed_args.output_dir), parsed_args)
+                roots.append(str(git.repository_root()))
+            except git.GitError as e:
+                print(str(e), file=sys.stderr)
+                return 1
+        else:
+            paths = files  # type: Iterable[str]
+            if parsed_args.files_from:
+                try:
+                    paths = chain(files, read_listed_paths(parsed_args.files_from, parsed_args.null, include, exclude))
+                except OSError as e:
+                    print(f"Cannot read paths from {parsed_args.files_from}: {e}", file=sys.stderr)
+                    return 1
+            
+            # Expand directories lazily into the Python files below them
+            file_paths = iter_python_files(
+                record_directories(paths, roots),
+                include=include,
+                exclude=exclude,
+                use_gitignore=not parsed_args.no_gitignore,
+            )
+        
+        if parsed_args.shard:
+            from pycommentcleaner.shard import shard_files
+            
+            # Every runner walks the whole tree and keeps its own part of it
+            shard = shard_files(file_paths, *parsed_args.shard)
+            file_paths = shard.files
+        
+        if parsed_args.check:
+            return run_check(file_paths, parsed_args)
+        if parsed_args.use_async:
+            results = run_async(file_paths, parsed_args, roots)
+        elif parsed_args.client:
+            try:
+                results = run_client(file_paths, parsed_args, roots)
+            except (OSError, RuntimeError) as e:
+                print(f"Cannot clean files in the daemon: {e}", file=sys.stderr)
+                return 1
+        else:
+            results = clean_files(
+                file_paths,
+                output_dir=parsed_args.output_dir,
+                jobs=parsed_args.jobs,
+                backend=parsed_args.backend,
+                roots=roots,
+                cache=cache,
+                stream=parsed_args.stream,
+                in_place=parsed_args.in_place,
+                fsync=parsed_args.fsync,
+                minify=parsed_args.minify,
+                pyc=parsed_args.pyc,
+                optimize=parsed_args.optimize,
+                link_mode=parsed_args.link_mode,
+                strip_outputs=parsed_args.strip_outputs,
+            )
+        
+        results = archive_results + list(results)
+        if parsed_args.shard_manifest:
+            from pycommentcleaner.shard import write_manifest
+            
+            try:
+                write_manifest(parsed_args.shard_manifest, shard, results, perf_counter() - started)
+            except OSError as e:
+                print(f"Cannot write manifest {parsed_args.shard_manifest}: {e}", file=sys.stderr)
+                return 1
+        return report_results(results, parsed_args)
     
     # Process a single file
     else:
-        file_path = file_paths[0]
-        success, message = clean_file(file_path)
+        file_path = Path(files[0])
+        success, message = clean_file(
+            file_path,
+            cache=cache,
+            stream=parsed_args.stream,
+            in_place=parsed_args.in_place,
+            fsync=parsed_args.fsync,
+            minify=parsed_args.minify,
+            pyc=parsed_args.pyc,
+            optimize=parsed_args.optimize,
+            link_mode=parsed_args.link_mode,
+            strip_outputs=parsed_args.strip_outputs,
+        )
+        if cache is not None:
+            cache.prune()
         
         if success:
             print(message)
@@ -132,5 +666,309 @@ def main(args: Optional[List[str]] = None) -> int:
             return 1
 
 
+def record_directories(paths: Iterable[str], directories: List[str]) -> Iterator[str]:
+    """
+    Pass paths through, appending the directories among them to a list.
+
+    Args:
+        paths: Files and directories, read lazily
+        directories: List the directories are appended to as they are read
+
+    Returns:
+        Iterator over the paths, unchanged
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            directories.append(path)
+        yield path
+
+
+def listed_relative_path(path: str, cwd: str) -> str:
+    """
+    Return the part of a listed path that --include and --exclude apply to.
+
+    Args:
+        path: Path read from a --files-from list
+        cwd: Current directory
+
+    Returns:
+        The '/'-separated path relative to cwd, or only the file name for a
+        path outside cwd, so directories above cwd are never matched
+    """
+    from pathlib import Path
+    
+    try:
+        relative = os.path.relpath(os.path.join(cwd, path), cwd)
+    except ValueError:
+        # On another drive
+        return os.path.basename(path)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return os.path.basename(path)
+    return Path(relative).as_posix()
+
+
+def read_listed_paths(list_path: str, null: bool, include: Sequence[str], exclude: Sequence[str]) -> Iterator[str]:
+    """
+    Open a --files-from list and yield its paths as they are read.
+
+    Args:
+        list_path: File with the list, or '-' for standard input
+        null: Whether the paths are NUL-separated
+        include: Glob patterns a listed file must match
+        exclude: Glob patterns that skip a listed file or its directories
+                 below the current directory (see listed_relative_path)
+
+    Returns:
+        Iterator over the listed directories and the selected files
+
+    Raises:
+        OSError: If the list cannot be opened
+    """
+    from pycommentcleaner.discovery import is_selected, read_path_list
+    
+    readable = sys.stdin.buffer if list_path == "-" else open(list_path, "rb")
+    
+    def paths() -> Iterator[str]:
+        cwd = os.getcwd()
+        try:
+            for path in read_path_list(readable, null=null):
+                if os.path.isdir(path) or is_selected(listed_relative_path(path, cwd), include, exclude):
+                    yield path
+        finally:
+            if readable is not sys.stdin.buffer:
+                readable.close()
+    
+    return paths()
+
+
+def run_filter(parsed_args: argparse.Namespace) -> int:
+    """
+    Clean standard input to standard output.
+
+    Args:
+        parsed_args: Parsed command-line arguments
+
+    Returns:
+        Exit code (0 for success, non-zero for errors)
+    """
+    from pycommentcleaner.core import clean_byte_stream
+    
+    try:
+        clean_byte_stream(sys.stdin.buffer, sys.stdout.buffer)
+        sys.stdout.flush()
+    except UnicodeDecodeError as e:
+        print(f"Cannot decode standard input: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader went away (e.g. "| head"); keep Python from failing again at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+def run_check(file_paths: Iterable["Path"], parsed_args: argparse.Namespace) -> int:
+    """
+    List the files that have comments, writing nothing.
+
+    Args:
+        file_paths: Python files to check
+        parsed_args: Parsed command-line arguments
+
+    Returns:
+        Exit code (0 if no file has comments, 1 if some do or could not be checked)
+    """
+    from pycommentcleaner.check import check_files
+    
+    results = check_files(file_paths, jobs=parsed_args.jobs, backend=parsed_args.backend, stats=parsed_args.stats)
+    
+    flagged = 0
+    errors = 0
+    comments = 0
+    comment_bytes = 0
+    total_bytes = 0
+    for result in results:
+        if result.error:
+            errors += 1
+            print(result.error, file=sys.stderr)
+            continue
+        total_bytes += result.size
+        if not result.has_comments:
+            continue
+        flagged += 1
+        if parsed_args.stats:
+            comments += result.comments
+            comment_bytes += result.comment_bytes
+            plural = "" if result.comments == 1 else "s"
+            print(f"{result.file_path}: {result.comments} comment{plural}, {result.comment_bytes} bytes")
+        else:
+            print(result.file_path)
+    
+    print(f"{flagged} of {len(results)} files have comments.")
+    if parsed_args.stats:
+        percent = 100.0 * comment_bytes / total_bytes if total_bytes else 0.0
+        print(f"Cleaning would remove {comments} comments, {comment_bytes} of {total_bytes} bytes ({percent:.1f}%).")
+    
+    return 1 if flagged or errors else 0
+
+
+def report_results(results: List[Tuple[str, bool, str]], parsed_args: argparse.Namespace) -> int:
+    """
+    Print the outcome of cleaning several files.
+
+    Args:
+        results: Tuples of (file_path, success, message)
+        parsed_args: Parsed command-line arguments
+
+    Returns:
+        Exit code (0 if every file succeeded, 1 otherwise)
+    """
+    # Print results
+    success_count = 0
+    for file_path, success, message in results:
+        if success:
+            success_count += 1
+            # Minify messages carry the bytes saved
+            if parsed_args.verbose > 0 or parsed_args.minify:
+                print(message)
+        else:
+            print(message, file=sys.stderr)
+    
+    # Print summary
+    print(f"Successfully processed {success_count} of {len(results)} files.")
+    
+    # Return appropriate exit code
+    return 0 if success_count == len(results) else 1
+
+
+def run_async(
+    file_paths: Iterable["Path"],
+    parsed_args: argparse.Namespace,
+    roots: Sequence[str] = (),
+) -> List[Tuple[str, bool, str]]:
+    """
+    Clean files with aclean_files on a new event loop.
+
+    Args:
+        file_paths: Python files to clean
+        parsed_args: Parsed command-line arguments
+        roots: Directories the files were found under
+
+    Returns:
+        List of tuples with (file_path, success, message), in the order the
+        files finished
+    """
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    
+    from pycommentcleaner.aio import aclean_files
+    
+    executor = None  # type: Optional[Executor]
+    if parsed_args.jobs != 1 and parsed_args.backend != "serial":
+        executor_class = ProcessPoolExecutor if parsed_args.backend == "process" else ThreadPoolExecutor
+        executor = executor_class(max_workers=parsed_args.jobs or os.cpu_count() or 1)
+
+    async def collect() -> List[Tuple[str, bool, str]]:
+        return [result async for result in aclean_files(
+            file_paths,
+            output_dir=parsed_args.output_dir,
+            concurrency=parsed_args.concurrency,
+            max_inflight_bytes=parsed_args.max_inflight_mb * 1024 * 1024,
+            executor=executor,
+            in_place=parsed_args.in_place,
+            fsync=parsed_args.fsync,
+            roots=roots,
+        )]
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(collect())
+    finally:
+        loop.close()
+        if executor is not None:
+            executor.shutdown()
+
+
+def run_merge(parsed_args: argparse.Namespace) -> int:
+    """
+    Print the combined manifests of the shards of one run.
+
+    Args:
+        parsed_args: Parsed command-line arguments
+
+    Returns:
+        Exit code (0 if every shard ran and every file succeeded, 1 otherwise)
+    """
+    from pycommentcleaner.shard import merge_manifests
+    
+    try:
+        merged = merge_manifests(parsed_args.merge_manifests)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    
+    for failure in merged["failures"]:
+        print(failure["message"], file=sys.stderr)
+    if merged["missing"]:
+        print(f"Missing shards: {', '.join(str(index) for index in merged['missing'])}", file=sys.stderr)
+    
+    present = len(merged["present"])
+    mean = merged["total_seconds"] / present
+    print(f"Merged {present} of {merged['shards']} shards: {merged['files']} of {merged['total_files']} files, "
+          f"{merged['failed']} failed, {merged['bytes']} bytes.")
+    print(f"Slowest shard took {merged['seconds']:.2f}s, the mean {mean:.2f}s.")
+    
+    return 1 if merged["missing"] or merged["failed"] else 0
+
+
+def run_daemon(parsed_args: argparse.Namespace) -> int:
+    """
+    Run the daemon until it is idle or shut down.
+
+    Args:
+        parsed_args: Parsed command-line arguments
+
+    Returns:
+        Exit code (0 for success, non-zero for errors)
+    """
+    from pycommentcleaner import daemon
+    
+    try:
+        daemon.serve(parsed_args.socket, parsed_args.idle_timeout, parsed_args.cache_max_size * 1024 * 1024)
+    except OSError as e:
+        print(f"Cannot start daemon: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_client(
+    file_paths: Iterable["Path"],
+    parsed_args: argparse.Namespace,
+    roots: Sequence[str] = (),
+) -> List[Tuple[str, bool, str]]:
+    """
+    Clean files in the daemon, starting one if none is running.
+
+    Args:
+        file_paths: Python files to clean
+        parsed_args: Parsed command-line arguments
+        roots: Directories the files were found under
+
+    Returns:
+        List of tuples with (file_path, success, message) for each file
+    """
+    from pycommentcleaner import daemon
+    
+    with daemon.Client(parsed_args.socket, start=True, idle_timeout=parsed_args.idle_timeout) as client:
+        # Listing the files first also completes roots
+        paths = list(file_paths)
+        return client.clean_files(
+            paths,
+            output_dir=parsed_args.output_dir,
+            roots=roots,
+            in_place=parsed_args.in_place,
+            fsync=parsed_args.fsync,
+        )
+
+
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
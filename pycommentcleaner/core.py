@@ -5,69 +5,838 @@ This module contains the main logic for parsing Python code and
 removing comments while preserving code inside strings and docstrings.
 """
 
+import codecs
 import logging
+import mmap
 import os
+import re
 import tokenize
-from io import StringIO
+from functools import partial
+from io import BytesIO, StringIO
+from itertools import accumulate
 from pathlib import Path
-from typing import List, Optional, Tuple, Union
+from time import perf_counter
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+from pycommentcleaner import hooks
+from pycommentcleaner.bytecode import pyc_is_current, write_pyc
+from pycommentcleaner.cache import ResultCache
+from pycommentcleaner.defaults import BACKENDS, ENGINES, LINK_MODES, MMAP_THRESHOLD, NOTEBOOK_SUFFIX, PYC_INVALIDATION_MODES
+from pycommentcleaner.discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, iter_python_files
+from pycommentcleaner.fileio import AtomicFile, break_link, copy_file
+from pycommentcleaner.scanner import scan_comment_bytes, scan_comments
+from pycommentcleaner.shard import _file_size, _partition_by_size, shard_files
 
-# Configure logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+
+# PEP 263 coding cookie
+_CODING_COOKIE = re.compile(r"[ \t\f]*#.*?coding[:=][ \t]*[-\w.]+")
 
 
-def clean_code(code: str) -> str:
+def _is_coding_cookie(tok: tokenize.TokenInfo, encoding: str) -> bool:
     """
-    Remove comments from Python code while preserving indentation.
+    Check whether a comment token is a coding cookie that must be kept.
+
+    Removing the cookie of a source that is not UTF-8 would leave its bytes
+    to be read as UTF-8, so such cookies are not treated as comments.
+
+    Args:
+        tok: Comment token
+        encoding: Encoding of the source
+
+    Returns:
+        True if the comment is a cookie on line 1 or 2 of a non-UTF-8 source
+    """
+    return (
+        tok.start[0] <= 2
+        and encoding not in ("utf-8", "utf-8-sig")
+        and _CODING_COOKIE.match(tok.line) is not None
+    )
+
+
+def _unsafe_error_token(tok: tokenize.TokenInfo) -> bool:
+    """
+    Check whether an error token makes the comments after it unreliable.
+
+    The pure-Python tokenizer reports characters it has no token for as
+    error tokens and carries on correctly: combining marks in identifiers
+    (before Python 3.12), a lone carriage return ending a line, or a stray
+    '$'. These are kept as code. An unterminated string is reported as an
+    error token for its opening quote, and the rest of the line is then
+    tokenized as code, so a comment found there may be string content.
+
+    Args:
+        tok: Error token
+
+    Returns:
+        True if the token opens an unterminated string
+    """
+    return tok.string in ("'", '"')
+
+
+def _comment_spans(
+    code: str,
+    comments: Optional[List[Tuple[int, int, str]]] = None,
+    spans: Optional[List[Tuple[Tuple[int, int], Tuple[int, int]]]] = None,
+) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+    Collect the (row, col) ranges of every comment token in Python code.
 
     Args:
         code: Python code as a string
+        comments: If given, (row, col, text) of each comment is appended to it
+        spans: Empty list to collect the ranges in, so callers can reuse it
 
     Returns:
-        Python code with comments removed
+        List of (start, end) positions of comment tokens, in source order
+
+    Raises:
+        tokenize.TokenError: If a string is not terminated, since the
+            comment positions after it cannot be trusted (see
+            _unsafe_error_token)
     """
-    logger.debug("Cleaning code snippet")
-    result = []
+    if spans is None:
+        spans = []
     source = StringIO(code)
 
-    try:
-        tokens = tokenize.generate_tokens(source.readline)
+    for tok in tokenize.generate_tokens(source.readline):
+        if tok.type == tokenize.COMMENT:
+            spans.append((tok.start, tok.end))
+            if comments is not None:
+                comments.append((tok.start[0], tok.start[1], tok.string))
+        elif tok.type == tokenize.ERRORTOKEN and _unsafe_error_token(tok):
+            raise tokenize.TokenError(f"Unexpected token {tok.string!r}", tok.start)
 
-        for tok in tokens:
-            tok_type = tok.type
-            tok_string = tok.string
+    return spans
 
-            # Skip comment tokens
-            if tok_type == tokenize.COMMENT:
-                logger.debug(f"Removed comment: {tok_string}")
+
+def _splice_spans(code: str, spans: List[Tuple[Tuple[int, int], Tuple[int, int]]]) -> str:
+    """
+    Cut (row, col) ranges out of Python code.
+
+    Args:
+        code: Python code as a string
+        spans: Sorted, non-overlapping (start, end) positions to remove
+
+    Returns:
+        The code with every span removed and everything else left untouched
+    """
+    if not spans:
+        return code
+
+    # Character offset of the start of each row (rows are 1-based)
+    line_starts = [0, 0]
+    line_starts.extend(accumulate(len(line) + 1 for line in code.split("\n")))
+
+    pieces = []
+    position = 0
+    for (start_row, start_col), (end_row, end_col) in spans:
+        start = line_starts[start_row] + start_col
+        pieces.append(code[position:start])
+        position = line_starts[end_row] + end_col
+    pieces.append(code[position:])
+
+    return "".join(pieces)
+
+
+def _splice_offsets(code: str, spans: List[Tuple[int, int]]) -> str:
+    """
+    Cut character ranges out of Python code.
+
+    Args:
+        code: Python code as a string
+        spans: Sorted, non-overlapping (start, end) offsets to remove
+
+    Returns:
+        The code with every span removed
+    """
+    if not spans:
+        return code
+
+    pieces = []
+    position = 0
+    for start, end in spans:
+        pieces.append(code[position:start])
+        position = end
+    pieces.append(code[position:])
+
+    return "".join(pieces)
+
+
+def _comment_byte_spans(
+    data: bytes,
+    comments: Optional[List[Tuple[int, int, str]]] = None,
+    spans: Optional[List[Tuple[int, int]]] = None,
+) -> List[Tuple[int, int]]:
+    """
+    Collect the byte ranges of every comment token in encoded Python source.
+
+    The source is tokenized with tokenize.tokenize, which honours the BOM and
+    PEP 263 coding cookie. Comment positions are mapped back to byte offsets
+    in the original data; on lines where characters and bytes line up, as
+    in ASCII lines, that is plain arithmetic. The coding cookie of a source
+    that is not UTF-8 is kept (see _is_coding_cookie).
+
+    Args:
+        data: Python source as bytes
+        comments: If given, (row, col, text) of each comment is appended to it
+        spans: Empty list to collect the ranges in, so callers can reuse it
+
+    Returns:
+        List of (start, end) byte offsets of comment tokens, in source order
+
+    Raises:
+        tokenize.TokenError: If a string is not terminated (see
+            _unsafe_error_token)
+        SyntaxError: If the coding cookie names an unknown encoding or the
+            data does not decode with it
+    """
+    if spans is None:
+        spans = []
+    source = BytesIO(data)
+    # Byte offset of the start of each row (rows are 1-based); the tokenizer
+    # sees row 1 without its BOM
+    line_starts = [0, 3 if data.startswith(codecs.BOM_UTF8) else 0]
+
+    def readline() -> bytes:
+        line = source.readline()
+        line_starts.append(source.tell())
+        return line
+
+    encoding = None
+    for tok in tokenize.tokenize(readline):
+        if tok.type == tokenize.COMMENT:
+            if _is_coding_cookie(tok, encoding):
                 continue
-            result.append(tok)
+            row, col = tok.start
+            line_start = line_starts[row]
+            if line_starts[row + 1] - line_start == len(tok.line):
+                start = line_start + col
+                end = start + len(tok.string)
+            else:
+                start = line_start + len(tok.line[:col].encode(encoding))
+                end = start + len(tok.string.encode(encoding))
+            spans.append((start, end))
+            if comments is not None:
+                comments.append((row, col, tok.string))
+        elif tok.type == tokenize.ENCODING:
+            # Encoding the text again must not add a second BOM
+            encoding = "utf-8" if tok.string == "utf-8-sig" else tok.string
+        elif tok.type == tokenize.ERRORTOKEN and _unsafe_error_token(tok):
+            raise tokenize.TokenError(f"Unexpected token {tok.string!r}", tok.start)
+
+    return spans
+
+
+def _splice_byte_spans(data: bytes, spans: List[Tuple[int, int]]) -> bytes:
+    """
+    Cut byte ranges out of encoded Python source.
+
+    Args:
+        data: Python source as bytes
+        spans: Sorted, non-overlapping (start, end) byte offsets to remove
+
+    Returns:
+        The source with every span removed, joined from views of the
+        original data without intermediate copies
+    """
+    if not spans:
+        return data
+
+    view = memoryview(data)
+    pieces = []
+    position = 0
+    for start, end in spans:
+        pieces.append(view[position:start])
+        position = end
+    pieces.append(view[position:])
+
+    return b"".join(pieces)
+
+
+def _byte_tokens(data: bytes, comments: Optional[List[Tuple[int, int, str]]] = None) -> List[tokenize.TokenInfo]:
+    """
+    Tokenize encoded Python source, dropping the comment tokens.
+
+    Args:
+        data: Python source as bytes
+        comments: If given, (row, col, text) of each comment is appended to it
+
+    Returns:
+        Every token except comments, starting with the ENCODING token so
+        tokenize.untokenize returns bytes in the source encoding; the coding
+        cookie of a source that is not UTF-8 is kept
+    """
+    result = []
+    for tok in tokenize.tokenize(BytesIO(data).readline):
+        if tok.type == tokenize.ENCODING:
+            encoding = tok.string
+        elif tok.type == tokenize.COMMENT and not _is_coding_cookie(tok, encoding):
+            if comments is not None:
+                comments.append((tok.start[0], tok.start[1], tok.string))
+            continue
+        result.append(tok)
+
+    return result
+
+
+def _untokenize_bytes(data: bytes, tokens: List[tokenize.TokenInfo]) -> bytes:
+    """
+    Rebuild encoded Python source from tokens, keeping a UTF-8 BOM.
+
+    Args:
+        data: Python source the tokens came from
+        tokens: Result of _byte_tokens()
+
+    Returns:
+        The rebuilt source in the source encoding
+    """
+    output = tokenize.untokenize(tokens)
+    if data.startswith(codecs.BOM_UTF8) and not output.startswith(codecs.BOM_UTF8):
+        output = codecs.BOM_UTF8 + output
+    return output
+
+
+def _code_tokens(code: str, comments: Optional[List[Tuple[int, int, str]]] = None) -> List[tokenize.TokenInfo]:
+    """
+    Tokenize Python code, dropping the comment tokens.
+
+    Args:
+        code: Python code as a string
+        comments: If given, (row, col, text) of each comment is appended to it
+
+    Returns:
+        Every token except comments, ready for tokenize.untokenize
+    """
+    result = []
+    source = StringIO(code)
+    tokens = tokenize.generate_tokens(source.readline)
+
+    for tok in tokens:
+        # Skip comment tokens
+        if tok.type == tokenize.COMMENT:
+            if comments is not None:
+                comments.append((tok.start[0], tok.start[1], tok.string))
+            continue
+        result.append(tok)
+
+    return result
+
+
+def _clean_code_observed(code: str, engine: str, comments: Optional[List[Tuple[int, int, str]]] = None) -> str:
+    """
+    Remove comments from Python code, reporting to the instrumentation hooks.
+
+    Args:
+        code: Python code as a string
+        engine: One of ENGINES
+        comments: If given, (row, col, text) of each comment is appended to it
+
+    Returns:
+        Python code with comments removed
+    """
+    if comments is None:
+        comments = []
+    started = perf_counter()
+    offsets = scan_comments(code, comments) if engine == "scan" else None
+    if offsets is not None:
+        tokenized = perf_counter()
+        cleaned = _splice_offsets(code, offsets)
+    elif engine == "untokenize":
+        tokens = _code_tokens(code, comments)
+        tokenized = perf_counter()
+        cleaned = tokenize.untokenize(tokens)
+    else:
+        spans = _comment_spans(code, comments)
+        tokenized = perf_counter()
+        cleaned = _splice_spans(code, spans)
+
+    hooks.phase("tokenize", tokenized - started)
+    hooks.phase("rebuild", perf_counter() - tokenized)
+    for row, col, text in comments:
+        hooks.comment_removed(row, col, text)
+    return cleaned
+
+
+def _clean_bytes_observed(data: bytes, engine: str, comments: Optional[List[Tuple[int, int, str]]] = None) -> bytes:
+    """
+    Remove comments from encoded Python source, reporting to the
+    instrumentation hooks.
+
+    Args:
+        data: Python source as bytes
+        engine: One of ENGINES
+        comments: If given, (row, col, text) of each comment is appended to it
+
+    Returns:
+        Python source with comments removed
+    """
+    if comments is None:
+        comments = []
+    started = perf_counter()
+    spans = scan_comment_bytes(data, comments) if engine == "scan" else None
+    if spans is not None:
+        tokenized = perf_counter()
+        cleaned = _splice_byte_spans(data, spans)
+    elif engine == "untokenize":
+        tokens = _byte_tokens(data, comments)
+        tokenized = perf_counter()
+        cleaned = _untokenize_bytes(data, tokens)
+    else:
+        spans = _comment_byte_spans(data, comments)
+        tokenized = perf_counter()
+        cleaned = _splice_byte_spans(data, spans)
+
+    hooks.phase("tokenize", tokenized - started)
+    hooks.phase("rebuild", perf_counter() - tokenized)
+    for row, col, text in comments:
+        hooks.comment_removed(row, col, text)
+    return cleaned
+
+
+def clean_code(code: str, engine: str = "splice") -> str:
+    """
+    Remove comments from Python code while preserving indentation.
+
+    Args:
+        code: Python code as a string
+        engine: "splice" cuts the comment ranges out of the original text,
+                so the output is the input minus the comments; "scan" finds
+                the same ranges without tokenizing (see scanner), falling
+                back to "splice" when it cannot; "untokenize" rebuilds the
+                code from the remaining tokens
+
+    Returns:
+        Python code with comments removed
+
+    Raises:
+        ValueError: If the engine is not one of ENGINES
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine!r} (expected one of {', '.join(ENGINES)})")
+
+    try:
+        if hooks.observers:
+            return _clean_code_observed(code, engine)
+        if engine == "scan":
+            offsets = scan_comments(code)
+            if offsets is not None:
+                return _splice_offsets(code, offsets)
+        elif engine == "untokenize":
+            # Reconstruct the code with original formatting
+            return tokenize.untokenize(_code_tokens(code))
+        return _splice_spans(code, _comment_spans(code))
 
-        # Reconstruct the code with original formatting
-        return tokenize.untokenize(result)
-    
     except tokenize.TokenError as e:
-        logger.error(f"Tokenization error: {e}")
+        logger.error("Tokenization error: %s", e)
         return code
     except Exception as e:
-        logger.error(f"Unexpected error during code cleaning: {e}")
+        logger.error("Unexpected error during code cleaning: %s", e)
         return code
 
 
-def clean_file(file_path: Union[str, Path], output_path: Optional[Union[str, Path]] = None) -> Tuple[bool, str]:
+def clean_bytes(data: bytes, engine: str = "splice") -> bytes:
+    """
+    Remove comments from encoded Python source.
+
+    The encoding is taken from the BOM or PEP 263 coding cookie (UTF-8 by
+    default), and the output keeps it: the cookie of a source that is not
+    UTF-8 is not removed. With the "splice" engine the comment
+    ranges are cut out of the original bytes, so the source is never
+    decoded and encoded again as a whole.
+
+    Args:
+        data: Python source as bytes
+        engine: Cleaning engine (see clean_code)
+
+    Returns:
+        Python source with comments removed
+
+    Raises:
+        ValueError: If the engine is not one of ENGINES
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine!r} (expected one of {', '.join(ENGINES)})")
+
+    try:
+        if hooks.observers:
+            return _clean_bytes_observed(data, engine)
+        if engine == "scan":
+            spans = scan_comment_bytes(data)
+            if spans is not None:
+                return _splice_byte_spans(data, spans)
+        elif engine == "untokenize":
+            return _untokenize_bytes(data, _byte_tokens(data))
+        return _splice_byte_spans(data, _comment_byte_spans(data))
+
+    except tokenize.TokenError as e:
+        logger.error("Tokenization error: %s", e)
+        return data
+    except Exception as e:
+        logger.error("Unexpected error during code cleaning: %s", e)
+        return data
+
+
+def clean_stream(readable: TextIO, writable: TextIO) -> int:
+    """
+    Remove comments from a stream of Python code with bounded memory.
+
+    Lines are read with readable.readline() and written to writable as soon
+    as the tokenizer is done with them, at the end of each logical line (or
+    earlier inside brackets), so memory use depends on the longest logical
+    line rather than on the size of the input.
+
+    If the tokenizer fails part-way through, the rest of the input is copied
+    unchanged; lines written before the failure stay cleaned.
+
+    Args:
+        readable: Text stream with a readline() method
+        writable: Text stream with a write() method
+
+    Returns:
+        Number of comments removed
+    """
+    return _clean_stream(readable, writable, "utf-8")
+
+
+def _clean_stream(readable: TextIO, writable: TextIO, encoding: str) -> int:
+    """
+    Remove comments from a stream of Python code (see clean_stream).
+
+    Args:
+        readable: Text stream with a readline() method
+        writable: Text stream with a write() method
+        encoding: Encoding the text was decoded from, which decides whether
+                  a coding cookie is kept (see _is_coding_cookie)
+
+    Returns:
+        Number of comments removed
+    """
+    observed = bool(hooks.observers)
+    pending = []  # Physical lines of the current logical line
+    cuts = {}  # Row -> (start_col, end_col) of the comment on that row
+    first_row = 1  # Row of pending[0]
+    removed = 0
+
+    def readline() -> str:
+        line = readable.readline()
+        if line:
+            pending.append(line)
+        return line
+
+    def flush(last_row: int) -> None:
+        nonlocal first_row, removed
+        count = min(last_row - first_row + 1, len(pending))
+        if count <= 0:
+            return
+
+        pieces = []
+        for row, line in enumerate(pending[:count], first_row):
+            cut = cuts.pop(row, None)
+            if cut is None:
+                pieces.append(line)
+            else:
+                pieces.append(line[:cut[0]])
+                pieces.append(line[cut[1]:])
+                removed += 1
+                if observed:
+                    hooks.comment_removed(row, cut[0], line[cut[0]:cut[1]])
+
+        writable.write("".join(pieces))
+        del pending[:count]
+        first_row += count
+
+    try:
+        for tok in tokenize.generate_tokens(readline):
+            tok_type = tok.type
+            if tok_type == tokenize.COMMENT:
+                if not _is_coding_cookie(tok, encoding):
+                    cuts[tok.start[0]] = (tok.start[1], tok.end[1])
+            elif tok_type == tokenize.NEWLINE or tok_type == tokenize.NL:
+                flush(tok.end[0])
+            elif tok_type == tokenize.ERRORTOKEN and _unsafe_error_token(tok):
+                raise tokenize.TokenError(f"Unexpected token {tok.string!r}", tok.start)
+
+        # Lines after the last logical line (only DEDENT/ENDMARKER follow)
+        flush(first_row + len(pending) - 1)
+
+    except (tokenize.TokenError, SyntaxError) as e:
+        logger.error("Tokenization error: %s", e)
+        writable.write("".join(pending))
+        for line in iter(readable.readline, ""):
+            writable.write(line)
+
+    return removed
+
+
+class _DecodingReader:
+    """
+    Text reader over a binary stream for clean_stream, without newline
+    translation.
+    """
+
+    def __init__(self, readable: BinaryIO, encoding: str, lines: List[bytes]) -> None:
+        """
+        Args:
+            readable: Binary stream
+            encoding: Encoding of the stream
+            lines: Lines already read from the stream, returned first
+        """
+        self._readable = readable
+        self._lines = lines
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+
+    def readline(self) -> str:
+        line = self._lines.pop(0) if self._lines else self._readable.readline()
+        return self._decoder.decode(line, final=not line)
+
+
+class _EncodingWriter:
+    """
+    Text writer over a binary stream for clean_stream.
+    """
+
+    def __init__(self, writable: BinaryIO, encoding: str) -> None:
+        """
+        Args:
+            writable: Binary stream
+            encoding: Encoding to write in
+        """
+        self._writable = writable
+        self._encoder = codecs.getincrementalencoder(encoding)()
+
+    def write(self, text: str) -> None:
+        self._writable.write(self._encoder.encode(text))
+
+
+def clean_byte_stream(readable: BinaryIO, writable: BinaryIO) -> int:
+    """
+    Remove comments from a binary stream of Python code with bounded memory.
+
+    Works like clean_stream on the decoded text. The encoding is detected
+    from a BOM or coding cookie as in clean_bytes, and the output is written
+    in the same encoding with the line endings unchanged; the coding cookie
+    of a source that is not UTF-8 is kept.
+
+    Args:
+        readable: Binary stream with a readline() method, such as sys.stdin.buffer
+        writable: Binary stream with a write() method
+
+    Returns:
+        Number of comments removed
+
+    Raises:
+        UnicodeDecodeError: If the input is not valid in its encoding
+    """
+    lines = []  # Lines read while detecting the encoding
+
+    def readline() -> bytes:
+        line = readable.readline()
+        if line:
+            lines.append(line)
+        return line
+
+    try:
+        encoding, _ = tokenize.detect_encoding(readline)
+    except SyntaxError as e:
+        logger.error("Tokenization error: %s", e)
+        writable.write(b"".join(lines))
+        for chunk in iter(partial(readable.read, 64 * 1024), b""):
+            writable.write(chunk)
+        return 0
+
+    return _clean_stream(_DecodingReader(readable, encoding, lines), _EncodingWriter(writable, encoding), encoding)
+
+
+def _read_commented(file_path: Path) -> Optional[bytes]:
+    """
+    Read a Python file, unless it has no '#' byte and so no comments.
+
+    Files of MMAP_THRESHOLD bytes or more are searched through a memory
+    map, so one without comments is never copied into memory.
+
+    Args:
+        file_path: Path to the Python file
+
+    Returns:
+        The file's content, or None if it has no '#' byte
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if mapped.find(b"#") < 0:
+                    return None
+        content = file.read()
+    return content if b"#" in content else None
+
+
+def _pass_through(
+    file_path: Path,
+    output_path: Path,
+    in_place: bool,
+    fsync: bool,
+    link_mode: str,
+    observed: bool,
+) -> Tuple[bool, str]:
+    """
+    Save a file without comments as its own output (see clean_file).
+    """
+    if in_place or output_path.resolve() == file_path.resolve():
+        logger.info("Unchanged: %s", file_path)
+        return True, f"Unchanged: {file_path}"
+
+    if observed:
+        started = perf_counter()
+    method = copy_file(file_path, output_path, link_mode, fsync)
+    if observed:
+        hooks.phase("write", perf_counter() - started)
+        size = output_path.stat().st_size
+        hooks.bytes_processed(file_path, size, size)
+
+    logger.info("No comments, output made by %s: %s -> %s", method, file_path, output_path)
+    return True, f"Successfully cleaned {file_path} -> {output_path}"
+
+
+def cleaned_path(
+    file_path: Union[str, Path],
+    output_dir: Optional[Union[str, Path]] = None,
+    roots: Sequence[Union[str, Path]] = (),
+) -> Path:
+    """
+    Return where the cleaned copy of a file is saved.
+
+    Args:
+        file_path: Python file
+        output_dir: Directory for the cleaned files. If None, the copy is
+                    saved next to the file.
+        roots: Directories the file may have been found under; a file below
+               one of them keeps its directory relative to the outermost
+               one inside output_dir, so files with the same name in
+               different directories do not overwrite each other
+
+    Returns:
+        The file's path with the '_cleaned' suffix, in output_dir if given
+    """
+    file_path = Path(file_path)
+    name = f"{file_path.stem}_cleaned{file_path.suffix}"
+    if output_dir is None:
+        return file_path.parent / name
+
+    directory = None  # type: Optional[str]
+    parent = os.path.dirname(os.path.abspath(str(file_path)))
+    for root in roots:
+        try:
+            relative = os.path.relpath(parent, os.path.abspath(str(root)))
+        except ValueError:
+            # On another drive
+            continue
+        if relative == os.curdir:
+            relative = ""
+        elif relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            continue
+        if directory is None or len(relative) > len(directory):
+            directory = relative
+    return Path(output_dir, directory or "", name)
+
+
+def clean_file(
+    file_path: Union[str, Path],
+    output_path: Optional[Union[str, Path]] = None,
+    engine: str = "splice",
+    cache: Optional[ResultCache] = None,
+    stream: bool = False,
+    in_place: bool = False,
+    fsync: bool = False,
+    minify: bool = False,
+    pyc: Optional[str] = None,
+    optimize: int = -1,
+    link_mode: str = "copy",
+    strip_outputs: bool = False,
+) -> Tuple[bool, str]:
     """
     Remove comments from a Python file and save the result.
 
+    Jupyter notebooks (.ipynb) are cleaned cell by cell with clean_notebook,
+    which also keeps the cleaned cells of each notebook in the cache when
+    given one. They cannot be streamed, minified or compiled.
+
+    A file without a '#' byte has no comments, so its output is the file
+    itself: it is not decoded or tokenized, and the output is made with
+    copy_file (see link_mode). This holds for the "splice" and "scan"
+    engines without minify, pyc, cache, stream or strip_outputs.
+
     Args:
         file_path: Path to the Python file
         output_path: Path where the cleaned file will be saved. If None,
                      a file with '_cleaned' suffix will be created in the same directory.
+        engine: Cleaning engine (see clean_code)
+        cache: Cache used to skip files whose output is already current
+        stream: Clean the file line by line with clean_byte_stream instead of
+                reading it whole, keeping memory use bounded. The engine
+                and cache are not used in this mode.
+        in_place: Replace the file itself, through a temporary file and a
+                  rename, keeping its permissions and mtime. Nothing is
+                  written when the file has no comments.
+        fsync: Flush the output to disk before returning
+        minify: Also remove docstrings and blank lines (see minify_code);
+                the engine is not used and the message reports the bytes
+                saved. Cannot be combined with stream.
+        pyc: Also compile the output to a .pyc in its __pycache__
+             directory, with this invalidation mode (one of
+             PYC_INVALIDATION_MODES), so no compileall pass has to read it
+             again. Files found up to date in the cache are not compiled
+             again. Cannot be combined with stream.
+        optimize: Optimization level of the .pyc (0, 1 or 2), or -1 for the
+                  level of the running interpreter
+        link_mode: How the output of a file without comments is made, one
+                   of LINK_MODES: "copy" copies it in the kernel
+                   (copy_file_range or sendfile), "reflink" clones it on
+                   filesystems that support it and "hardlink" links it to
+                   the input; the last two fall back to "copy"
+        strip_outputs: For notebooks, also clear the outputs and execution
+                       counts of the code cells
 
     Returns:
         Tuple of (success: bool, message: str)
     """
+    if not hooks.observers:
+        return _clean_file(
+            file_path, output_path, engine, cache, stream, in_place, fsync, minify, pyc, optimize, link_mode,
+            strip_outputs,
+        )
+
+    file_path = Path(file_path)
+    hooks.file_start(file_path)
+    success = False
+    try:
+        success, message = _clean_file(
+            file_path, output_path, engine, cache, stream, in_place, fsync, minify, pyc, optimize, link_mode,
+            strip_outputs,
+        )
+    finally:
+        hooks.file_end(file_path, success)
+    return success, message
+
+
+def _clean_file(
+    file_path: Union[str, Path],
+    output_path: Optional[Union[str, Path]],
+    engine: str,
+    cache: Optional[ResultCache],
+    stream: bool,
+    in_place: bool,
+    fsync: bool,
+    minify: bool,
+    pyc: Optional[str],
+    optimize: int,
+    link_mode: str,
+    strip_outputs: bool,
+) -> Tuple[bool, str]:
+    """
+    Remove comments from a Python file and save the result (see clean_file).
+    """
     file_path = Path(file_path)
+    notebook = file_path.suffix.lower() == NOTEBOOK_SUFFIX
 
     try:
         if not file_path.exists():
@@ -75,31 +844,192 @@ def clean_file(file_path: Union[str, Path], output_path: Optional[Union[str, Pat
             logger.error(error_msg)
             return False, error_msg
 
-        if file_path.suffix.lower() != '.py':
+        if file_path.suffix.lower() != '.py' and not notebook:
             error_msg = f"Not a Python file: {file_path}"
             logger.error(error_msg)
             return False, error_msg
 
-        if output_path is None:
-            file_stem = file_path.stem
-            output_path = file_path.parent / f"{file_stem}_cleaned.py"
+        if notebook and (stream or minify or pyc):
+            action = 'stream' if stream else 'minify' if minify else 'compile'
+            error_msg = f"Cannot {action} notebook {file_path}"
+            logger.error(error_msg)
+            return False, error_msg
+
+        if stream and (minify or pyc):
+            error_msg = f"Cannot {'minify' if minify else 'compile'} {file_path} in stream mode"
+            logger.error(error_msg)
+            return False, error_msg
+
+        if pyc is not None and pyc not in PYC_INVALIDATION_MODES:
+            error_msg = f"Unknown invalidation mode: {pyc!r} (expected one of {', '.join(PYC_INVALIDATION_MODES)})"
+            logger.error(error_msg)
+            return False, error_msg
+
+        if link_mode not in LINK_MODES:
+            error_msg = f"Unknown link mode: {link_mode!r} (expected one of {', '.join(LINK_MODES)})"
+            logger.error(error_msg)
+            return False, error_msg
+
+        if in_place:
+            if output_path is not None:
+                error_msg = f"Cannot clean {file_path} in place and write to {output_path}"
+                logger.error(error_msg)
+                return False, error_msg
+            output_path = file_path
+        elif output_path is None:
+            output_path = cleaned_path(file_path)
         else:
             output_path = Path(output_path)
 
-        logger.info(f"Cleaning file: {file_path}")
-        logger.info(f"Output file: {output_path}")
+        logger.info("Cleaning file: %s", file_path)
+        logger.info("Output file: %s", output_path)
+        observed = bool(hooks.observers)
+
+        if stream:
+            # Binary streams keep the encoding and the line endings as they are
+            with open(file_path, 'rb') as readable:
+                if in_place:
+                    input_stat = file_path.stat()
+                    with AtomicFile(file_path, 'wb', fsync=fsync, preserve=input_stat) as atomic_file:
+                        # Without comments the output is the input; leave the file alone
+                        changed = clean_byte_stream(readable, atomic_file.file) > 0
+                        if not changed:
+                            atomic_file.discard()
+                else:
+                    changed = True
+                    break_link(file_path, output_path)
+                    with open(output_path, 'wb') as writable:
+                        clean_byte_stream(readable, writable)
+                        if fsync:
+                            writable.flush()
+                            os.fsync(writable.fileno())
+
+            if observed:
+                hooks.bytes_processed(file_path, file_path.stat().st_size, output_path.stat().st_size)
+            if not changed:
+                logger.info("Unchanged: %s", file_path)
+                return True, f"Unchanged: {file_path}"
+            logger.info("Successfully cleaned %s -> %s", file_path, output_path)
+            return True, f"Successfully cleaned {file_path} -> {output_path}"
+
+        # Skip the file without reading it if neither side changed
+        if cache is not None or in_place:
+            input_stat = file_path.stat()
+        if cache is not None:
+            options_key = cache.options_key(
+                {"engine": engine, "minify": minify, "pyc": pyc, "optimize": optimize, "strip_outputs": strip_outputs}
+            )
+            entry_key = cache.entry_key(file_path, output_path, options_key)
+            entry = cache.get_entry(entry_key)
+            # A cache entry says nothing about the .pyc, which may have been deleted since
+            if cache.is_current(entry, input_stat, output_path) and (
+                pyc is None or pyc_is_current(output_path, pyc, optimize)
+            ):
+                logger.info("Up to date: %s -> %s", file_path, output_path)
+                return True, f"Up to date: {file_path} -> {output_path}"
+
+        if observed:
+            started = perf_counter()
+
+        # Work on the raw bytes: the encoding comes from the file's BOM or
+        # coding cookie, and comments are cut out without decoding it whole
+        if cache is None and not minify and pyc is None and not strip_outputs and engine != "untokenize":
+            content = _read_commented(file_path)
+        else:
+            with open(file_path, 'rb') as file:
+                content = file.read()
+
+        if observed:
+            hooks.phase("read", perf_counter() - started)
+
+        if content is None:
+            return _pass_through(file_path, output_path, in_place, fsync, link_mode, observed)
+
+        if minify:
+            # Imported here: the minify module builds on this one
+            from pycommentcleaner.minify import minify_bytes
+            transform = minify_bytes  # type: Callable[[bytes], bytes]
+        elif notebook:
+            # Imported here: the notebook module builds on this one
+            from pycommentcleaner.notebook import clean_notebook
+            transform = partial(
+                clean_notebook, engine=engine, strip_outputs=strip_outputs, cache=cache,
+                key=os.path.abspath(str(file_path)),
+            )
+        else:
+            transform = partial(clean_bytes, engine=engine)
+
+        if cache is None:
+            cleaned_content = transform(content)
+        else:
+            # Fall back to the content hash, then to outputs cached for the same content
+            digest = cache.content_digest(content)
+            if cache.is_current_digest(entry, digest, output_path) and (
+                pyc is None or pyc_is_current(output_path, pyc, optimize)
+            ):
+                cache.put_entry(entry_key, input_stat, digest, output_path.stat())
+                logger.info("Up to date: %s -> %s", file_path, output_path)
+                return True, f"Up to date: {file_path} -> {output_path}"
+
+            cached_output = cache.get_output(digest, options_key)
+            if cached_output is None:
+                cleaned_content = transform(content)
+                cache.put_output(digest, options_key, cleaned_content)
+            else:
+                cleaned_content = cached_output
+
+        # Nothing to write back when cleaning did not change the file
+        if in_place and cleaned_content == content:
+            if pyc is not None:
+                error_msg = _compile_output(output_path, content, input_stat, pyc, optimize, observed)
+                if error_msg is not None:
+                    return False, error_msg
+            if cache is not None:
+                cache.put_entry(entry_key, input_stat, digest, input_stat)
+            logger.info("Unchanged: %s", file_path)
+            return True, f"Unchanged: {file_path}"
+
+        if observed:
+            started = perf_counter()
 
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
+        if in_place:
+            with AtomicFile(output_path, 'wb', fsync=fsync, preserve=input_stat) as atomic_file:
+                atomic_file.file.write(cleaned_content)
+        else:
+            break_link(file_path, output_path)
+            with open(output_path, 'wb') as file:
+                file.write(cleaned_content)
+                if fsync:
+                    file.flush()
+                    os.fsync(file.fileno())
+
+        if observed:
+            hooks.phase("write", perf_counter() - started)
+            hooks.bytes_processed(file_path, len(content), len(cleaned_content))
+
+        if cache is not None or pyc is not None:
+            output_stat = output_path.stat()
+        if pyc is not None:
+            # Compile the output while it is in memory, against the stat of the saved file
+            error_msg = _compile_output(output_path, cleaned_content, output_stat, pyc, optimize, observed)
+            if error_msg is not None:
+                return False, error_msg
 
-        cleaned_content = clean_code(content)
+        if cache is not None:
+            if in_place:
+                # The cleaned file is now the input of the next run
+                cache.put_entry(entry_key, output_stat, cache.content_digest(cleaned_content), output_stat)
+            else:
+                cache.put_entry(entry_key, input_stat, digest, output_stat)
 
-        with open(output_path, 'w', encoding='utf-8') as file:
-            file.write(cleaned_content)
+        if minify:
+            saved = len(content) - len(cleaned_content)
+            percent = 100 * saved / len(content) if content else 0.0
+            logger.info("Successfully minified %s -> %s", file_path, output_path)
+            return True, f"Successfully minified {file_path} -> {output_path} (saved {saved} bytes, {percent:.1f}%)"
 
-        success_msg = f"Successfully cleaned {file_path} -> {output_path}"
-        logger.info(success_msg)
-        return True, success_msg
+        logger.info("Successfully cleaned %s -> %s", file_path, output_path)
+        return True, f"Successfully cleaned {file_path} -> {output_path}"
 
     except Exception as e:
         error_msg = f"Error cleaning file {file_path}: {str(e)}"
@@ -107,31 +1037,236 @@ def clean_file(file_path: Union[str, Path], output_path: Optional[Union[str, Pat
         return False, error_msg
 
 
-def clean_files(file_paths: List[Union[str, Path]], output_dir: Optional[Union[str, Path]] = None) -> List[Tuple[str, bool, str]]:
+def _compile_output(
+    output_path: Path,
+    data: bytes,
+    output_stat: os.stat_result,
+    pyc: str,
+    optimize: int,
+    observed: bool,
+) -> Optional[str]:
+    """
+    Write the .pyc of a cleaned file (see write_pyc).
+
+    Args:
+        output_path: Path the cleaned source was saved to
+        data: Cleaned source
+        output_stat: Stat result of the saved source
+        pyc: Invalidation mode
+        optimize: Optimization level
+        observed: Whether to report the time to the hooks
+
+    Returns:
+        None on success, or the error message
+    """
+    if observed:
+        started = perf_counter()
+    try:
+        target = write_pyc(data, output_path, invalidation=pyc, optimize=optimize, source_stat=output_stat)
+    except (SyntaxError, ValueError, OSError) as e:
+        error_msg = f"Cannot compile {output_path}: {str(e)}"
+        logger.error(error_msg)
+        return error_msg
+    if observed:
+        hooks.phase("compile", perf_counter() - started)
+    logger.info("Compiled %s -> %s", output_path, target)
+    return None
+
+
+# Chunks handed to each worker; more chunks even out the load, fewer cut IPC
+CHUNKS_PER_WORKER = 4
+
+
+def _make_chunks(tasks: List[Tuple[int, Path, Optional[Path]]], chunk_count: int) -> List[List[Tuple[int, Path, Optional[Path]]]]:
+    """
+    Split tasks into chunks of roughly equal total file size.
+
+    Files are assigned largest first, each to the chunk with the smallest
+    total so far (as shards are, see shard.partition_files), and the
+    heaviest chunks are returned first so the longest work starts early.
+
+    Args:
+        tasks: List of (index, file_path, output_path) tuples
+        chunk_count: Maximum number of chunks to create
+
+    Returns:
+        List of non-empty chunks, heaviest first
+    """
+    chunks, totals = _partition_by_size(tasks, chunk_count, lambda task: _file_size(task[1]))
+    order = sorted(range(chunk_count), key=lambda chunk_index: totals[chunk_index], reverse=True)
+    return [chunks[chunk_index] for chunk_index in order if chunks[chunk_index]]
+
+
+def _clean_chunk(chunk: Iterable[Tuple[int, Path, Optional[Path]]], options: Dict[str, Any]) -> List[Tuple[int, Tuple[str, bool, str]]]:
+    """
+    Clean a chunk of files inside a worker.
+
+    Args:
+        chunk: (index, file_path, output_path) tuples
+        options: Keyword arguments for clean_file
+
+    Returns:
+        List of (index, (file_path, success, message)) tuples
+    """
+    results = []
+    for index, file_path, output_path in chunk:
+        success, message = clean_file(file_path, output_path, **options)
+        results.append((index, (str(file_path), success, message)))
+    return results
+
+
+def _prune_cache(options: Dict[str, Any]) -> None:
+    """
+    Trim the cache passed to a batch, if any, once the batch is done.
+
+    Args:
+        options: Keyword arguments for clean_file
+    """
+    cache = options.get("cache")
+    if cache is not None:
+        cache.prune()
+
+
+def clean_files(
+    file_paths: Iterable[Union[str, Path]],
+    output_dir: Optional[Union[str, Path]] = None,
+    jobs: Optional[int] = None,
+    backend: str = "process",
+    roots: Sequence[Union[str, Path]] = (),
+    **options: Any,
+) -> List[Tuple[str, bool, str]]:
     """
     Remove comments from multiple Python files.
 
+    With output_dir, a file whose output would overwrite the output of an
+    earlier file fails instead.
+
     Args:
-        file_paths: List of paths to Python files
+        file_paths: Paths to Python files
         output_dir: Directory where cleaned files will be saved. If None,
                     files with '_cleaned' suffix will be created in the same directory.
+        jobs: Number of parallel workers. None or 1 cleans the files one at a
+              time, 0 uses one worker per CPU.
+        backend: "process", "thread" or "serial"; ignored when running serially
+        roots: Directories the files were found under, whose layout is kept
+               in output_dir (see cleaned_path)
+        options: Keyword arguments passed on to clean_file, such as engine
+                 and cache
 
     Returns:
-        List of tuples with (file_path, success, message) for each processed file
+        List of tuples with (file_path, success, message) for each processed file,
+        in the same order as file_paths
+
+    Raises:
+        ValueError: If the backend is not one of BACKENDS, jobs is negative,
+            or output_dir is combined with in_place
     """
-    results = []
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend!r} (expected one of {', '.join(BACKENDS)})")
+    if jobs is not None and jobs < 0:
+        raise ValueError(f"jobs must be 0 or greater, got {jobs}")
+    if output_dir and options.get("in_place"):
+        raise ValueError("output_dir cannot be used when cleaning in place")
 
-    for file_path in file_paths:
-        file_path = Path(file_path)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
 
-        if output_dir:
-            output_dir = Path(output_dir)
-            output_dir.mkdir(parents=True, exist_ok=True)
-            output_path = output_dir / f"{file_path.stem}_cleaned.py"
-        else:
+    if output_dir:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Results of the files refused before cleaning, by index
+    refused = {}  # type: Dict[int, Tuple[str, bool, str]]
+
+    def tasks() -> Iterator[Tuple[int, Path, Optional[Path]]]:
+        targets = {}  # type: Dict[Path, Path]
+        for index, file_path in enumerate(file_paths):
+            file_path = Path(file_path)
             output_path = None
+            if output_dir:
+                output_path = cleaned_path(file_path, output_dir, roots)
+                first = targets.setdefault(output_path, file_path)
+                if first != file_path:
+                    error_msg = f"Cannot clean {file_path}: {output_path} is the output of {first}"
+                    logger.error(error_msg)
+                    refused[index] = (str(file_path), False, error_msg)
+                    continue
+                if output_path.parent != output_dir:
+                    output_path.parent.mkdir(parents=True, exist_ok=True)
+            yield index, file_path, output_path
 
-        success, message = clean_file(file_path, output_path)
-        results.append((str(file_path), success, message))
+    # Run serially, consuming file_paths lazily
+    if not jobs or jobs == 1 or backend == "serial":
+        cleaned = dict(_clean_chunk(tasks(), options))
+        cleaned.update(refused)
+        _prune_cache(options)
+        return [cleaned[index] for index in sorted(cleaned)]
 
+    task_list = list(tasks())
+    if not task_list:
+        return [refused[index] for index in sorted(refused)]
+
+    workers = min(jobs, len(task_list))
+    chunks = _make_chunks(task_list, min(len(task_list), workers * CHUNKS_PER_WORKER))
+    logger.info("Cleaning %d files in %d chunks with %d %s workers", len(task_list), len(chunks), workers, backend)
+
+    # Imported here; only parallel runs need the pools
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    executor_class = ProcessPoolExecutor if backend == "process" else ThreadPoolExecutor
+    results = [None] * (len(task_list) + len(refused))
+    for index, result in refused.items():
+        results[index] = result
+    with executor_class(max_workers=workers) as executor:
+        for chunk_results in executor.map(partial(_clean_chunk, options=options), chunks):
+            for index, result in chunk_results:
+                results[index] = result
+
+    _prune_cache(options)
     return results
+
+
+def clean_paths(
+    paths: Iterable[Union[str, Path]],
+    output_dir: Optional[Union[str, Path]] = None,
+    include: Sequence[str] = DEFAULT_INCLUDE,
+    exclude: Sequence[str] = DEFAULT_EXCLUDE,
+    use_gitignore: bool = True,
+    jobs: Optional[int] = None,
+    backend: str = "process",
+    shard: Optional[Tuple[int, int]] = None,
+    **options: Any,
+) -> List[Tuple[str, bool, str]]:
+    """
+    Remove comments from Python files and the Python files under directories.
+
+    Directories are walked lazily; when running serially each file is
+    cleaned as soon as it is found.
+
+    Args:
+        paths: Files and directories to process
+        output_dir: Directory where cleaned files will be saved, keeping
+                    the layout of the directories walked. If None, files
+                    with '_cleaned' suffix will be created in the same directory.
+        include: Glob patterns a discovered file must match
+        exclude: Glob patterns that skip a discovered file or directory
+        use_gitignore: Whether to skip paths matched by .gitignore files
+        jobs: Number of parallel workers (see clean_files)
+        backend: "process", "thread" or "serial" (see clean_files)
+        shard: (index, count) to clean only one of count shards of the
+               files found, numbered from 1, as split by shard_files; the
+               whole tree is walked first
+        options: Keyword arguments passed on to clean_file
+
+    Returns:
+        List of tuples with (file_path, success, message) for each processed file
+
+    Raises:
+        ValueError: If the shard does not exist (see shard_files)
+    """
+    paths = list(paths)
+    roots = [path for path in paths if os.path.isdir(str(path))]
+    file_paths = iter_python_files(paths, include=include, exclude=exclude, use_gitignore=use_gitignore)
+    if shard is not None:
+        file_paths = shard_files(file_paths, *shard).files
+    return clean_files(file_paths, output_dir=output_dir, jobs=jobs, backend=backend, roots=roots, **options)
@@ -0,0 +1,499 @@
+"""
+Long-running cleaner server for pre-commit hooks and editor integrations.
+
+Each pycommentcleaner run pays interpreter startup and imports before it
+does any work, which dominates when a hook or a save action cleans a few
+files hundreds of times an hour. The daemon keeps one process warm, with
+an in-memory result cache, and serves requests over a Unix socket until it
+has been idle for a while.
+
+The protocol is one JSON object per line in each direction. Requests have
+an "op" field:
+
+    {"op": "clean_files", "paths": [...], "output_dir": null, "roots": [...], "in_place": false}
+        -> {"ok": true, "results": [[path, success, message], ...]}
+    {"op": "clean_code", "code": "...", "engine": "splice"}
+        -> {"ok": true, "output": "..."}
+    {"op": "ping"} -> {"ok": true, "pid": 1234, "version": "0.1.1"}
+    {"op": "shutdown"} -> {"ok": true}
+
+Failed requests get {"ok": false, "error": "..."}. Paths are resolved by
+the daemon, so clients send absolute paths. Requests may carry the
+client's "version"; a daemon of another version refuses all but ping and
+shutdown, and the client replaces a daemon it started with its own.
+
+The default socket lives in $XDG_RUNTIME_DIR, or else in a directory of
+the temporary directory that only its owner can use; clients refuse to
+connect to a socket that belongs to another user.
+
+Unix only.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from pycommentcleaner import __version__
+from pycommentcleaner.defaults import DEFAULT_IDLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# How often the server wakes up to check the idle timeout, in seconds
+_POLL_INTERVAL = 0.5
+
+# How long a client waits for a daemon it started to accept connections
+_START_TIMEOUT = 10.0
+
+
+def default_socket_path() -> str:
+    """
+    Return the socket path used when none is given.
+
+    The temporary directory is shared, so the socket is not put there
+    directly, where another user could bind it first, but in a
+    pycommentcleaner-<uid> directory created with mode 0700.
+
+    Returns:
+        pycommentcleaner.sock in $XDG_RUNTIME_DIR if it is set, otherwise
+        daemon.sock in the private directory
+
+    Raises:
+        OSError: If the directory belongs to another user or others can
+                 use it
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(_check_private_directory(runtime_dir), "pycommentcleaner.sock")
+    directory = os.path.join(tempfile.gettempdir(), f"pycommentcleaner-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    return os.path.join(_check_private_directory(directory), "daemon.sock")
+
+
+def _check_private_directory(directory: str) -> str:
+    """
+    Check that a directory belongs to the current user and no one else can use it.
+
+    Args:
+        directory: Path of the directory
+
+    Returns:
+        The directory
+
+    Raises:
+        OSError: If it is not a directory (a symlink is not followed),
+                 belongs to another user or has group or other permissions
+    """
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise OSError(f"{directory} is not a directory")
+    if info.st_uid != os.getuid():
+        raise OSError(f"{directory} belongs to another user")
+    if info.st_mode & 0o077:
+        raise OSError(f"{directory} can be used by other users (mode {stat.S_IMODE(info.st_mode):o})")
+    return directory
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Serve the requests of one client connection.
+    """
+
+    def handle(self) -> None:
+        server = self.server
+        for line in self.rfile:
+            server.touch(+1)
+            try:
+                response = server.dispatch(line)
+            finally:
+                server.touch(-1)
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            if server.stopping:
+                break
+
+
+class CleanerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server holding a warm cleaner and its result cache.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Union[str, Path], idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+                 max_bytes: Optional[int] = None) -> None:
+        """
+        Bind the socket.
+
+        Args:
+            socket_path: Path of the Unix socket
+            idle_timeout: Seconds without requests after which serve()
+                          returns; None or 0 keeps the server running
+            max_bytes: Size of the in-memory result cache
+
+        Raises:
+            OSError: If another daemon is already listening on the socket
+        """
+        from pycommentcleaner.cache import DEFAULT_MAX_BYTES, MemoryCache
+
+        self.socket_path = str(socket_path)
+        self.idle_timeout = idle_timeout
+        self.cache = MemoryCache(DEFAULT_MAX_BYTES if max_bytes is None else max_bytes)
+        self.stopping = False
+        self._active = 0
+        self._last_request = time.monotonic()
+        self._lock = threading.Lock()
+
+        _remove_stale_socket(self.socket_path)
+        # Only the owner may talk to the daemon
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(self.socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def touch(self, delta: int) -> None:
+        """
+        Record the start (+1) or end (-1) of a request.
+
+        Args:
+            delta: Change in the number of requests in progress
+        """
+        with self._lock:
+            self._active += delta
+            self._last_request = time.monotonic()
+
+    def idle(self) -> bool:
+        """
+        Check whether the idle timeout has passed.
+
+        Returns:
+            True if no request is in progress and none arrived for
+            idle_timeout seconds
+        """
+        if not self.idle_timeout:
+            return False
+        with self._lock:
+            return self._active == 0 and time.monotonic() - self._last_request >= self.idle_timeout
+
+    def serve(self) -> None:
+        """
+        Serve requests until the idle timeout passes or a client asks the
+        server to shut down, then remove the socket.
+        """
+        self.timeout = _POLL_INTERVAL
+        logger.info("Listening on %s", self.socket_path)
+        try:
+            while not self.stopping and not self.idle():
+                self.handle_request()
+        finally:
+            self.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        logger.info("Daemon stopped")
+
+    def dispatch(self, line: bytes) -> Dict[str, Any]:
+        """
+        Handle one request.
+
+        Args:
+            line: JSON-encoded request
+
+        Returns:
+            The response to send back
+        """
+        try:
+            request = json.loads(line.decode("utf-8"))
+            op = request["op"]
+            if op == "ping":
+                return {"ok": True, "pid": os.getpid(), "version": __version__}
+            if op == "shutdown":
+                self.stopping = True
+                return {"ok": True}
+            version = request.get("version", __version__)
+            if version != __version__:
+                return {"ok": False, "error": f"Daemon runs version {__version__}, not {version}"}
+            if op == "clean_files":
+                return {"ok": True, "results": self._clean_files(request)}
+            if op == "clean_code":
+                return {"ok": True, "output": self._clean_code(request["code"], request.get("engine", "splice"))}
+            return {"ok": False, "error": f"Unknown op: {op!r}"}
+        except Exception as e:
+            logger.error(f"Bad request: {e}")
+            return {"ok": False, "error": str(e)}
+
+    def _clean_files(self, request: Dict[str, Any]) -> List[Tuple[str, bool, str]]:
+        """
+        Clean the files of a clean_files request.
+        """
+        from pycommentcleaner.core import clean_files
+
+        return clean_files(
+            request["paths"],
+            output_dir=request.get("output_dir"),
+            backend="serial",
+            roots=request.get("roots", ()),
+            engine=request.get("engine", "splice"),
+            cache=self.cache,
+            in_place=bool(request.get("in_place")),
+            fsync=bool(request.get("fsync")),
+        )
+
+    def _clean_code(self, code: str, engine: str) -> str:
+        """
+        Clean source sent by a client, reusing outputs cached for the same source.
+        """
+        from pycommentcleaner.core import clean_code
+
+        cache = self.cache
+        digest = cache.content_digest(code.encode("utf-8"))
+        options_key = cache.options_key({"engine": engine})
+        cached_output = cache.get_output(digest, options_key)
+        if cached_output is not None:
+            return cached_output.decode("utf-8")
+
+        output = clean_code(code, engine=engine)
+        cache.put_output(digest, options_key, output.encode("utf-8"))
+        return output
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """
+    Remove a socket left behind by a daemon that is no longer running.
+
+    Args:
+        socket_path: Path of the Unix socket
+
+    Raises:
+        OSError: If a daemon is still listening on the socket
+    """
+    if not os.path.exists(socket_path):
+        return
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+        return
+    raise OSError(f"A daemon is already listening on {socket_path}")
+
+
+def serve(socket_path: Optional[Union[str, Path]] = None, idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+          max_bytes: Optional[int] = None) -> None:
+    """
+    Run the daemon in the current process until it is idle or shut down.
+
+    Args:
+        socket_path: Path of the Unix socket (default: default_socket_path())
+        idle_timeout: Seconds without requests before exiting; None or 0
+                      keeps the daemon running
+        max_bytes: Size of the in-memory result cache
+    """
+    CleanerServer(socket_path or default_socket_path(), idle_timeout, max_bytes).serve()
+
+
+def _start_daemon(socket_path: str, idle_timeout: Optional[float]) -> None:
+    """
+    Start a daemon in the background and wait until it accepts connections.
+
+    Args:
+        socket_path: Path of the Unix socket
+        idle_timeout: Idle timeout passed to the daemon
+
+    Raises:
+        OSError: If the daemon does not come up in time
+    """
+    command = [sys.executable, "-m", "pycommentcleaner.cli", "--daemon", "--socket", socket_path,
+               "--idle-timeout", str(idle_timeout or 0)]
+    subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+    deadline = time.monotonic() + _START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(socket_path)
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise OSError(f"Daemon did not start listening on {socket_path}")
+
+
+def _wait_stopped(socket_path: str) -> None:
+    """
+    Wait until a daemon that was asked to shut down has removed its socket.
+
+    Args:
+        socket_path: Path of the Unix socket
+
+    Raises:
+        OSError: If the daemon does not stop in time
+    """
+    deadline = time.monotonic() + _START_TIMEOUT
+    while os.path.exists(socket_path):
+        if time.monotonic() >= deadline:
+            raise OSError(f"Daemon on {socket_path} did not stop")
+        time.sleep(0.05)
+
+
+class Client:
+    """
+    Connection to a daemon of the same version.
+
+    Example:
+        with Client() as client:
+            cleaned = client.clean_code(code)
+    """
+
+    def __init__(self, socket_path: Optional[Union[str, Path]] = None, start: bool = False,
+                 idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT) -> None:
+        """
+        Connect to a daemon.
+
+        Args:
+            socket_path: Path of the Unix socket (default: default_socket_path())
+            start: Start a daemon in the background if none is listening,
+                   or in place of one of another version
+            idle_timeout: Idle timeout of a daemon started by this client
+
+        Raises:
+            OSError: If no daemon can be reached, the socket belongs to
+                     another user, or the daemon runs another version
+                     and start is False
+        """
+        self.socket_path = str(socket_path or default_socket_path())
+        try:
+            self._connect()
+        except PermissionError:
+            raise
+        except OSError:
+            if not start:
+                raise
+            _start_daemon(self.socket_path, idle_timeout)
+            self._connect()
+
+        version = self.request("ping").get("version")
+        if version != __version__:
+            if not start:
+                self.close()
+                raise OSError(f"Daemon on {self.socket_path} runs version {version}, not {__version__}")
+            logger.info("Restarting daemon of version %s", version)
+            self.shutdown()
+            self.close()
+            _wait_stopped(self.socket_path)
+            _start_daemon(self.socket_path, idle_timeout)
+            self._connect()
+
+    def _connect(self) -> None:
+        """
+        Connect to the socket, after checking that it belongs to the current user.
+
+        Raises:
+            PermissionError: If the socket belongs to another user
+            OSError: If no daemon is listening on the socket
+        """
+        if os.stat(self.socket_path).st_uid != os.getuid():
+            raise PermissionError(f"{self.socket_path} belongs to another user")
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(self.socket_path)
+        except BaseException:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rwb")
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the connection.
+        """
+        self._file.close()
+        self._socket.close()
+
+    def request(self, op: str, **fields: Any) -> Dict[str, Any]:
+        """
+        Send a request and wait for the response.
+
+        Args:
+            op: Operation name
+            fields: Other request fields
+
+        Returns:
+            The response
+
+        Raises:
+            OSError: If the daemon closed the connection
+            RuntimeError: If the daemon reports an error
+        """
+        fields["op"] = op
+        fields["version"] = __version__
+        self._file.write(json.dumps(fields).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise OSError(f"Daemon at {self.socket_path} closed the connection")
+        response = json.loads(line.decode("utf-8"))
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "Unknown daemon error"))
+        return response
+
+    def clean_files(self, paths: List[Union[str, Path]], output_dir: Optional[Union[str, Path]] = None,
+                    roots: Sequence[Union[str, Path]] = (), **options: Any) -> List[Tuple[str, bool, str]]:
+        """
+        Clean files in the daemon (see core.clean_files).
+
+        Args:
+            paths: Python files; relative paths are made absolute first
+            output_dir: Directory where cleaned files will be saved
+            roots: Directories the files were found under
+            options: engine, in_place or fsync
+
+        Returns:
+            List of tuples with (file_path, success, message) for each file
+        """
+        response = self.request(
+            "clean_files",
+            paths=[os.path.abspath(str(path)) for path in paths],
+            output_dir=os.path.abspath(str(output_dir)) if output_dir else None,
+            roots=[os.path.abspath(str(root)) for root in roots],
+            **options
+        )
+        return [tuple(result) for result in response["results"]]
+
+    def clean_code(self, code: str, engine: str = "splice") -> str:
+        """
+        Clean source in the daemon (see core.clean_code).
+
+        Args:
+            code: Python code as a string
+            engine: Cleaning engine
+
+        Returns:
+            Python code with comments removed
+        """
+        return self.request("clean_code", code=code, engine=engine)["output"]
+
+    def shutdown(self) -> None:
+        """
+        Ask the daemon to exit.
+        """
+        self.request("shutdown")
@@ -0,0 +1,36 @@
+"""
+Option choices and defaults shared by the library and the command line.
+
+This module imports nothing, so the command-line parser can be built (and
+--help or --version answered) without loading the cleaner itself.
+"""
+
+# Cleaning engines accepted by clean_code
+ENGINES = ("splice", "untokenize", "scan")
+
+# Worker pools accepted by clean_files
+BACKENDS = ("serial", "thread", "process")
+
+DEFAULT_CACHE_DIR = ".pycommentcleaner_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Files read, cleaned or written at the same time by aclean_files
+DEFAULT_CONCURRENCY = 16
+
+# Source bytes held in memory at once by aclean_files; reading pauses beyond this
+DEFAULT_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024
+
+# Seconds without requests after which the daemon exits
+DEFAULT_IDLE_TIMEOUT = 600
+
+# Invalidation modes of the .pyc files written by clean_file (PEP 552)
+PYC_INVALIDATION_MODES = ("timestamp", "checked-hash", "unchecked-hash")
+
+# How clean_file produces the output of a file without comments
+LINK_MODES = ("copy", "hardlink", "reflink")
+
+# Files from this size on are searched for '#' through a memory map
+MMAP_THRESHOLD = 1024 * 1024
+
+# Jupyter notebooks, whose code cells clean_file cleans
+NOTEBOOK_SUFFIX = ".ipynb"
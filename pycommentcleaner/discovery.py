@@ -0,0 +1,408 @@
+"""
+Discovery of Python files under directories.
+
+This module walks directory trees lazily with os.scandir, pruning excluded
+directories and .gitignore matches before descending into them, and yields
+the Python files it finds as soon as they are seen.
+"""
+
+import logging
+import os
+import re
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Pattern, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Bytes read at a time from NUL-separated path lists
+_READ_SIZE = 64 * 1024
+
+DEFAULT_INCLUDE = ("*.py", "*.ipynb")
+
+DEFAULT_EXCLUDE = (
+    ".git",
+    ".hg",
+    ".svn",
+    ".tox",
+    ".nox",
+    ".venv",
+    "venv",
+    "__pycache__",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".pycommentcleaner_cache",
+    ".ipynb_checkpoints",
+    "build",
+    "dist",
+    "*.egg-info",
+    "*_cleaned.py",
+    "*_cleaned.ipynb",
+)
+
+
+def _translate_gitignore(pattern: str) -> str:
+    """
+    Translate a gitignore glob into a regular expression.
+
+    Args:
+        pattern: Glob with any leading '/' and trailing '/' already removed
+
+    Returns:
+        Regular expression source matching a whole '/'-separated path
+    """
+    parts = []
+    i = 0
+    length = len(pattern)
+
+    while i < length:
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            # Zero or more leading directories
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == length:
+            # Everything inside the directory
+            parts.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif char == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif char == "?":
+            parts.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                i = end + 1
+        elif char == "\\" and i + 1 < length:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(char))
+            i += 1
+
+    return "".join(parts)
+
+
+class GitIgnore:
+    """
+    Rules from a single .gitignore file.
+
+    Patterns without a '/' match a name at any depth below the file's
+    directory; patterns with a '/' are matched against the path relative
+    to it. Later rules override earlier ones, and '!' re-includes a path.
+    """
+
+    def __init__(self, base: Union[str, Path], lines: Iterable[str]) -> None:
+        """
+        Compile the rules of a .gitignore file.
+
+        Args:
+            base: Directory containing the .gitignore file
+            lines: Lines of the .gitignore file
+        """
+        self.base = str(base)
+        self.rules = []  # type: List[Tuple[Pattern, bool, bool, bool]]
+
+        for line in lines:
+            line = line.rstrip("\n").rstrip("\r")
+            # Trailing spaces are ignored unless escaped
+            if not line.endswith("\\ "):
+                line = line.rstrip(" ")
+            if not line or line.startswith("#"):
+                continue
+
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+
+            regex = re.compile(_translate_gitignore(line) + r"\Z", re.DOTALL)
+            self.rules.append((regex, negate, dir_only, anchored))
+
+    @classmethod
+    def from_directory(cls, directory: Union[str, Path]) -> Optional["GitIgnore"]:
+        """
+        Load the .gitignore file of a directory.
+
+        Args:
+            directory: Directory that may contain a .gitignore file
+
+        Returns:
+            The parsed rules, or None if there is no readable .gitignore file
+        """
+        try:
+            with open(os.path.join(str(directory), ".gitignore"), "r", encoding="utf-8", errors="replace") as file:
+                ignore = cls(directory, file)
+        except OSError:
+            return None
+        return ignore if ignore.rules else None
+
+    def match(self, relative: str, is_dir: bool) -> Optional[bool]:
+        """
+        Check a path against the rules.
+
+        Args:
+            relative: '/'-separated path relative to the .gitignore directory
+            is_dir: Whether the entry is a directory
+
+        Returns:
+            True if the path is ignored, False if it is explicitly re-included,
+            None if no rule matches
+        """
+        name = relative.rsplit("/", 1)[-1]
+
+        result = None
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relative if anchored else name):
+                result = not negate
+        return result
+
+
+# A .gitignore file together with how to turn a path relative to the walked
+# directory into one relative to the .gitignore directory: drop `offset`
+# leading characters, then prepend `prefix`
+_ScopedIgnore = Tuple[GitIgnore, int, str]
+
+
+def _is_ignored(relative: str, is_dir: bool, ignores: Sequence[_ScopedIgnore]) -> bool:
+    """
+    Check a path against a stack of .gitignore files, deepest last.
+
+    Args:
+        relative: '/'-separated path relative to the walked directory
+        is_dir: Whether the entry is a directory
+        ignores: Rules from the enclosing directories, outermost first
+
+    Returns:
+        True if the last matching rule ignores the path
+    """
+    ignored = False
+    for ignore, offset, prefix in ignores:
+        result = ignore.match(prefix + relative[offset:], is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+
+def _matches(name: str, relative: str, patterns: Sequence[str]) -> bool:
+    """
+    Check an entry against glob patterns.
+
+    Patterns containing '/' are matched against the path relative to the
+    directory being walked, all others against the entry name.
+
+    Args:
+        name: Entry name
+        relative: '/'-separated path relative to the walked directory
+        patterns: Glob patterns
+
+    Returns:
+        True if any pattern matches
+    """
+    for pattern in patterns:
+        if fnmatchcase(relative if "/" in pattern else name, pattern):
+            return True
+    return False
+
+
+def is_selected(relative: str, include: Sequence[str], exclude: Sequence[str]) -> bool:
+    """
+    Apply the discovery patterns to a path that was listed rather than walked.
+
+    Every directory in the path is checked against exclude, so pass it
+    relative to the directory it was listed from, never as an absolute
+    path whose ancestors could match.
+
+    Args:
+        relative: '/'-separated path, such as one relative to a repository root
+        include: Glob patterns the file must match
+        exclude: Glob patterns that skip the file or any directory above it
+
+    Returns:
+        True if the file should be cleaned
+    """
+    parts = relative.split("/")
+    for index, part in enumerate(parts):
+        if _matches(part, "/".join(parts[:index + 1]), exclude):
+            return False
+    return _matches(parts[-1], relative, include)
+
+
+def _parent_ignores(directory: Path) -> List[_ScopedIgnore]:
+    """
+    Load the .gitignore files between a directory and its repository root.
+
+    Args:
+        directory: Directory about to be walked
+
+    Returns:
+        Rules from the repository root down to the directory's parent, or an
+        empty list if the directory is not inside a git repository
+    """
+    directory = directory.resolve()
+    if (directory / ".git").exists():
+        return []
+
+    parents = []
+    for parent in directory.parents:
+        parents.append(parent)
+        if (parent / ".git").exists():
+            break
+    else:
+        return []
+
+    ignores = []
+    for parent in reversed(parents):
+        ignore = GitIgnore.from_directory(parent)
+        if ignore is not None:
+            prefix = directory.relative_to(parent).as_posix() + "/"
+            ignores.append((ignore, 0, prefix))
+    return ignores
+
+
+def _walk(
+    root: Path,
+    include: Sequence[str],
+    exclude: Sequence[str],
+    use_gitignore: bool,
+) -> Iterator[Path]:
+    """
+    Walk a directory tree and yield the files that pass the filters.
+
+    Args:
+        root: Directory to walk
+        include: Glob patterns a file must match
+        exclude: Glob patterns that skip a file or prune a directory
+        use_gitignore: Whether to honour .gitignore files
+
+    Yields:
+        Paths of matching files, in a stable order
+    """
+    root_str = str(root)
+    ignores = tuple(_parent_ignores(root)) if use_gitignore else ()
+    stack = [(root_str, "", ignores)]
+
+    while stack:
+        directory, relative_dir, ignores = stack.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Cannot read directory {directory}: {e}")
+            continue
+
+        if use_gitignore and any(entry.name == ".gitignore" for entry in entries):
+            ignore = GitIgnore.from_directory(directory)
+            if ignore is not None:
+                ignores = ignores + ((ignore, len(relative_dir), ""),)
+
+        subdirs = []
+        for entry in entries:
+            relative = f"{relative_dir}{entry.name}"
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                is_file = not is_dir and entry.is_file()
+            except OSError:
+                continue
+
+            if not (is_dir or is_file):
+                continue
+            if _matches(entry.name, relative, exclude):
+                continue
+            if ignores and _is_ignored(relative, is_dir, ignores):
+                continue
+
+            if is_dir:
+                subdirs.append((entry.path, f"{relative}/", ignores))
+            elif _matches(entry.name, relative, include):
+                yield Path(entry.path)
+
+        # Push in reverse so subdirectories are visited in name order
+        stack.extend(reversed(subdirs))
+
+
+def iter_python_files(
+    paths: Iterable[Union[str, Path]],
+    include: Sequence[str] = DEFAULT_INCLUDE,
+    exclude: Sequence[str] = DEFAULT_EXCLUDE,
+    use_gitignore: bool = True,
+) -> Iterator[Path]:
+    """
+    Expand files and directories into the Python files to clean.
+
+    Paths that are not directories are yielded unchanged, so explicitly
+    named files are never filtered out and missing files are reported by
+    the cleaner. Directories are walked lazily and excluded directories are
+    pruned before they are entered.
+
+    Args:
+        paths: Files and directories to expand
+        include: Glob patterns a discovered file must match
+        exclude: Glob patterns that skip a discovered file or directory
+        use_gitignore: Whether to skip paths matched by .gitignore files
+
+    Yields:
+        Paths of files to clean, as they are found
+    """
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            yield from _walk(path, include, exclude, use_gitignore)
+        else:
+            yield path
+
+
+def read_path_list(readable: BinaryIO, null: bool = False) -> Iterator[str]:
+    """
+    Read a list of paths, yielding each one as soon as it arrives.
+
+    Args:
+        readable: Binary stream, such as sys.stdin.buffer
+        null: Paths are separated by NUL characters (as written by
+              "find -print0" or "git ls-files -z") instead of newlines
+
+    Yields:
+        Paths in the list, skipping empty entries
+    """
+    if not null:
+        for line in readable:
+            path = line.rstrip(b"\r\n")
+            if path:
+                yield os.fsdecode(path)
+        return
+
+    pending = b""
+    while True:
+        # read1 returns what has arrived instead of waiting for a full block
+        chunk = readable.read1(_READ_SIZE)
+        if not chunk:
+            break
+        paths = (pending + chunk).split(b"\0")
+        pending = paths.pop()
+        for path in paths:
+            if path:
+                yield os.fsdecode(path)
+    if pending:
+        yield os.fsdecode(pending)
@@ -0,0 +1,306 @@
+"""
+File helpers shared by the cleaner and its cache.
+"""
+
+import errno
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import IO, Any, BinaryIO, Optional, Tuple, Union
+
+from pycommentcleaner.defaults import LINK_MODES
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+# ioctl that clones a file's extents into another (Btrfs, XFS, bcachefs...)
+_FICLONE = 0x40049409 if sys.platform.startswith("linux") and fcntl is not None else None
+
+# Errors meaning the kernel cannot copy or clone between these two files,
+# so the next method is tried
+_UNSUPPORTED = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+# Flags for creating a temporary file; O_EXCL never opens an existing file
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+
+def _create_temp(directory: str) -> Tuple[int, str]:
+    """
+    Create a new hidden temporary file in a directory.
+
+    Unlike tempfile.mkstemp, which creates 0600 files, the file is opened
+    with mode 0666, so the umask gives it the mode of any new file without
+    the process having to read the umask, which means changing it.
+
+    Args:
+        directory: Directory to create the file in
+
+    Returns:
+        Tuple of (file descriptor, path)
+
+    Raises:
+        FileExistsError: If no unused name was found
+    """
+    for _ in range(tempfile.TMP_MAX):
+        path = os.path.join(directory, f".{os.urandom(6).hex()}.tmp")
+        try:
+            return os.open(path, _TEMP_FLAGS, 0o666), path
+        except FileExistsError:
+            continue
+    raise FileExistsError(errno.EEXIST, "No unused temporary file name", directory)
+
+
+class AtomicFile:
+    """
+    File that replaces its destination in a single rename when closed.
+
+    Data is written to a temporary file in the destination's directory, so
+    readers never see a partial file. A destination that is a symbolic link
+    is resolved first, so the file it points to is replaced and the link
+    is kept. Used as a context manager: the destination is replaced when
+    the block exits normally, and left untouched if it raises or discard()
+    was called.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        mode: str = "wb",
+        fsync: bool = False,
+        preserve: Optional[os.stat_result] = None,
+        **open_kwargs: Any,
+    ) -> None:
+        """
+        Create the temporary file.
+
+        Args:
+            path: Destination file
+            mode: Write mode for the temporary file ("wb" or "w")
+            fsync: Whether to flush the data to disk before the rename
+            preserve: Stat result whose permissions and timestamps are
+                      applied to the new file
+            open_kwargs: Extra arguments for opening the file, such as encoding
+        """
+        self.path = os.path.realpath(str(path))
+        self.fsync = fsync
+        self.preserve = preserve
+        self.discarded = False
+
+        directory = os.path.dirname(self.path) or "."
+        fd, self.temp_path = _create_temp(directory)
+        try:
+            self.file = os.fdopen(fd, mode, **open_kwargs)  # type: IO[Any]
+        except BaseException:
+            os.close(fd)
+            self._remove_temp()
+            raise
+
+    def __enter__(self) -> "AtomicFile":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        if exc_type is not None or self.discarded:
+            self.file.close()
+            self._remove_temp()
+            return
+
+        try:
+            self.commit()
+        except BaseException:
+            self._remove_temp()
+            raise
+
+    def discard(self) -> None:
+        """
+        Leave the destination untouched when the block exits.
+        """
+        self.discarded = True
+
+    def commit(self) -> None:
+        """
+        Close the temporary file and move it over the destination.
+        """
+        if self.fsync:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.file.close()
+
+        if self.preserve is not None:
+            os.chmod(self.temp_path, self.preserve.st_mode & 0o7777)
+            os.utime(self.temp_path, ns=(self.preserve.st_atime_ns, self.preserve.st_mtime_ns))
+
+        os.replace(self.temp_path, self.path)
+
+    def _remove_temp(self) -> None:
+        """
+        Delete the temporary file if it still exists.
+        """
+        try:
+            os.unlink(self.temp_path)
+        except OSError:
+            pass
+
+
+def atomic_write(
+    path: Union[str, Path],
+    data: bytes,
+    fsync: bool = False,
+    preserve: Optional[os.stat_result] = None,
+) -> None:
+    """
+    Write data to a file so readers never see a partial file.
+
+    The data is written to a temporary file in the same directory, which
+    then replaces the destination in a single rename.
+
+    Args:
+        path: Destination file
+        data: Bytes to write
+        fsync: Whether to flush the data to disk before the rename
+        preserve: Stat result whose permissions and timestamps are applied
+                  to the new file
+    """
+    with AtomicFile(path, fsync=fsync, preserve=preserve) as atomic_file:
+        atomic_file.file.write(data)
+
+
+def break_link(source: Union[str, Path], target: Union[str, Path]) -> None:
+    """
+    Remove target if it is a hard link to source.
+
+    An output hard-linked to its input by an earlier run (see copy_file)
+    shares the input's data; writing through it would change the input.
+
+    Args:
+        source: Input file
+        target: Output file about to be written
+    """
+    try:
+        target_stat = os.stat(str(target))
+    except OSError:
+        return
+    if target_stat.st_nlink > 1 and os.path.samestat(target_stat, os.stat(str(source))):
+        # Unless both names are the same path
+        if os.path.realpath(str(source)) != os.path.realpath(str(target)):
+            os.unlink(str(target))
+
+
+def _copy_data(source: BinaryIO, target: BinaryIO) -> str:
+    """
+    Copy the rest of one open file into another, in the kernel if possible.
+
+    Args:
+        source: File opened for reading
+        target: File opened for writing
+
+    Returns:
+        The method used: "copy_file_range", "sendfile" or "read"
+    """
+    source_fd, target_fd = source.fileno(), target.fileno()
+    chunk = 1 << 30
+
+    copy_file_range = getattr(os, "copy_file_range", None)  # Linux, Python 3.8+
+    if copy_file_range is not None:
+        copied = 0
+        try:
+            while True:
+                count = copy_file_range(source_fd, target_fd, chunk)
+                if not count:
+                    return "copy_file_range"
+                copied += count
+        except OSError as e:
+            if copied or e.errno not in _UNSUPPORTED:
+                raise
+
+    sendfile = getattr(os, "sendfile", None)
+    if sendfile is not None:
+        offset = 0
+        try:
+            while True:
+                count = sendfile(target_fd, source_fd, offset, chunk)
+                if not count:
+                    return "sendfile"
+                offset += count
+        except OSError as e:
+            if offset or e.errno not in _UNSUPPORTED:
+                raise
+
+    shutil.copyfileobj(source, target)
+    return "read"
+
+
+def copy_file(
+    source: Union[str, Path],
+    target: Union[str, Path],
+    link_mode: str = "copy",
+    fsync: bool = False,
+) -> str:
+    """
+    Make target a copy of source without reading the data into Python.
+
+    Link modes (one of LINK_MODES):
+
+    - "copy": os.copy_file_range, else os.sendfile, else a buffered copy
+    - "reflink": a copy-on-write clone where the filesystem supports it,
+      else as "copy"
+    - "hardlink": a hard link to source, replacing target, else (across
+      filesystems, for instance) as "copy". Editing one file in place
+      then changes both.
+
+    Args:
+        source: File to copy
+        target: Destination, replaced if it exists
+        link_mode: One of LINK_MODES
+        fsync: Whether to flush copied data to disk before returning
+
+    Returns:
+        The method used: "hardlink", "reflink", "copy_file_range",
+        "sendfile" or "read"
+
+    Raises:
+        ValueError: If the link mode is unknown or source and target are
+            the same path
+    """
+    if link_mode not in LINK_MODES:
+        raise ValueError(f"Unknown link mode: {link_mode!r} (expected one of {', '.join(LINK_MODES)})")
+    source, target = str(source), str(target)
+    if os.path.realpath(source) == os.path.realpath(target):
+        raise ValueError(f"Cannot copy {source} onto itself")
+
+    if link_mode == "hardlink":
+        try:
+            try:
+                os.link(source, target)
+            except FileExistsError:
+                if os.path.samefile(source, target):
+                    return "hardlink"
+                os.unlink(target)
+                os.link(source, target)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED and e.errno != errno.EMLINK:
+                raise
+    else:
+        break_link(source, target)
+
+    with open(source, "rb") as source_file, open(target, "wb") as target_file:
+        method = None
+        if link_mode == "reflink" and _FICLONE is not None:
+            try:
+                fcntl.ioctl(target_file.fileno(), _FICLONE, source_file.fileno())
+                method = "reflink"
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+        if method is None:
+            method = _copy_data(source_file, target_file)
+        if fsync:
+            os.fsync(target_file.fileno())
+    return method
@@ -0,0 +1,254 @@
+"""
+Git integration: find the Python files changed in a local repository.
+
+Only the local repository is used, so this works offline. Staged contents
+are read through a single long-running "git cat-file --batch" process
+instead of one process or file open per path.
+"""
+
+import logging
+import os
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+from pycommentcleaner.core import clean_bytes, cleaned_path
+from pycommentcleaner.defaults import NOTEBOOK_SUFFIX
+from pycommentcleaner.discovery import DEFAULT_EXCLUDE, DEFAULT_INCLUDE, is_selected
+from pycommentcleaner.fileio import break_link
+from pycommentcleaner.notebook import clean_notebook
+
+logger = logging.getLogger(__name__)
+
+
+class GitError(Exception):
+    """
+    A git command failed or git is not available.
+    """
+
+
+def _run(args: Sequence[str], cwd: Union[str, Path]) -> bytes:
+    """
+    Run a git command and return its output.
+
+    Args:
+        args: Arguments after "git"
+        cwd: Directory to run the command in
+
+    Returns:
+        The command's standard output
+
+    Raises:
+        GitError: If git is missing or the command fails
+    """
+    try:
+        process = subprocess.run(["git"] + list(args), cwd=str(cwd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise GitError(f"Cannot run git: {e}") from e
+    if process.returncode != 0:
+        message = process.stderr.decode("utf-8", "replace").strip()
+        raise GitError(f"git {args[0]} failed: {message}")
+    return process.stdout
+
+
+def repository_root(path: Union[str, Path] = ".") -> Path:
+    """
+    Return the top directory of the repository containing a path.
+
+    Args:
+        path: Directory inside the repository
+
+    Returns:
+        The repository's working tree root
+
+    Raises:
+        GitError: If the path is not inside a git repository
+    """
+    return Path(_run(["rev-parse", "--show-toplevel"], path).decode("utf-8").strip())
+
+
+def changed_files(
+    since: Optional[str] = None,
+    staged: bool = False,
+    pathspecs: Sequence[Union[str, Path]] = (),
+    include: Sequence[str] = DEFAULT_INCLUDE,
+    exclude: Sequence[str] = DEFAULT_EXCLUDE,
+    cwd: Union[str, Path] = ".",
+) -> List[Path]:
+    """
+    List the Python files that were added, copied, modified or renamed.
+
+    Args:
+        since: Report the working tree changes since the merge base of this
+               ref and HEAD, as CI does against "origin/main"
+        staged: Report the changes staged in the index instead
+        pathspecs: Limit the search to these paths
+        include: Glob patterns a changed file must match
+        exclude: Glob patterns that skip a changed file or its directories
+        cwd: Directory inside the repository
+
+    Returns:
+        Paths of the changed files below the repository root, sorted
+
+    Raises:
+        ValueError: If neither or both of since and staged are given
+        GitError: If a git command fails
+    """
+    if bool(since) == bool(staged):
+        raise ValueError("Exactly one of since and staged must be given")
+
+    root = repository_root(cwd)
+    args = ["diff", "--name-only", "-z", "--diff-filter=ACMR", "--no-renames"]
+    if staged:
+        args.append("--cached")
+    else:
+        base = _run(["merge-base", since, "HEAD"], cwd).decode("utf-8").strip()
+        args.append(base)
+    args.append("--")
+    # Pathspecs are relative to cwd, which is where git runs
+    args.extend(str(pathspec) for pathspec in pathspecs)
+
+    files = []
+    for name in _run(args, cwd).split(b"\0"):
+        relative = os.fsdecode(name)
+        if relative and is_selected(relative, include, exclude):
+            files.append(root / relative)
+    files.sort()
+    logger.info(f"{len(files)} changed files in {root}")
+    return files
+
+
+class BlobReader:
+    """
+    Reader of repository objects through one "git cat-file --batch" process.
+
+    Example:
+        with BlobReader(root) as reader:
+            data = reader.read(":src/module.py")
+    """
+
+    def __init__(self, cwd: Union[str, Path] = ".") -> None:
+        """
+        Start the git process.
+
+        Args:
+            cwd: Directory inside the repository
+
+        Raises:
+            GitError: If git cannot be started
+        """
+        try:
+            self._process = subprocess.Popen(
+                ["git", "cat-file", "--batch"], cwd=str(cwd), stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+        except OSError as e:
+            raise GitError(f"Cannot run git: {e}") from e
+
+    def __enter__(self) -> "BlobReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the git process.
+        """
+        self._process.stdin.close()
+        self._process.wait()
+        self._process.stdout.close()
+
+    def read(self, name: str) -> Optional[bytes]:
+        """
+        Read an object.
+
+        Args:
+            name: Object name, such as ":path" for the staged content of a
+                  path relative to the repository root
+
+        Returns:
+            The object's content, or None if it does not exist
+
+        Raises:
+            GitError: If the git process stopped
+        """
+        if "\n" in name:
+            return None
+        self._process.stdin.write(name.encode("utf-8") + b"\n")
+        self._process.stdin.flush()
+
+        # "<oid> <type> <size>", or "<name> missing" / "<name> ambiguous"
+        header = self._process.stdout.readline()
+        if not header:
+            raise GitError("git cat-file exited unexpectedly")
+        fields = header.split()
+        if len(fields) != 3 or not fields[2].isdigit():
+            return None
+        data = self._process.stdout.read(int(fields[2]))
+        self._process.stdout.read(1)
+        return data
+
+
+def clean_staged(
+    file_paths: Sequence[Union[str, Path]],
+    output_dir: Optional[Union[str, Path]] = None,
+    engine: str = "splice",
+    cwd: Union[str, Path] = ".",
+) -> List[Tuple[str, bool, str]]:
+    """
+    Remove comments from the staged contents of files.
+
+    The working tree is not read or changed; the cleaned contents are
+    written to '_cleaned' files like clean_file does.
+
+    Args:
+        file_paths: Files in the repository, such as the result of
+                    changed_files(staged=True)
+        output_dir: Directory where cleaned files will be saved, keeping
+                    their directories in the repository. If None, files
+                    with '_cleaned' suffix will be created next to each file.
+        engine: Cleaning engine (see clean_code)
+        cwd: Directory inside the repository
+
+    Returns:
+        List of tuples with (file_path, success, message) for each file,
+        in the same order as file_paths
+    """
+    root = repository_root(cwd)
+    if output_dir:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    with BlobReader(root) as reader:
+        for file_path in file_paths:
+            file_path = Path(file_path)
+            # The repository's layout is kept in output_dir
+            output_path = cleaned_path(file_path, output_dir or None, [root])
+            try:
+                # Resolve the directory only, the file itself may be a symlink
+                real_path = Path(os.path.realpath(file_path.parent)) / file_path.name
+                relative = real_path.relative_to(os.path.realpath(root)).as_posix()
+                data = reader.read(f":{relative}")
+                if data is None:
+                    error_msg = f"Not staged: {file_path}"
+                    logger.error(error_msg)
+                    results.append((str(file_path), False, error_msg))
+                    continue
+
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                break_link(file_path, output_path)
+                with open(output_path, 'wb') as file:
+                    if file_path.suffix.lower() == NOTEBOOK_SUFFIX:
+                        file.write(clean_notebook(data, engine=engine))
+                    else:
+                        file.write(clean_bytes(data, engine=engine))
+
+                logger.info("Successfully cleaned staged %s -> %s", file_path, output_path)
+                results.append((str(file_path), True, f"Successfully cleaned staged {file_path} -> {output_path}"))
+            except (OSError, ValueError) as e:
+                error_msg = f"Error cleaning file {file_path}: {str(e)}"
+                logger.error(error_msg)
+                results.append((str(file_path), False, error_msg))
+
+    return results
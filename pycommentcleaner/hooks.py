@@ -0,0 +1,234 @@
+"""
+Instrumentation hooks for profiling the cleaner.
+
+Observers registered here are told when a file starts and ends, about each
+removed comment, the bytes read and written per file, and how long each
+phase (read, tokenize, rebuild, write, compile) took. When no observer is
+registered the cleaner skips all of this, so the hooks cost next to
+nothing in normal runs.
+
+Observers are per process: files cleaned by a process pool are not
+reported to observers registered in the parent.
+"""
+
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PHASES = ("read", "tokenize", "rebuild", "write")
+
+# Phases timed only when asked for, such as compiling to .pyc
+OPTIONAL_PHASES = ("compile",)
+
+
+class Observer:
+    """
+    Base class for observers; override the callbacks you need.
+    """
+
+    def file_start(self, path: Path) -> None:
+        """
+        Called before a file is cleaned.
+
+        Args:
+            path: File being cleaned
+        """
+
+    def file_end(self, path: Path, success: bool) -> None:
+        """
+        Called after a file is cleaned or fails.
+
+        Args:
+            path: File that was cleaned
+            success: Whether cleaning succeeded
+        """
+
+    def comment_removed(self, path: Optional[Path], row: int, col: int, text: str) -> None:
+        """
+        Called for each removed comment.
+
+        Args:
+            path: File the comment came from, or None for clean_code calls
+                  outside a file
+            row: 1-based line of the comment
+            col: 0-based column of the comment
+            text: Comment text, including the '#'
+        """
+
+    def bytes_processed(self, path: Path, bytes_in: int, bytes_out: int) -> None:
+        """
+        Called once a file's output has been produced.
+
+        Args:
+            path: File that was cleaned
+            bytes_in: Size of the source in bytes
+            bytes_out: Size of the cleaned output in bytes
+        """
+
+    def phase(self, path: Optional[Path], name: str, seconds: float) -> None:
+        """
+        Called after each timed phase.
+
+        Args:
+            path: File being cleaned, or None for clean_code calls outside a file
+            name: One of PHASES or OPTIONAL_PHASES
+            seconds: Wall time spent in the phase
+        """
+
+
+class Totals(Observer):
+    """
+    Observer that adds up files, comments, bytes and phase times.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.files = 0
+        self.failed = 0
+        self.comments = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = defaultdict(float)  # type: Dict[str, float]
+
+    def file_end(self, path: Path, success: bool) -> None:
+        with self._lock:
+            self.files += 1
+            if not success:
+                self.failed += 1
+
+    def comment_removed(self, path: Optional[Path], row: int, col: int, text: str) -> None:
+        with self._lock:
+            self.comments += 1
+
+    def bytes_processed(self, path: Path, bytes_in: int, bytes_out: int) -> None:
+        with self._lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def phase(self, path: Optional[Path], name: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[name] += seconds
+
+    def summary(self) -> str:
+        """
+        Format the totals for display.
+
+        Returns:
+            Multi-line summary of the totals
+        """
+        lines = [
+            f"Files: {self.files} ({self.failed} failed)",
+            f"Comments removed: {self.comments}",
+            f"Bytes: {self.bytes_in} in, {self.bytes_out} out",
+        ]
+        for name in PHASES + OPTIONAL_PHASES:
+            if name in self.seconds:
+                lines.append(f"{name.capitalize()}: {self.seconds[name]:.3f}s")
+        return "\n".join(lines)
+
+
+# Registered observers; the cleaner checks this list and skips all
+# instrumentation while it is empty
+observers = []  # type: List[Observer]
+
+_context = threading.local()
+
+
+def register(observer: Observer) -> Observer:
+    """
+    Register an observer.
+
+    Args:
+        observer: Observer to notify
+
+    Returns:
+        The observer, so this can be used as a decorator-style one-liner
+    """
+    observers.append(observer)
+    return observer
+
+
+def unregister(observer: Observer) -> None:
+    """
+    Remove a registered observer.
+
+    Args:
+        observer: Observer to stop notifying
+    """
+    observers.remove(observer)
+
+
+def current_path() -> Optional[Path]:
+    """
+    Return the file being cleaned by the current thread.
+
+    Returns:
+        The file passed to the last file_start() in this thread, or None
+    """
+    return getattr(_context, "path", None)
+
+
+def file_start(path: Path) -> None:
+    """
+    Notify observers that a file is starting.
+
+    Args:
+        path: File being cleaned
+    """
+    _context.path = path
+    for observer in observers:
+        observer.file_start(path)
+
+
+def file_end(path: Path, success: bool) -> None:
+    """
+    Notify observers that a file is done.
+
+    Args:
+        path: File that was cleaned
+        success: Whether cleaning succeeded
+    """
+    for observer in observers:
+        observer.file_end(path, success)
+    _context.path = None
+
+
+def comment_removed(row: int, col: int, text: str) -> None:
+    """
+    Notify observers about a removed comment in the current file.
+
+    Args:
+        row: 1-based line of the comment
+        col: 0-based column of the comment
+        text: Comment text
+    """
+    path = current_path()
+    for observer in observers:
+        observer.comment_removed(path, row, col, text)
+
+
+def bytes_processed(path: Path, bytes_in: int, bytes_out: int) -> None:
+    """
+    Notify observers about the size of a file's input and output.
+
+    Args:
+        path: File that was cleaned
+        bytes_in: Size of the source in bytes
+        bytes_out: Size of the cleaned output in bytes
+    """
+    for observer in observers:
+        observer.bytes_processed(path, bytes_in, bytes_out)
+
+
+def phase(name: str, seconds: float) -> None:
+    """
+    Notify observers about the time spent in a phase of the current file.
+
+    Args:
+        name: One of PHASES or OPTIONAL_PHASES
+        seconds: Wall time spent in the phase
+    """
+    path = current_path()
+    for observer in observers:
+        observer.phase(path, name, seconds)
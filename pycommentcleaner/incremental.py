@@ -0,0 +1,269 @@
+"""
+Incremental cleaning for editors that clean the same file after every edit.
+
+IncrementalCleaner keeps a file's lines, their cleaned form, and a
+checkpoint at every line the tokenizer starts outside any string, bracket
+or line continuation. The checkpoint holds the indentation stack, which is
+all the tokenizer carries from one logical line to the next. After an
+edit, tokenizing resumes at the last checkpoint before it and stops at the
+first checkpoint after it whose state matches the one recorded before the
+edit; from there on, the old tokens, and so the old cleaned lines, still
+hold. A one-line edit costs a few lines of tokenizing, not the whole file.
+
+The output is the same as clean_code's with the default "splice" engine,
+including for code that cannot be tokenized, which is left unchanged.
+"""
+
+import logging
+import tokenize
+from io import StringIO
+from itertools import chain, islice
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# f-strings are split into several tokens from Python 3.12
+_FSTRING_START = getattr(tokenize, "FSTRING_START", None)
+_FSTRING_END = getattr(tokenize, "FSTRING_END", None)
+
+
+class IncrementalCleaner:
+    """
+    Comment remover that keeps one file's state across edits.
+
+    Rows are 1-based and columns 0-based, as in tokenize.
+
+    Example:
+        cleaner = IncrementalCleaner(source)
+        cleaned = cleaner.edit((120, 4), (120, 9), "value")
+        cleaned = cleaner.update(new_source)  # finds the edited lines itself
+    """
+
+    def __init__(self, code: str = "") -> None:
+        """
+        Clean code and record its checkpoints.
+
+        Args:
+            code: Python code as a string
+        """
+        self._lines = []  # type: List[str]
+        self._cleaned = []  # type: List[str]
+        # Indentation stack at the start of each line, None inside a statement
+        self._states = []  # type: List[Optional[Tuple[str, ...]]]
+        self._valid = True
+        self.lines_tokenized = 0
+        self._reset(code)
+
+    def __repr__(self) -> str:
+        return f"IncrementalCleaner(lines={len(self._lines)}, valid={self._valid})"
+
+    @property
+    def code(self) -> str:
+        """
+        The current code.
+        """
+        return "".join(self._lines)
+
+    @property
+    def cleaned(self) -> str:
+        """
+        The current code with comments removed, or unchanged if it cannot be
+        tokenized.
+        """
+        return "".join(self._cleaned if self._valid else self._lines)
+
+    def edit(self, start: Tuple[int, int], end: Tuple[int, int], text: str) -> str:
+        """
+        Replace a range of the code and clean the lines it affects.
+
+        Args:
+            start: (row, col) where the replaced range starts
+            end: (row, col) where it ends, exclusive; a column may point past
+                 a line's newline
+            text: Replacement text
+
+        Returns:
+            The cleaned code after the edit
+
+        Raises:
+            ValueError: If the range is outside the code or ends before it starts
+        """
+        lines = self._lines
+        (start_row, start_col), (end_row, end_col) = start, end
+        if not lines and start == end == (1, 0):
+            self._replace_lines(0, 0, StringIO(text).readlines())
+            return self.cleaned
+        if not (1 <= start_row <= end_row <= len(lines)) or (start_row, start_col) > (end_row, end_col):
+            raise ValueError(f"Invalid range: {start} to {end}")
+        if not (0 <= start_col <= len(lines[start_row - 1]) and 0 <= end_col <= len(lines[end_row - 1])):
+            raise ValueError(f"Invalid range: {start} to {end}")
+
+        replaced = lines[start_row - 1][:start_col] + text + lines[end_row - 1][end_col:]
+        if not replaced.endswith("\n") and end_row < len(lines):
+            # The edit removed a newline, joining the next line
+            replaced += lines[end_row]
+            end_row += 1
+        self._replace_lines(start_row - 1, end_row, StringIO(replaced).readlines())
+        return self.cleaned
+
+    def update(self, code: str) -> str:
+        """
+        Replace the whole code, cleaning only the lines that changed.
+
+        The changed lines are found by comparing the leading and trailing
+        lines of the old and new code.
+
+        Args:
+            code: New Python code as a string
+
+        Returns:
+            The cleaned code
+        """
+        old, new = self._lines, StringIO(code).readlines()
+        limit = min(len(old), len(new))
+        prefix = 0
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+            suffix += 1
+        if prefix == len(old) == len(new):
+            return self.cleaned
+
+        self._replace_lines(prefix, len(old) - suffix, new[prefix:len(new) - suffix])
+        return self.cleaned
+
+    def _reset(self, code: str) -> None:
+        """
+        Clean code from scratch.
+
+        Args:
+            code: Python code as a string
+        """
+        self._lines = StringIO(code).readlines()
+        self._cleaned = list(self._lines)
+        self._states = [None] * len(self._lines)
+        self._valid = True
+        if self._lines:
+            self._states[0] = ()
+            self._tokenize(0, len(self._lines))
+
+    def _replace_lines(self, start: int, old_end: int, new_lines: List[str]) -> None:
+        """
+        Replace lines start to old_end (0-based, exclusive) and clean again
+        from the checkpoint before them.
+
+        Args:
+            start: Index of the first replaced line
+            old_end: Index after the last replaced line
+            new_lines: Lines put in their place
+        """
+        if not self._valid:
+            # No checkpoint after the error can be trusted
+            self._reset("".join(chain(self._lines[:start], new_lines, self._lines[old_end:])))
+            return
+
+        # Lines before the edit are unchanged, and so are their states
+        first = max(min(start, len(self._lines) - 1), 0)
+        while first > 0 and self._states[first] is None:
+            first -= 1
+        state = self._states[first] if self._lines else ()
+
+        self._lines[start:old_end] = new_lines
+        self._cleaned[start:old_end] = new_lines
+        self._states[start:old_end] = [None] * len(new_lines)
+        if not self._lines:
+            return
+        self._states[first] = state
+        self._tokenize(first, start + len(new_lines))
+
+    def _tokenize(self, first: int, sync_from: int) -> None:
+        """
+        Tokenize from a checkpoint until the state matches the recorded one.
+
+        Args:
+            first: Index of a line with a checkpoint
+            sync_from: Index of the first line whose recorded state may be
+                       reused; tokenizing goes on at least up to it
+        """
+        lines, states = self._lines, self._states
+        # Lines that rebuild the indentation stack before the real lines; their
+        # INDENT tokens fill the stack again
+        prefix = [indent + "0\n" for indent in states[first]]
+        stack = []  # type: List[str]
+        offset = first - len(prefix) - 1  # Token row to line index
+
+        source = chain(prefix, islice(lines, first, None))  # type: Iterator[str]
+
+        def readline() -> str:
+            return next(source, "")
+
+        depth = 0  # Open brackets and f-strings
+        # A closing bracket without an opener leaves the tokenizer's own
+        # bracket level unknown, so no later line is a checkpoint
+        balanced = True
+        segment = first  # First line not yet cleaned
+        comments = []  # type: List[Tuple[int, int, int]]
+        try:
+            for tok in tokenize.generate_tokens(readline):
+                tok_type = tok.type
+                if tok_type == tokenize.COMMENT:
+                    comments.append((tok.start[0] + offset, tok.start[1], tok.end[1]))
+                elif tok_type == tokenize.OP:
+                    if tok.string in "([{":
+                        depth += 1
+                    elif tok.string in ")]}":
+                        depth -= 1
+                        balanced = balanced and depth >= 0
+                elif tok_type == _FSTRING_START:
+                    depth += 1
+                elif tok_type == _FSTRING_END:
+                    depth -= 1
+                elif tok_type == tokenize.INDENT:
+                    stack.append(tok.string)
+                elif tok_type == tokenize.DEDENT:
+                    stack.pop()
+                elif tok_type == tokenize.ERRORTOKEN and tok.string in ("'", '"'):
+                    # An unterminated string; other error tokens are code,
+                    # as in clean_code
+                    raise tokenize.TokenError(f"Unexpected token {tok.string!r}", tok.start)
+                elif (tok_type == tokenize.NEWLINE or tok_type == tokenize.NL) and depth == 0 and balanced:
+                    # The next line starts a fresh statement
+                    boundary = tok.end[0] + offset + 1
+                    if boundary <= segment or boundary >= len(lines):
+                        continue
+                    self._clean_segment(segment, boundary, comments)
+                    segment = boundary
+                    state = tuple(stack)
+                    if boundary >= sync_from and states[boundary] == state:
+                        return
+                    states[boundary] = state
+        except (tokenize.TokenError, SyntaxError) as e:
+            logger.error(f"Tokenization error: {e}")
+            self._valid = False
+            return
+        except Exception as e:
+            logger.error(f"Unexpected error during code cleaning: {e}")
+            self._valid = False
+            return
+
+        self._clean_segment(segment, len(lines), comments)
+
+    def _clean_segment(self, start: int, end: int, comments: List[Tuple[int, int, int]]) -> None:
+        """
+        Rebuild the cleaned lines start to end from the comments found in them.
+
+        Args:
+            start: Index of the first line
+            end: Index after the last line
+            comments: (line index, start col, end col) of the comments found
+                      in these lines, emptied on return
+        """
+        lines, cleaned, states = self._lines, self._cleaned, self._states
+        cleaned[start:end] = lines[start:end]
+        states[start + 1:end] = [None] * (end - start - 1)
+        for index, start_col, end_col in comments:
+            line = lines[index]
+            cleaned[index] = line[:start_col] + line[end_col:]
+        comments.clear()
+        self.lines_tokenized += end - start
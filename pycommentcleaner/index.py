@@ -0,0 +1,134 @@
+"""
+SQLite index of the comments removed while cleaning.
+
+CommentIndex is an instrumentation observer (see hooks): it receives every
+comment from the cleaner's own token loop, so recording them costs no
+second tokenizing pass. Comments are buffered and written in batches, one
+transaction per batch, into a database that can be queried later:
+
+    SELECT path, line, text FROM comments WHERE text LIKE '%TODO%';
+
+Each CommentIndex adds a row to the runs table, and its comments point to
+that run, so several runs can share one database.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from pycommentcleaner import __version__
+from pycommentcleaner.hooks import Observer
+
+# Comments buffered before they are written in one transaction
+DEFAULT_BATCH_SIZE = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    path TEXT,
+    line INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comments_path ON comments (path, line);
+"""
+
+
+class CommentIndex(Observer):
+    """
+    Observer that records removed comments in a SQLite database.
+
+    Safe to use from several threads. Comments are only seen in the process
+    that registered the observer, so files cleaned by a process pool are
+    not recorded.
+
+    Example:
+        with CommentIndex("comments.db") as index:
+            hooks.register(index)
+            clean_files(paths)
+            hooks.unregister(index)
+    """
+
+    def __init__(self, database: Union[str, Path], batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """
+        Open the database, creating its tables if needed, and start a run.
+
+        Args:
+            database: Path of the SQLite database
+            batch_size: Number of comments written per transaction
+
+        Raises:
+            sqlite3.Error: If the database cannot be opened or is not a
+                comment index
+        """
+        self.database = str(database)
+        self.batch_size = batch_size
+        self.recorded = 0
+        self._rows = []  # type: List[Tuple[int, Optional[str], int, int, str]]
+        self._lock = threading.Lock()
+
+        # Used from whichever thread cleans a file; the lock serializes access
+        self._connection = sqlite3.connect(self.database, check_same_thread=False)
+        try:
+            self._connection.executescript(_SCHEMA)
+            with self._connection:
+                cursor = self._connection.execute(
+                    "INSERT INTO runs (started, version) VALUES (?, ?)", (time.time(), __version__)
+                )
+            self.run_id = cursor.lastrowid
+        except sqlite3.Error:
+            self._connection.close()
+            raise
+
+    def __repr__(self) -> str:
+        return f"CommentIndex({self.database!r}, run_id={self.run_id})"
+
+    def __enter__(self) -> "CommentIndex":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def comment_removed(self, path: Optional[Path], row: int, col: int, text: str) -> None:
+        with self._lock:
+            self._rows.append((self.run_id, None if path is None else str(path), row, col, text))
+            if len(self._rows) >= self.batch_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        """
+        Write the buffered comments in one transaction. The caller holds the lock.
+        """
+        if not self._rows:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO comments (run_id, path, line, col, text) VALUES (?, ?, ?, ?, ?)", self._rows
+            )
+        self.recorded += len(self._rows)
+        self._rows = []
+
+    def flush(self) -> None:
+        """
+        Write the buffered comments now.
+        """
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """
+        Write the buffered comments and close the database.
+        """
+        with self._lock:
+            try:
+                self._flush()
+            finally:
+                self._connection.close()
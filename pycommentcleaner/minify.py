@@ -0,0 +1,243 @@
+"""
+Minify mode: remove docstrings and blank lines as well as comments.
+
+For deploy artifacts where size counts, minify_code goes further than
+clean_code: module, class and function docstrings are removed (a body
+left empty gets "pass"), blank lines are dropped and trailing whitespace
+is stripped. Lines inside multi-line strings are never touched.
+
+Docstrings are kept in files that mention __doc__, since they may be
+read at runtime, and the result is parsed before it is returned: if it
+is not valid Python, the comment-only output is returned instead. Code
+whose docstrings are read from elsewhere, such as click commands whose
+help text is the docstring, should not be minified.
+"""
+
+import ast
+import logging
+import tokenize
+from io import StringIO
+from typing import List, Optional, Set, Tuple
+
+from pycommentcleaner.core import clean_code
+
+logger = logging.getLogger(__name__)
+
+# Tokens that do not start a statement
+_SKIPPED = (tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING)
+
+# f-strings are split into several tokens from Python 3.12
+_FSTRING_START = getattr(tokenize, "FSTRING_START", None)
+_FSTRING_END = getattr(tokenize, "FSTRING_END", None)
+
+
+def _is_fstring(literal: str) -> bool:
+    """
+    Check whether a string token is an f-string, which is never a docstring.
+
+    Args:
+        literal: Token text, prefix included
+
+    Returns:
+        True if the prefix contains 'f'
+    """
+    return "f" in literal[:literal.find(literal[-1])].lower()
+
+
+def _docstring_spans(tokens: List[tokenize.TokenInfo]) -> List[Tuple[Tuple[int, int], Tuple[int, int], str]]:
+    """
+    Find the docstrings of a module and its classes and functions.
+
+    A docstring is a statement made of string literals only, first in the
+    module or in the body of a def or class.
+
+    Args:
+        tokens: Tokens of the source
+
+    Returns:
+        List of (start, end, replacement) for each docstring, where the
+        replacement is "pass" if the docstring is the whole body
+    """
+    spans = []
+    depth = 0  # Bracket nesting
+    in_header = False  # Between "def"/"class" and its ':'
+    expect = "module"  # type: Optional[str]  # "module" or "body" while a docstring may come next
+    statement_start = True
+
+    for index, tok in enumerate(tokens):
+        tok_type = tok.type
+        if tok_type in _SKIPPED:
+            continue
+        if tok_type == tokenize.NEWLINE:
+            statement_start = True
+            continue
+
+        if statement_start and expect and tok_type == tokenize.STRING and not _is_fstring(tok.string):
+            end_index = index
+            while (tokens[end_index + 1].type in (tokenize.NL, tokenize.COMMENT)
+                   or tokens[end_index + 1].type == tokenize.STRING and not _is_fstring(tokens[end_index + 1].string)):
+                end_index += 1
+            if tokens[end_index + 1].type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                while tokens[end_index].type != tokenize.STRING:
+                    end_index -= 1
+                replacement = ""
+                if expect == "body":
+                    # The docstring is the whole body if the block ends right after it
+                    previous = tokens[index - 1]
+                    inline = previous.type == tokenize.OP and previous.string == ":"
+                    following = min(end_index + 2, len(tokens) - 1)
+                    while tokens[following].type in (tokenize.NL, tokenize.COMMENT):
+                        following += 1
+                    if inline or tokens[following].type in (tokenize.DEDENT, tokenize.ENDMARKER):
+                        replacement = "pass"
+                spans.append((tok.start, tokens[end_index].end, replacement))
+
+        if statement_start:
+            expect = None
+            statement_start = False
+
+        if tok_type == tokenize.OP:
+            if tok.string in "([{":
+                depth += 1
+            elif tok.string in ")]}":
+                depth -= 1
+            elif tok.string == ":" and depth == 0 and in_header:
+                # The body starts here, on this line or after NEWLINE INDENT
+                in_header = False
+                expect = "body"
+                statement_start = True
+        elif tok_type == tokenize.NAME and tok.string in ("def", "class") and depth == 0:
+            in_header = True
+
+    return spans
+
+
+def _replace_spans(code: str, spans: List[Tuple[Tuple[int, int], Tuple[int, int], str]]) -> str:
+    """
+    Replace (row, col) ranges of source with other text.
+
+    Args:
+        code: Source code
+        spans: Sorted, non-overlapping (start, end, replacement) ranges
+
+    Returns:
+        The source with each range replaced
+    """
+    # Split like the tokenizer's readline, which does not break at form feeds
+    lines = StringIO(code).readlines()
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    pieces = []
+    position = 0
+    for (start_row, start_col), (end_row, end_col), replacement in spans:
+        start = offsets[start_row - 1] + start_col
+        pieces.append(code[position:start])
+        pieces.append(replacement)
+        position = offsets[end_row - 1] + end_col
+    pieces.append(code[position:])
+    return "".join(pieces)
+
+
+def _string_rows(code: str) -> Tuple[Set[int], Set[int]]:
+    """
+    Find the rows whose whitespace belongs to a multi-line token.
+
+    Args:
+        code: Source code
+
+    Returns:
+        Tuple of (rows whose line end is inside a token, rows that start
+        inside a token)
+    """
+    open_ends = set()  # type: Set[int]
+    continued = set()  # type: Set[int]
+    fstring_rows = []  # Start rows of the f-strings being read
+    for tok in tokenize.generate_tokens(StringIO(code).readline):
+        if tok.type == _FSTRING_START:
+            fstring_rows.append(tok.start[0])
+            continue
+        if tok.type == _FSTRING_END:
+            # The whole f-string, replacement fields included
+            start_row, end_row = fstring_rows.pop(), tok.end[0]
+        elif tok.type == tokenize.NEWLINE or tok.type == tokenize.NL:
+            continue
+        else:
+            start_row, end_row = tok.start[0], tok.end[0]
+        if end_row > start_row:
+            open_ends.update(range(start_row, end_row))
+            continued.update(range(start_row + 1, end_row + 1))
+    return open_ends, continued
+
+
+def _collapse_whitespace(code: str) -> str:
+    """
+    Drop blank lines and trailing whitespace outside multi-line strings.
+
+    Args:
+        code: Valid Python source code
+
+    Returns:
+        The source without blank lines or trailing whitespace
+    """
+    open_ends, continued = _string_rows(code)
+    pieces = []
+    for row, line in enumerate(StringIO(code).readlines(), 1):
+        body = line.rstrip("\r\n")
+        ending = line[len(body):]
+        if row not in open_ends:
+            body = body.rstrip(" \t")
+        if body or row in continued:
+            pieces.append(body + ending)
+    return "".join(pieces)
+
+
+def minify_code(code: str) -> str:
+    """
+    Remove comments, docstrings, blank lines and trailing whitespace.
+
+    Args:
+        code: Python code as a string
+
+    Returns:
+        Minified code; code that cannot be tokenized is returned unchanged
+    """
+    cleaned = clean_code(code)
+    try:
+        tokens = list(tokenize.generate_tokens(StringIO(cleaned).readline))
+        # Files that read __doc__ keep their docstrings
+        if any(tok.type == tokenize.NAME and tok.string == "__doc__" for tok in tokens):
+            minified = cleaned
+        else:
+            minified = _replace_spans(cleaned, _docstring_spans(tokens))
+        minified = _collapse_whitespace(minified)
+        ast.parse(minified)
+    except (tokenize.TokenError, SyntaxError, ValueError) as e:
+        logger.error(f"Cannot minify, keeping the comment-only output: {e}")
+        return cleaned
+    return minified
+
+
+def minify_bytes(data: bytes) -> bytes:
+    """
+    Minify encoded Python source (see minify_code).
+
+    The encoding is taken from the BOM or PEP 263 coding cookie. The output
+    is UTF-8, Python's default source encoding, so it needs neither, and
+    line endings are kept.
+
+    Args:
+        data: Python source as bytes
+
+    Returns:
+        Minified source in UTF-8; source that cannot be decoded is
+        returned unchanged
+    """
+    try:
+        encoding, _ = tokenize.detect_encoding(iter(data.splitlines(keepends=True)).__next__)
+        code = data.decode(encoding)
+    except (SyntaxError, UnicodeDecodeError) as e:
+        logger.error(f"Cannot decode source: {e}")
+        return data
+    return minify_code(code).encode("utf-8")
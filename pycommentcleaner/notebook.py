@@ -0,0 +1,343 @@
+"""
+Jupyter notebooks: remove comments from the code cells of .ipynb files.
+
+clean_notebook parses the notebook JSON once, cleans all its code cells in
+one batch with a Cleaner and writes the JSON back with the notebook's own
+indentation and key order, so only the cleaned cells differ. A notebook
+with nothing to clean is returned byte for byte.
+
+IPython syntax is not Python: lines holding a line magic (%time), a shell
+escape (!pip), an assignment from either (files = !ls) or a help request
+(obj?) are masked with "pass" while the cell is cleaned and put back
+unchanged afterwards. Cells starting with a cell magic (%%bash) are not
+Python at all and are left alone, as are the cells of notebooks whose
+kernel runs another language.
+
+With a cache, the cleaned cells of each notebook are stored together in
+one cache entry, by the hash of their source, so in a notebook edited since
+the last run only the edited cells are cleaned.
+"""
+
+import json
+import logging
+import re
+import tokenize
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pycommentcleaner.cache import ResultCache
+from pycommentcleaner.cleaner import Cleaner
+from pycommentcleaner.defaults import NOTEBOOK_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+# Lines IPython rewrites before Python sees them
+_MAGIC_LINE = re.compile(
+    r"[ \t]*(?:"
+    r"[%!]"  # %magic, !shell
+    r"|\?{1,2}[\w.]"  # ?object
+    r"|[\w.]+\?{1,2}[ \t]*$"  # object?
+    r"|[\w.]+(?:[ \t]*,[ \t]*[\w.]+)*[ \t]*=[ \t]*[%!]"  # files = !ls
+    r")"
+)
+_CELL_MAGIC = re.compile(r"\s*%%")
+
+# What a string needs to span lines: triple quotes or an escaped line end
+_MULTILINE_MARKERS = ("'''", '"""', "\\\n", "\\\r")
+
+
+def is_notebook(path: Union[str, Path]) -> bool:
+    """
+    Check whether a path names a Jupyter notebook.
+
+    Args:
+        path: File path
+
+    Returns:
+        True if the file has the .ipynb suffix
+    """
+    return Path(path).suffix.lower() == NOTEBOOK_SUFFIX
+
+
+def _mask_magics(source: str) -> Optional[Tuple[str, Dict[int, str]]]:
+    """
+    Replace the IPython lines of a cell with "pass".
+
+    Args:
+        source: Cell source
+
+    Returns:
+        Tuple of (masked source, original line by 0-based index), or None
+        if the cell starts with a cell magic
+    """
+    if _CELL_MAGIC.match(source):
+        return None
+    lines = StringIO(source).readlines()
+    masked = {}  # type: Dict[int, str]
+    index = 0
+    while index < len(lines):
+        if _MAGIC_LINE.match(lines[index]):
+            # A magic goes on over lines ending with a backslash
+            while True:
+                line = lines[index]
+                body = line.rstrip("\r\n")
+                indent = body[:len(body) - len(body.lstrip(" \t"))]
+                masked[index] = line
+                lines[index] = indent + "pass" + line[len(body):]
+                index += 1
+                if not body.endswith("\\") or index == len(lines):
+                    break
+        else:
+            index += 1
+    return "".join(lines), masked
+
+
+def _unmask_strings(source: str, masked: Dict[int, str]) -> Optional[str]:
+    """
+    Put back the masked lines that turn out to be text inside strings.
+
+    Args:
+        source: Masked cell source
+        masked: Original lines by 0-based index; lines put back are removed
+
+    Returns:
+        The source with only code lines masked, or None if it cannot be
+        tokenized
+    """
+    # Each pass puts back at least one line, or stops
+    for _ in range(len(masked) + 1):
+        starts = set()
+        try:
+            for tok in tokenize.generate_tokens(StringIO(source).readline):
+                if tok.type == tokenize.NAME and tok.string == "pass":
+                    starts.add(tok.start)
+        except (tokenize.TokenError, SyntaxError):
+            return None
+
+        strings = [
+            index for index, line in masked.items()
+            if (index + 1, len(line) - len(line.lstrip(" \t"))) not in starts
+        ]
+        if not strings:
+            return source
+        lines = StringIO(source).readlines()
+        for index in strings:
+            lines[index] = masked.pop(index)
+        source = "".join(lines)
+    return None
+
+
+def _clean_cells(sources: List[str], engine: str) -> List[Tuple[str, int, int]]:
+    """
+    Remove comments from code cells in one batch.
+
+    Args:
+        sources: Cell sources
+        engine: Cleaning engine (see clean_code)
+
+    Returns:
+        (cleaned source, comments removed, UTF-8 bytes removed) per cell;
+        cells that cannot be cleaned safely come back unchanged
+    """
+    results = [(source, 0, 0) for source in sources]
+    batch = []  # type: List[Tuple[int, str, Dict[int, str]]]
+    for position, source in enumerate(sources):
+        if "#" not in source:
+            continue
+        masking = _mask_magics(source)
+        if masking is None:
+            continue
+        masked_source, masked = masking
+        # A masked line can only be inside a string spanning several lines
+        if masked and any(marker in masked_source for marker in _MULTILINE_MARKERS):
+            masked_source = _unmask_strings(masked_source, masked)
+            if masked_source is None:
+                logger.warning("Cell left unchanged: cannot tokenize it with its IPython lines masked")
+                continue
+        batch.append((position, masked_source, masked))
+
+    cleaner = Cleaner(engine)
+    for (position, masked_source, masked), result in zip(batch, cleaner.clean_many(item[1] for item in batch)):
+        if not masked:
+            results[position] = (result.output, result.comments, result.byte_delta)
+            continue
+        lines = StringIO(result.output).readlines()
+        if len(lines) != len(StringIO(masked_source).readlines()):
+            continue
+        for index, line in masked.items():
+            lines[index] = line
+        output = "".join(lines)
+        source = sources[position]
+        results[position] = (output, result.comments, len(source.encode("utf-8")) - len(output.encode("utf-8")))
+    return results
+
+
+def _is_python(notebook: Dict[str, Any]) -> bool:
+    """
+    Check whether a notebook's code cells are Python.
+
+    Args:
+        notebook: Parsed notebook
+
+    Returns:
+        False if the kernel metadata names another language
+    """
+    metadata = notebook.get("metadata") or {}
+    language = (metadata.get("kernelspec") or {}).get("language") or (metadata.get("language_info") or {}).get("name")
+    return language is None or str(language).lower() == "python"
+
+
+def _dumps(notebook: Dict[str, Any], original: str) -> str:
+    """
+    Serialize a notebook the way its original file was written.
+
+    Args:
+        notebook: Parsed notebook
+        original: Text of the original file
+
+    Returns:
+        Notebook JSON with the original's indentation, escaping and final
+        newline
+    """
+    match = re.match(r"\s*[\[{]\n( *)", original)
+    indent = len(match.group(1)) if match else None
+    # Keep \\u escapes in files written with them
+    ensure_ascii = "\\u" in original and len(original.encode("utf-8")) == len(original)
+    text = json.dumps(notebook, indent=indent, ensure_ascii=ensure_ascii)
+    return text + "\n" if original.endswith("\n") else text
+
+
+def _load_cells(cache: ResultCache, digest: str, options_key: str) -> Dict[str, str]:
+    """
+    Load the cleaned cells stored for a notebook.
+
+    Args:
+        cache: Cache of cleaned cells
+        digest: Digest of the notebook's cache key
+        options_key: Result of cache.options_key()
+
+    Returns:
+        Cleaned source by digest of the cell source; empty if nothing was
+        stored or it cannot be read
+    """
+    stored = cache.get_output(digest, options_key)
+    if stored is None:
+        return {}
+    try:
+        cells = json.loads(stored.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return {}
+    if not isinstance(cells, dict):
+        return {}
+    return dict((digest, source) for digest, source in cells.items() if isinstance(source, str))
+
+
+def clean_notebook_counted(
+    data: bytes,
+    engine: str = "splice",
+    strip_outputs: bool = False,
+    cache: Optional[ResultCache] = None,
+    key: Optional[str] = None,
+) -> Tuple[bytes, int, int]:
+    """
+    Remove comments from the code cells of a notebook, counting them.
+
+    Args:
+        data: Notebook file content
+        engine: Cleaning engine (see clean_code)
+        strip_outputs: Also clear the outputs and execution counts of the
+                       code cells
+        cache: Cache of cleaned cells; cells found in it are not counted
+        key: Name the notebook's cells are stored under in the cache, such
+             as its path; the notebook content if None
+
+    Returns:
+        Tuple of (notebook content, comments removed, bytes of comments
+        removed); a notebook that cannot be parsed is returned unchanged
+    """
+    try:
+        original = data.decode("utf-8")
+        notebook = json.loads(original)
+        cells = notebook["cells"] if isinstance(notebook, dict) else None
+        if not isinstance(cells, list):
+            raise ValueError("no cells list")
+    except (UnicodeDecodeError, ValueError, KeyError) as e:
+        logger.error(f"Not a notebook: {e}")
+        return data, 0, 0
+
+    changed = False
+    code_cells = [cell for cell in cells if isinstance(cell, dict) and cell.get("cell_type") == "code"]
+    if strip_outputs:
+        for cell in code_cells:
+            if cell.get("outputs") or cell.get("execution_count") is not None:
+                cell["outputs"] = []
+                cell["execution_count"] = None
+                changed = True
+
+    comments = comment_bytes = 0
+    if _is_python(notebook):
+        sources = []
+        for cell in code_cells:
+            source = cell.get("source", "")
+            sources.append("".join(source) if isinstance(source, list) else source)
+
+        # Cells without a '#' have no comments and are not looked up
+        cleaned = [None if "#" in source else source for source in sources]  # type: List[Optional[str]]
+        if cache is not None:
+            # One entry per notebook holds all its cleaned cells, by cell hash
+            options_key = cache.options_key({"engine": engine, "notebook_cells": True})
+            notebook_digest = cache.content_digest(data if key is None else key.encode("utf-8"))
+            stored = _load_cells(cache, notebook_digest, options_key)
+            digests = {}  # type: Dict[int, str]
+            for position, output in enumerate(cleaned):
+                if output is None:
+                    digests[position] = digest = cache.content_digest(sources[position].encode("utf-8"))
+                    cleaned[position] = stored.get(digest)
+
+        missing = [position for position, output in enumerate(cleaned) if output is None]
+        for position, (output, count, removed) in zip(missing, _clean_cells([sources[p] for p in missing], engine)):
+            cleaned[position] = output
+            comments += count
+            comment_bytes += removed
+
+        if cache is not None and missing:
+            # Only the cells of this version are kept, so edits do not pile up
+            cells = dict((digest, cleaned[position]) for position, digest in digests.items())
+            cache.put_output(notebook_digest, options_key, json.dumps(cells).encode("utf-8"))
+
+        for cell, source, output in zip(code_cells, sources, cleaned):
+            if output != source:
+                cell["source"] = StringIO(output).readlines() if isinstance(cell["source"], list) else output
+                changed = True
+
+    if not changed:
+        return data, 0, 0
+    return _dumps(notebook, original).encode("utf-8"), comments, comment_bytes
+
+
+def clean_notebook(
+    data: bytes,
+    engine: str = "splice",
+    strip_outputs: bool = False,
+    cache: Optional[ResultCache] = None,
+    key: Optional[str] = None,
+) -> bytes:
+    """
+    Remove comments from the code cells of a notebook.
+
+    Args:
+        data: Notebook file content
+        engine: Cleaning engine (see clean_code)
+        strip_outputs: Also clear the outputs and execution counts of the
+                       code cells
+        cache: Cache of cleaned cells, keyed by the hash of their source
+        key: Name the notebook's cells are stored under in the cache, such
+             as its path, so an edited notebook finds the cells of its last
+             version; the notebook content if None
+
+    Returns:
+        The notebook content; unchanged if there was nothing to clean or
+        it cannot be parsed
+    """
+    return clean_notebook_counted(data, engine, strip_outputs, cache, key)[0]
@@ -0,0 +1,420 @@
+"""
+The "scan" engine: find comments without tokenizing.
+
+Cutting comments out only needs to know where each comment is, which is
+much less than the tokens tokenize builds. scan_comments steps over names,
+operators and whitespace with one regular expression and stops only at
+quotes, brackets, backslashes, line ends and '#'. It follows string
+prefixes, triple quotes, line continuations, brackets and indentation, and
+from Python 3.12 f-strings with nested replacement fields (PEP 701).
+
+Whatever it does not follow exactly as tokenize does, such as non-ASCII
+names, tabs in indentation, stray characters, malformed numbers on 3.12
+or unterminated strings, makes it return None, and the caller falls back
+to the tokenize engine. Either way the output is the "splice" engine's.
+"""
+
+import codecs
+import re
+import sys
+import tokenize
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+# From Python 3.12 f-strings are tokenized field by field and may nest
+_PEP701 = sys.version_info >= (3, 12)
+
+# Runs of code that change no state. From 3.12 digits only pass inside
+# names, since its tokenizer rejects malformed numbers such as 0b2 or 1_.
+if _PEP701:
+    _CODE = re.compile(r"[ \t.,:;+\-*/%=<>&|^~@]*(?:[A-Za-z_][A-Za-z0-9_]*[ \t.,:;+\-*/%=<>&|^~@]*)*")
+    # Inside a replacement field ':' and '!' end the expression
+    _EXPRESSION = re.compile(r"[ \t.,;+\-*/%=<>&|^~@]*(?:[A-Za-z_][A-Za-z0-9_]*[ \t.,;+\-*/%=<>&|^~@]*)*")
+    _NUMBER = re.compile(tokenize.Number + r"(?![A-Za-z0-9_])")
+else:
+    _CODE = re.compile(r"[A-Za-z0-9_ \t.,:;+\-*/%=<>&|^~@]*")
+
+_SPACES = re.compile(r" *")
+_BLANK = re.compile(r"[ \t\f]*(?:[#\r\n]|\Z)")
+
+# The rest of a string after its opening quotes, closing quotes included
+_SINGLE = {
+    quote: re.compile(r"[^{0}\\\r\n]*(?:\\(?:\r\n|[\s\S])[^{0}\\\r\n]*)*{0}".format(quote))
+    for quote in "'\""
+}
+_TRIPLE = {
+    quote: re.compile(r"[^{0}\\]*(?:(?:\\[\s\S]|{0}(?!{0}{0}))[^{0}\\]*)*{0}{0}{0}".format(quote))
+    for quote in "'\""
+}
+
+# The literal text of an f-string up to a brace, backslash or quote, and of
+# a format spec, which stops at either quote
+_FSTRING_SINGLE = {quote: re.compile(r"[^{{}}\\\r\n{0}]*".format(quote)) for quote in "'\""}
+_FSTRING_TRIPLE = {quote: re.compile(r"[^{{}}\\{0}]*".format(quote)) for quote in "'\""}
+_FORMAT_SPEC = re.compile(r"[^{}\\\r\n'\"]*")
+
+
+class _Ambiguous(Exception):
+    """
+    Raised when only the tokenizer can tell what the source means.
+    """
+
+
+def _skip_string(text: str, pos: int) -> int:
+    """
+    Find the end of the string literal whose opening quote is at pos.
+
+    Args:
+        text: Source code
+        pos: Offset of the opening quote
+
+    Returns:
+        Offset after the closing quote
+
+    Raises:
+        _Ambiguous: If the string is not terminated
+    """
+    quote = text[pos]
+    triple = text.startswith(quote * 3, pos)
+    if _PEP701 and pos and text[pos - 1] in "fFrR":
+        start = pos - 1
+        while start and (text[start - 1].isalnum() or text[start - 1] == "_"):
+            start -= 1
+        if text[start:pos].lower() in ("f", "fr", "rf"):
+            return _skip_fstring(text, pos, quote, triple)
+
+    if triple:
+        match = _TRIPLE[quote].match(text, pos + 3)
+    else:
+        match = _SINGLE[quote].match(text, pos + 1)
+    if match is None:
+        raise _Ambiguous
+    return match.end()
+
+
+def _skip_fstring(text: str, pos: int, quote: str, triple: bool) -> int:
+    """
+    Find the end of a Python 3.12 f-string, replacement fields included.
+
+    Args:
+        text: Source code
+        pos: Offset of the opening quote
+        quote: The quote character
+        triple: Whether the f-string is triple-quoted
+
+    Returns:
+        Offset after the closing quote
+
+    Raises:
+        _Ambiguous: If the f-string is not terminated or uses \\N{...} or
+            a backslash before a brace
+    """
+    literal = (_FSTRING_TRIPLE if triple else _FSTRING_SINGLE)[quote].match
+    pos += 3 if triple else 1
+    while True:
+        pos = literal(text, pos).end()
+        char = text[pos:pos + 1]
+        if char == quote:
+            if not triple:
+                return pos + 1
+            if text.startswith(quote * 3, pos):
+                return pos + 3
+            pos += 1
+        elif char == "{":
+            if text.startswith("{", pos + 1):
+                pos += 2
+            else:
+                pos = _skip_field(text, pos + 1)
+        elif char == "}":
+            if not text.startswith("}", pos + 1):
+                raise _Ambiguous
+            pos += 2
+        elif char == "\\":
+            following = text[pos + 1:pos + 2]
+            if not following or following in "N{}":
+                raise _Ambiguous
+            pos += 3 if text.startswith("\r\n", pos + 1) else 2
+        else:
+            # A line end in a single-quoted f-string, or the end of the text
+            raise _Ambiguous
+
+
+def _skip_field(text: str, pos: int) -> int:
+    """
+    Find the end of an f-string replacement field.
+
+    Args:
+        text: Source code
+        pos: Offset after the field's opening brace
+
+    Returns:
+        Offset after the field's closing brace
+
+    Raises:
+        _Ambiguous: If the expression holds anything but single-line code
+    """
+    expression = _EXPRESSION.match
+    depth = 0
+    while True:
+        pos = expression(text, pos).end()
+        char = text[pos:pos + 1]
+        if not char:
+            raise _Ambiguous
+        if char in "([{":
+            depth += 1
+            pos += 1
+        elif char == "}":
+            if not depth:
+                return pos + 1
+            depth -= 1
+            pos += 1
+        elif char in ")]":
+            if not depth:
+                raise _Ambiguous
+            depth -= 1
+            pos += 1
+        elif char == ":":
+            if not depth:
+                return _skip_format_spec(text, pos + 1)
+            pos += 1
+        elif char == "!":
+            if text.startswith("=", pos + 1):
+                pos += 2
+            elif depth:
+                raise _Ambiguous
+            else:
+                # Conversion, followed by its name
+                pos += 1
+        elif char == "'" or char == '"':
+            pos = _skip_string(text, pos)
+        elif char.isdigit():
+            # The code before stops after the point of ".5"
+            match = _NUMBER.match(text, pos - 1 if text[pos - 1] == "." else pos)
+            if match is None:
+                raise _Ambiguous
+            pos = match.end()
+        else:
+            raise _Ambiguous
+
+
+def _skip_format_spec(text: str, pos: int) -> int:
+    """
+    Find the end of a replacement field's format spec.
+
+    Args:
+        text: Source code
+        pos: Offset after the ':' that starts the spec
+
+    Returns:
+        Offset after the field's closing brace
+
+    Raises:
+        _Ambiguous: If the spec holds quotes, backslashes or line ends
+    """
+    while True:
+        pos = _FORMAT_SPEC.match(text, pos).end()
+        char = text[pos:pos + 1]
+        if char == "}":
+            return pos + 1
+        if char != "{" or text.startswith("{", pos + 1):
+            raise _Ambiguous
+        pos = _skip_field(text, pos + 1)
+
+
+def _comment_offsets(text: str, pos: int) -> List[Tuple[int, int]]:
+    """
+    Find the comments in source code in one pass.
+
+    Args:
+        text: Source code, with any BOM before pos
+        pos: Offset where the code starts
+
+    Returns:
+        List of (start, end) offsets of each comment, in source order
+
+    Raises:
+        _Ambiguous: If tokenize has to decide
+    """
+    spans = []  # type: List[Tuple[int, int]]
+    append = spans.append
+    code = _CODE.match
+    spaces = _SPACES.match
+    size = len(text)
+    depth = 0  # Open brackets
+    indents = [0]  # Indentation columns of the enclosing blocks
+    line_start = True
+
+    while True:
+        if line_start:
+            # Indentation is checked as tokenize checks it; blank and
+            # comment-only lines have none
+            line_start = False
+            end = spaces(text, pos).end()
+            char = text[end:end + 1]
+            if char in "#\r\n":
+                pass
+            elif char == "\t" or char == "\f":
+                if _BLANK.match(text, end) is None:
+                    raise _Ambiguous
+            elif char == "\\":
+                raise _Ambiguous
+            else:
+                column = end - pos
+                if column > indents[-1]:
+                    indents.append(column)
+                elif column < indents[-1]:
+                    while column < indents[-1]:
+                        indents.pop()
+                    if column != indents[-1]:
+                        raise _Ambiguous
+            pos = end
+
+        pos = code(text, pos).end()
+        if pos >= size:
+            break
+        char = text[pos]
+        if char == "\n":
+            pos += 1
+            line_start = not depth
+        elif char == "#":
+            end = text.find("\n", pos)
+            if end < 0:
+                end = size
+            elif text[end - 1] == "\r":
+                end -= 1
+            append((pos, end))
+            pos = end
+        elif char in "([{":
+            depth += 1
+            pos += 1
+        elif char in ")]}":
+            if not depth:
+                raise _Ambiguous
+            depth -= 1
+            pos += 1
+        elif char == "'" or char == '"':
+            pos = _skip_string(text, pos)
+        elif char == "\r":
+            # Always followed by "\n" (see scan_comments)
+            pos += 1
+        elif char == "\\":
+            if text.startswith("\n", pos + 1):
+                pos += 2
+            elif text.startswith("\r\n", pos + 1):
+                pos += 3
+            else:
+                raise _Ambiguous
+            if pos >= size:
+                raise _Ambiguous
+        elif char == "!":
+            if not text.startswith("=", pos + 1):
+                raise _Ambiguous
+            pos += 2
+        elif _PEP701 and char.isdigit():
+            # The code before stops after the point of ".5"
+            match = _NUMBER.match(text, pos - 1 if text[pos - 1] == "." else pos)
+            if match is None:
+                raise _Ambiguous
+            pos = match.end()
+        else:
+            raise _Ambiguous
+
+    if depth:
+        raise _Ambiguous
+    return spans
+
+
+def _scan(text: str, pos: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Find the comments in source code, or None if tokenize has to decide.
+
+    Args:
+        text: Source code
+        pos: Offset where the code starts
+
+    Returns:
+        List of (start, end) offsets of each comment, or None
+    """
+    # The 3.12 tokenizer rejects NUL anywhere, and disagrees with the pure
+    # Python one on lone carriage returns
+    if "\0" in text or "\r" in text and text.count("\r") != text.count("\r\n"):
+        return None
+    try:
+        return _comment_offsets(text, pos)
+    except _Ambiguous:
+        return None
+    except RecursionError:
+        # f-strings nested beyond the recursion limit
+        return None
+
+
+def scan_comments(
+    code: str,
+    comments: Optional[List[Tuple[int, int, str]]] = None,
+) -> Optional[List[Tuple[int, int]]]:
+    """
+    Find the comments in Python code without tokenizing it.
+
+    Args:
+        code: Python code as a string
+        comments: If given and the scan succeeds, (row, col, text) of each
+                  comment is appended to it, as tokenize reports them
+
+    Returns:
+        List of (start, end) offsets of each comment in code, in source
+        order, or None if the code needs the tokenize engine
+    """
+    spans = _scan(code, 0)
+    if spans is not None and comments is not None:
+        row, line_start = 1, 0
+        for start, end in spans:
+            newline = code.rfind("\n", line_start, start)
+            if newline >= 0:
+                row += code.count("\n", line_start, newline + 1)
+                line_start = newline + 1
+            comments.append((row, start - line_start, code[start:end]))
+    return spans
+
+
+def scan_comment_bytes(
+    data: bytes,
+    comments: Optional[List[Tuple[int, int, str]]] = None,
+) -> Optional[List[Tuple[int, int]]]:
+    """
+    Find the comments in UTF-8 Python source without tokenizing it.
+
+    Only UTF-8 source is scanned: its multi-byte characters never contain
+    an ASCII byte, so the scan can run over the bytes themselves.
+
+    Args:
+        data: Python source as bytes
+        comments: If given and the scan succeeds, (row, col, text) of each
+                  comment is appended to it, as tokenize reports them
+
+    Returns:
+        List of (start, end) byte offsets of each comment, or None if the
+        source is not valid UTF-8 or needs the tokenize engine
+    """
+    start = 3 if data.startswith(codecs.BOM_UTF8) else 0
+    try:
+        encoding, _ = tokenize.detect_encoding(BytesIO(data).readline)
+        text = data.decode("utf-8")
+    except (SyntaxError, UnicodeDecodeError):
+        return None
+    if encoding not in ("utf-8", "utf-8-sig"):
+        return None
+    if len(text) != len(data):
+        # One character per byte, so offsets in the text are byte offsets
+        text = data.decode("latin-1")
+
+    spans = _scan(text, start)
+    if spans is not None and comments is not None:
+        row, line_start = 1, start
+        for span_start, span_end in spans:
+            newline = text.rfind("\n", line_start, span_start)
+            if newline >= 0:
+                row += text.count("\n", line_start, newline + 1)
+                line_start = newline + 1
+            column = len(data[line_start:span_start].decode("utf-8"))
+            comments.append((row, column, data[span_start:span_end].decode("utf-8")))
+    return spans
@@ -0,0 +1,240 @@
+"""
+Sharding: split the files to clean across several machines, such as CI runners.
+
+Every runner discovers the same files and keeps only its own shard. The
+partition depends on nothing but the paths and their sizes, not on the
+order the filesystem lists them in, so the shards of all runners are
+disjoint and together cover every file. Files are assigned largest first
+to the shard with the fewest bytes so far, so each shard has about the
+same amount of source to clean and the runners finish together.
+
+Each runner can write a manifest of its shard (files, bytes, failures and
+seconds), and merge_manifests combines the manifests of all runners into
+one summary, checking that every shard ran against the same file set.
+"""
+
+import heapq
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple, TypeVar, Union
+
+from pycommentcleaner.fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+T = TypeVar("T")
+
+
+class Shard(NamedTuple):
+    """
+    The files of one shard.
+
+    Attributes:
+        index: Shard number, from 1 to count
+        count: Number of shards
+        files: Files of this shard, sorted by path
+        size: Total size of the files, in bytes
+        total_files: Number of files in all shards
+        total_size: Total size of the files in all shards, in bytes
+    """
+
+    index: int
+    count: int
+    files: List[Path]
+    size: int
+    total_files: int
+    total_size: int
+
+
+def _file_size(file_path: Path) -> int:
+    """
+    Return the size of a file in bytes, or 0 if it cannot be read.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Size of the file in bytes
+    """
+    try:
+        return os.stat(str(file_path)).st_size
+    except OSError:
+        return 0
+
+
+def _partition_by_size(items: Iterable[T], count: int, size: Callable[[T], int]) -> Tuple[List[List[T]], List[int]]:
+    """
+    Split items into bins of roughly equal total size.
+
+    Items are assigned largest first, each to the bin with the smallest
+    total so far. Items of the same size keep their order.
+
+    Args:
+        items: Items to split
+        count: Number of bins
+        size: Function giving the size of an item
+
+    Returns:
+        Tuple of (items of each bin, total size of each bin)
+    """
+    sized = sorted(((size(item), item) for item in items), key=lambda pair: pair[0], reverse=True)
+
+    bins = [[] for _ in range(count)]  # type: List[List[T]]
+    heap = [(0, bin_index) for bin_index in range(count)]
+    for item_size, item in sized:
+        total, bin_index = heapq.heappop(heap)
+        bins[bin_index].append(item)
+        heapq.heappush(heap, (total + item_size, bin_index))
+
+    totals = [0] * count
+    for total, bin_index in heap:
+        totals[bin_index] = total
+    return bins, totals
+
+
+def partition_files(file_paths: Iterable[Union[str, Path]], count: int) -> List[Shard]:
+    """
+    Split files into shards of roughly equal total size.
+
+    Args:
+        file_paths: Files to split; duplicates are kept once
+        count: Number of shards
+
+    Returns:
+        All the shards, numbered from 1, some possibly empty
+
+    Raises:
+        ValueError: If count is less than 1
+    """
+    if count < 1:
+        raise ValueError(f"The number of shards must be 1 or greater, got {count}")
+
+    paths = {}  # type: Dict[str, Path]
+    for file_path in file_paths:
+        file_path = Path(file_path)
+        paths.setdefault(file_path.as_posix(), file_path)
+
+    # Sorted by path first, so ties do not depend on the listing order
+    files, totals = _partition_by_size(sorted(paths.items()), count, lambda item: _file_size(item[1]))
+
+    total_size = sum(totals)
+    shards = []
+    for shard_index in range(count):
+        shard_paths = [path for _, path in sorted(files[shard_index])]
+        shards.append(Shard(shard_index + 1, count, shard_paths, totals[shard_index], len(paths), total_size))
+    return shards
+
+
+def shard_files(file_paths: Iterable[Union[str, Path]], index: int, count: int) -> Shard:
+    """
+    Keep the files of one shard (see partition_files).
+
+    Args:
+        file_paths: Files to split, the same on every runner
+        index: Shard to keep, from 1 to count
+        count: Number of shards
+
+    Returns:
+        The shard
+
+    Raises:
+        ValueError: If index is not between 1 and count
+    """
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard {index}/{count} does not exist (shards are numbered from 1 to {count})")
+    shard = partition_files(file_paths, count)[index - 1]
+    logger.info("Shard %d/%d: %d of %d files, %d of %d bytes",
+                index, count, len(shard.files), shard.total_files, shard.size, shard.total_size)
+    return shard
+
+
+def write_manifest(
+    manifest_path: Union[str, Path],
+    shard: Shard,
+    results: Sequence[Tuple[str, bool, str]],
+    seconds: float,
+) -> Dict[str, Any]:
+    """
+    Save what a shard did, for merge_manifests.
+
+    Args:
+        manifest_path: JSON file to write
+        shard: The shard that ran
+        results: Tuples of (file_path, success, message) for its files
+        seconds: Time the shard took
+
+    Returns:
+        The manifest written
+    """
+    failures = [{"path": file_path, "message": message} for file_path, success, message in results if not success]
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "shard": shard.index,
+        "shards": shard.count,
+        "files": len(results),
+        "failed": len(failures),
+        "bytes": shard.size,
+        "seconds": round(seconds, 3),
+        "total_files": shard.total_files,
+        "total_bytes": shard.total_size,
+        "failures": failures,
+    }
+    atomic_write(manifest_path, (json.dumps(manifest, indent=2) + "\n").encode("utf-8"))
+    return manifest
+
+
+def merge_manifests(manifest_paths: Iterable[Union[str, Path]]) -> Dict[str, Any]:
+    """
+    Combine the manifests of the shards of one run.
+
+    Args:
+        manifest_paths: JSON files written by write_manifest
+
+    Returns:
+        Summary with the number of shards, the shards present and missing,
+        the files, failures and bytes of all shards, the seconds of the
+        slowest shard and their sum, and the failures of all shards
+
+    Raises:
+        ValueError: If a manifest cannot be read, or the manifests are not
+            from the shards of a single run
+    """
+    manifests = {}  # type: Dict[int, Dict[str, Any]]
+    shapes = set()
+    for manifest_path in manifest_paths:
+        try:
+            with open(manifest_path, "rb") as file:
+                manifest = json.loads(file.read().decode("utf-8"))
+            if manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"unsupported version {manifest.get('version')!r}")
+            index = manifest["shard"]
+            shapes.add((manifest["shards"], manifest["total_files"], manifest["total_bytes"]))
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            raise ValueError(f"Cannot read manifest {manifest_path}: {e}")
+        if index in manifests:
+            raise ValueError(f"Shard {index} appears twice, in {manifest_path}")
+        manifests[index] = manifest
+
+    if not manifests:
+        raise ValueError("No manifests to merge")
+    if len(shapes) > 1:
+        raise ValueError("The manifests are from runs with different shard counts or file sets")
+    count, total_files, _ = shapes.pop()
+
+    seconds = [manifest["seconds"] for manifest in manifests.values()]
+    return {
+        "shards": count,
+        "present": sorted(manifests),
+        "missing": [index for index in range(1, count + 1) if index not in manifests],
+        "files": sum(manifest["files"] for manifest in manifests.values()),
+        "failed": sum(manifest["failed"] for manifest in manifests.values()),
+        "bytes": sum(manifest["bytes"] for manifest in manifests.values()),
+        "total_files": total_files,
+        "seconds": max(seconds),
+        "total_seconds": round(sum(seconds), 3),
+        "failures": [failure for index in sorted(manifests) for failure in manifests[index]["failures"]],
+    }
@@ -0,0 +1,144 @@
+"""
+Tests for the asyncio interface of pycommentcleaner.
+"""
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from pycommentcleaner import aio
+from pycommentcleaner.aio import aclean_files
+
+
+def run(coroutine):
+    """Run a coroutine on a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def collect(*args, **kwargs):
+    """Gather every result of aclean_files."""
+    return [result async for result in aclean_files(*args, **kwargs)]
+
+
+class TestAcleanFiles:
+    """Test cases for the aclean_files coroutine."""
+
+    def test_clean_files(self):
+        """Test that every file is cleaned and reported."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for index in range(5):
+                path = Path(temp_dir) / f"m{index}.py"
+                path.write_text(f"x = {index}  # Comment\n")
+                paths.append(path)
+
+            results = run(collect(paths, concurrency=2))
+
+            assert sorted(result[0] for result in results) == sorted(str(path) for path in paths)
+            assert all(success for _, success, _ in results)
+            assert (Path(temp_dir) / "m3_cleaned.py").read_text() == "x = 3  \n"
+
+    def test_output_dir_and_failures(self):
+        """Test output_dir naming and that failing files are reported."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "a.py"
+            source.write_text("# Comment\nx = 1\n")
+            output_dir = Path(temp_dir) / "out"
+
+            results = dict((path, (success, message)) for path, success, message in run(collect(
+                [source, Path(temp_dir) / "missing.py", Path(temp_dir) / "notes.txt"], output_dir=output_dir,
+            )))
+
+            assert results[str(source)][0]
+            assert (output_dir / "a_cleaned.py").read_text() == "\nx = 1\n"
+            assert results[str(Path(temp_dir) / "missing.py")] == (False, f"File not found: {Path(temp_dir) / 'missing.py'}")
+            assert not results[str(Path(temp_dir) / "notes.txt")][0]
+
+    def test_output_dir_layout_and_same_output(self):
+        """Test that roots keep their layout in output_dir and a repeated output fails."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = [Path(temp_dir) / "a" / "__init__.py", Path(temp_dir) / "b" / "__init__.py"]
+            for path in paths:
+                path.parent.mkdir()
+                path.write_text("x = 1  # Comment\n")
+            output_dir = Path(temp_dir) / "out"
+
+            results = run(collect(paths, output_dir=output_dir, roots=[temp_dir]))
+            assert all(success for _, success, _ in results)
+            assert (output_dir / "b" / "__init___cleaned.py").read_text() == "x = 1  \n"
+
+            results = dict((path, success) for path, success, _ in run(collect(paths, output_dir=output_dir)))
+            assert results == {str(paths[0]): True, str(paths[1]): False}
+
+    def test_in_place_unchanged(self):
+        """Test that files without comments are left alone in place."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "a.py"
+            path.write_text("x = 1\n")
+
+            [(_, success, message)] = run(collect([path], in_place=True))
+
+            assert success
+            assert message == f"Unchanged: {path}"
+
+    def test_hardlinked_output_is_not_written_through(self):
+        """Test that writing an output hard-linked to its input leaves the input alone."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "a.py"
+            path.write_text("x = 1  # Comment\n")
+            output_path = Path(temp_dir) / "a_cleaned.py"
+            os.link(str(path), str(output_path))
+
+            [(_, success, message)] = run(collect([path]))
+
+            assert success, message
+            assert path.read_text() == "x = 1  # Comment\n"
+            assert output_path.read_text() == "x = 1  \n"
+
+    def test_inflight_bytes_bound(self, monkeypatch):
+        """Test that the in-flight byte budget is never exceeded."""
+        peak = []
+        acquire = aio._ByteBudget.acquire
+
+        async def tracking_acquire(self, size):
+            await acquire(self, size)
+            peak.append(self.used)
+
+        monkeypatch.setattr(aio._ByteBudget, "acquire", tracking_acquire)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for index in range(6):
+                path = Path(temp_dir) / f"m{index}.py"
+                path.write_text("x = 1  # Comment\n" * 10)
+                paths.append(path)
+            size = paths[0].stat().st_size
+
+            results = run(collect(paths, concurrency=6, max_inflight_bytes=size * 2))
+
+        assert len(results) == 6
+        assert max(peak) <= size * 2
+
+    def test_oversized_file_is_cleaned(self):
+        """Test that a file larger than the budget still goes through."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "a.py"
+            path.write_text("x = 1  # Comment\n" * 100)
+
+            [(_, success, _)] = run(collect([path], max_inflight_bytes=1))
+
+        assert success
+
+    def test_invalid_arguments(self):
+        """Test that bad arguments are rejected."""
+        with pytest.raises(ValueError):
+            run(collect([], concurrency=0))
+        with pytest.raises(ValueError):
+            run(collect([], output_dir="out", in_place=True))
@@ -0,0 +1,216 @@
+"""
+Tests for the archive cleaning of pycommentcleaner.
+"""
+
+import base64
+import csv
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import zipapp
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from pycommentcleaner.archive import archive_output_path, archive_suffix, clean_archive, clean_archives
+from pycommentcleaner.cli import main
+
+RECORD = "pkg-1.0.dist-info/RECORD"
+
+
+def _sha256(data):
+    """Hash data the way a wheel RECORD does."""
+    return "sha256=" + base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode("ascii")
+
+
+def _make_wheel(path):
+    """Write a small wheel with a RECORD and a signature."""
+    members = {
+        "pkg/__init__.py": b"x = 1  # Comment\n",
+        "pkg/plain.py": b"y = 2\n",
+        "pkg/data.bin": bytes(range(256)) * 20,
+    }
+    with zipfile.ZipFile(path, "w") as wheel:
+        for name, data in members.items():
+            wheel.writestr(name, data, compress_type=zipfile.ZIP_DEFLATED)
+        record = "".join(f"{name},{_sha256(data)},{len(data)}\n" for name, data in members.items())
+        wheel.writestr(RECORD, record + f"{RECORD},,\n")
+        wheel.writestr(RECORD + ".jws", "{}")
+    return members
+
+
+class TestArchivePaths:
+    """Test cases for archive names."""
+
+    @pytest.mark.parametrize("name, suffix", [
+        ("pkg-1.0-py3-none-any.whl", ".whl"),
+        ("pkg-1.0.tar.gz", ".tar.gz"),
+        ("PKG.TGZ", ".tgz"),
+        ("app.pyz", ".pyz"),
+        ("module.py", None),
+    ])
+    def test_archive_suffix(self, name, suffix):
+        """Test that compound suffixes are recognized."""
+        assert archive_suffix(name) == suffix
+
+    def test_output_path(self):
+        """Test the '_cleaned' name and the unchanged name in an output directory."""
+        assert archive_output_path("dist/pkg-1.0.tar.gz") == Path("dist/pkg-1.0_cleaned.tar.gz")
+        assert archive_output_path("dist/pkg.whl", "out") == Path("out/pkg.whl")
+
+
+class TestCleanZip:
+    """Test cases for cleaning zip archives."""
+
+    def test_wheel(self):
+        """Test that Python members are cleaned and the RECORD matches the new contents."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "pkg-1.0-py3-none-any.whl"
+            members = _make_wheel(source)
+            destination = Path(temp_dir) / "out.whl"
+
+            success, _ = clean_archive(source, destination)
+
+            assert success
+            with zipfile.ZipFile(destination) as wheel:
+                assert wheel.testzip() is None
+                assert wheel.namelist() == ["pkg/__init__.py", "pkg/plain.py", "pkg/data.bin", RECORD]
+                assert wheel.read("pkg/__init__.py") == b"x = 1  \n"
+                assert wheel.read("pkg/data.bin") == members["pkg/data.bin"]
+                rows = list(csv.reader(io.StringIO(wheel.read(RECORD).decode("utf-8"))))
+                for name, digest, size in rows[:-1]:
+                    assert digest == _sha256(wheel.read(name))
+                    assert int(size) == len(wheel.read(name))
+                assert rows[-1] == [RECORD, "", ""]
+
+    def test_unchanged_members_are_not_recompressed(self):
+        """Test that members without comments keep their compressed bytes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "data.zip"
+            with zipfile.ZipFile(source, "w") as archive:
+                archive.writestr("notes.txt", b"# not Python\n" * 100, compress_type=zipfile.ZIP_DEFLATED)
+                archive.writestr("plain.py", b"y = 2\n" * 100, compress_type=zipfile.ZIP_DEFLATED)
+            clean_archive(source)
+
+            with zipfile.ZipFile(source) as before, zipfile.ZipFile(Path(temp_dir) / "data_cleaned.zip") as after:
+                for name in ("notes.txt", "plain.py"):
+                    assert after.getinfo(name).compress_size == before.getinfo(name).compress_size
+                    assert after.getinfo(name).CRC == before.getinfo(name).CRC
+                    assert after.read(name) == before.read(name)
+
+    def test_zipapp_keeps_shebang(self):
+        """Test that a cleaned zipapp still runs."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            app = Path(temp_dir) / "app"
+            app.mkdir()
+            (app / "__main__.py").write_text("print('hello')  # Comment\n")
+            source = Path(temp_dir) / "app.pyz"
+            zipapp.create_archive(str(app), str(source), interpreter="/usr/bin/env python3")
+
+            success, _ = clean_archive(source)
+
+            destination = Path(temp_dir) / "app_cleaned.pyz"
+            assert success
+            assert destination.read_bytes().startswith(b"#!/usr/bin/env python3\n")
+            output = subprocess.run([sys.executable, str(destination)], stdout=subprocess.PIPE).stdout
+            assert output.strip() == b"hello"
+
+    def test_executor(self):
+        """Test that cleaning in an executor keeps the member order."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "many.zip"
+            names = [f"m{index}.py" if index % 3 else f"m{index}.txt" for index in range(200)]
+            with zipfile.ZipFile(source, "w") as archive:
+                for name in names:
+                    archive.writestr(name, f"value = '{name}'  # Comment\n")
+
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                success, _ = clean_archive(source, executor=executor)
+
+            assert success
+            with zipfile.ZipFile(Path(temp_dir) / "many_cleaned.zip") as archive:
+                assert archive.namelist() == names
+                assert archive.read("m1.py") == b"value = 'm1.py'  \n"
+                assert archive.read("m0.txt") == b"value = 'm0.txt'  # Comment\n"
+
+    def test_bad_archive(self):
+        """Test that a damaged archive fails without leaving an output behind."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "broken.whl"
+            source.write_bytes(b"not a zip")
+
+            success, message = clean_archive(source)
+
+            assert not success
+            assert "Error cleaning archive" in message
+            assert os.listdir(temp_dir) == ["broken.whl"]
+
+
+class TestCleanTar:
+    """Test cases for cleaning tar archives."""
+
+    @pytest.mark.parametrize("suffix", [".tar.gz", ".tar", ".tar.xz"])
+    def test_sdist(self, suffix):
+        """Test that Python members are cleaned and other members are kept in order."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / f"pkg-1.0{suffix}"
+            members = [
+                ("pkg-1.0/a.py", b"a = 1  # Comment\n"),
+                ("pkg-1.0/README", b"# Title\n"),
+                ("pkg-1.0/b.py", b"b = 2\n"),
+            ]
+            with tarfile.open(str(source), "w:" + suffix.split(".")[-1].replace("tar", "")) as archive:
+                for name, data in members:
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    info.mode = 0o644
+                    archive.addfile(info, io.BytesIO(data))
+
+            success, _ = clean_archive(source)
+
+            assert success
+            with tarfile.open(str(Path(temp_dir) / f"pkg-1.0_cleaned{suffix}")) as archive:
+                contents = [(member.name, archive.extractfile(member).read()) for member in archive]
+                assert archive.getmember("pkg-1.0/a.py").mode == 0o644
+            assert contents == [
+                ("pkg-1.0/a.py", b"a = 1  \n"),
+                ("pkg-1.0/README", b"# Title\n"),
+                ("pkg-1.0/b.py", b"b = 2\n"),
+            ]
+
+
+class TestCleanArchives:
+    """Test cases for cleaning several archives."""
+
+    def test_in_place(self):
+        """Test that archives can replace themselves."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "pkg-1.0-py3-none-any.whl"
+            _make_wheel(source)
+
+            results = clean_archives([source], jobs=2, backend="thread", in_place=True)
+
+            assert results[0][1]
+            with zipfile.ZipFile(source) as wheel:
+                assert wheel.read("pkg/__init__.py") == b"x = 1  \n"
+
+    def test_cli(self):
+        """Test that archives given on the command line are cleaned along with files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "pkg-1.0-py3-none-any.whl"
+            _make_wheel(source)
+            script = Path(temp_dir) / "script.py"
+            script.write_text("z = 3  # Comment\n")
+            output_dir = Path(temp_dir) / "out"
+
+            assert main([str(source), str(script), "-o", str(output_dir)]) == 0
+
+            with zipfile.ZipFile(output_dir / source.name) as wheel:
+                assert wheel.read("pkg/__init__.py") == b"x = 1  \n"
+            assert (output_dir / "script_cleaned.py").read_text() == "z = 3  \n"
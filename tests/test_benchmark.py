@@ -0,0 +1,112 @@
+"""
+Tests for the benchmark suite of pycommentcleaner.
+"""
+
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from pycommentcleaner.benchmark import compare, generate_corpus, main, run_benchmarks, stdlib_corpus, verify
+
+
+class TestCorpus:
+    """Test cases for the benchmark corpora."""
+
+    def test_synthetic_corpus_is_reproducible(self):
+        """Test that the same seed produces the same files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = generate_corpus(Path(temp_dir) / "a", files=3, lines_per_file=50, seed=1)
+            second = generate_corpus(Path(temp_dir) / "b", files=3, lines_per_file=50, seed=1)
+
+            assert [path.read_text() for path in first] == [path.read_text() for path in second]
+
+    def test_comment_density(self):
+        """Test that the density controls how many comments are generated."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sparse = generate_corpus(Path(temp_dir) / "a", files=2, lines_per_file=200, comment_density=0.0)
+            dense = generate_corpus(Path(temp_dir) / "b", files=2, lines_per_file=200, comment_density=1.0)
+
+            def count(paths):
+                return sum(path.read_text().count("# TODO") + path.read_text().count("# noqa") for path in paths)
+
+            assert count(sparse) == 0
+            assert count(dense) > 10
+
+    def test_stdlib_corpus(self):
+        """Test that standard library modules are found."""
+        paths = stdlib_corpus(limit=5)
+        assert len(paths) == 5
+        assert all(path.suffix == ".py" for path in paths)
+
+
+class TestVerify:
+    """Test cases for the AST equivalence check."""
+
+    def test_synthetic_corpus_is_equivalent(self):
+        """Test that cleaning the synthetic corpus keeps every AST."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = generate_corpus(Path(temp_dir), files=3, lines_per_file=80)
+
+            assert verify(paths, "splice") == []
+            assert verify(paths, "untokenize") == []
+
+    def test_mismatch_is_reported(self, monkeypatch):
+        """Test that a cleaner that changes the code is caught."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "a.py"
+            path.write_text("x = 1\n")
+            monkeypatch.setattr("pycommentcleaner.benchmark.clean_code", lambda code, engine: "x = 2\n")
+
+            assert verify([path]) == [str(path)]
+
+
+class TestRegressionGate:
+    """Test cases for the baseline comparison."""
+
+    RESULTS = {"clean_code[splice]": {"mb_per_s": 8.0}, "clean_file[splice]": {"mb_per_s": 5.0}}
+
+    def test_within_threshold(self):
+        """Test that small drops pass."""
+        baseline = {"clean_code[splice]": {"mb_per_s": 9.0}, "clean_file[splice]": {"mb_per_s": 5.0}}
+        assert compare(self.RESULTS, baseline, threshold=0.2) == []
+
+    def test_regression(self):
+        """Test that drops past the threshold are reported."""
+        baseline = {"clean_code[splice]": {"mb_per_s": 20.0}, "removed[splice]": {"mb_per_s": 1.0}}
+        regressions = compare(self.RESULTS, baseline, threshold=0.2)
+        assert len(regressions) == 1
+        assert regressions[0].startswith("clean_code[splice]")
+
+
+class TestRunBenchmarks:
+    """Test cases for running the benchmarks."""
+
+    def test_results(self):
+        """Test that every target reports throughput."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = generate_corpus(Path(temp_dir), files=2, lines_per_file=30)
+
+            results = run_benchmarks(paths, engines=["splice"], jobs=1, repeat=1, isolate=False)
+
+        assert set(results) == {"clean_code[splice]", "clean_file[splice]", "clean_files[splice]"}
+        for result in results.values():
+            assert result["files"] == 2
+            assert result["mb_per_s"] > 0
+            assert result["files_per_s"] > 0
+
+    @pytest.mark.parametrize("baseline_speed, expected_exit_code", [(1e-6, 0), (1e6, 1)])
+    def test_main_baseline_gate(self, baseline_speed, expected_exit_code):
+        """Test that main saves a baseline and fails on a regression."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            saved = Path(temp_dir) / "saved.json"
+            baseline = Path(temp_dir) / "baseline.json"
+            common = ["--files", "2", "--lines", "30", "--engine", "splice", "--repeat", "1", "--no-isolate", "-j", "1"]
+
+            assert main(common + ["--save-baseline", str(saved)]) == 0
+
+            results = json.loads(saved.read_text())
+            baseline.write_text(json.dumps({name: {"mb_per_s": baseline_speed} for name in results}))
+
+            assert main(common + ["--baseline", str(baseline)]) == expected_exit_code
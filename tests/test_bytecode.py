@@ -0,0 +1,156 @@
+"""
+Tests for the .pyc emission of pycommentcleaner.
+"""
+
+import os
+import py_compile
+import subprocess
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from pycommentcleaner.bytecode import pyc_is_current, pyc_path, write_pyc
+from pycommentcleaner.cache import ResultCache
+from pycommentcleaner.cli import main
+from pycommentcleaner.core import clean_file, clean_files
+
+MODES = {
+    "timestamp": py_compile.PycInvalidationMode.TIMESTAMP,
+    "checked-hash": py_compile.PycInvalidationMode.CHECKED_HASH,
+    "unchecked-hash": py_compile.PycInvalidationMode.UNCHECKED_HASH,
+}
+
+
+class TestWritePyc:
+    """Test cases for write_pyc."""
+
+    @pytest.mark.parametrize("mode", sorted(MODES))
+    @pytest.mark.parametrize("optimize", [-1, 0, 2])
+    def test_matches_py_compile(self, mode, optimize):
+        """Test that the .pyc is the one py_compile writes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_path = Path(temp_dir) / "module.py"
+            source = b'"""Doc."""\nassert True\nx = 1\n'
+            source_path.write_bytes(source)
+
+            target = write_pyc(source, source_path, invalidation=mode, optimize=optimize)
+            written = target.read_bytes()
+            target.unlink()
+            expected = py_compile.compile(
+                str(source_path), doraise=True, optimize=optimize, invalidation_mode=MODES[mode]
+            )
+
+            assert str(target) == expected
+            assert written == Path(expected).read_bytes()
+
+    @pytest.mark.parametrize("mode", sorted(MODES))
+    def test_pyc_is_current(self, mode):
+        """Test that a .pyc is current until it is removed or its source changes."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_path = Path(temp_dir) / "module.py"
+            source_path.write_bytes(b"x = 1\n")
+            assert not pyc_is_current(source_path, mode)
+
+            write_pyc(b"x = 1\n", source_path, invalidation=mode)
+            assert pyc_is_current(source_path, mode)
+            assert not pyc_is_current(source_path, mode, optimize=2)
+
+            source_path.write_bytes(b"x = 22\n")
+            os.utime(str(source_path), (0, 0))
+            assert not pyc_is_current(source_path, mode)
+
+    def test_pyc_path(self):
+        """Test the __pycache__ names of the optimization levels."""
+        tag = sys.implementation.cache_tag
+        assert pyc_path("pkg/mod.py", 0) == Path(f"pkg/__pycache__/mod.{tag}.pyc")
+        assert pyc_path("pkg/mod.py", 2) == Path(f"pkg/__pycache__/mod.{tag}.opt-2.pyc")
+
+    def test_unknown_mode(self):
+        """Test that an unknown invalidation mode is refused."""
+        with pytest.raises(ValueError):
+            write_pyc(b"x = 1\n", "module.py", invalidation="never")
+
+
+class TestCleanFilePyc:
+    """Test cases for compiling while cleaning."""
+
+    def test_in_place(self):
+        """Test that the .pyc of a cleaned file is valid for the import system."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "module.py"
+            source.write_text("VALUE = 42  # Comment\n")
+
+            success, _ = clean_file(source, in_place=True, pyc="timestamp")
+
+            assert success
+            result = subprocess.run(
+                [sys.executable, "-v", "-c", "import module; print(module.VALUE)"],
+                cwd=temp_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+            assert result.stdout.strip() == b"42"
+            assert f"{pyc_path(source)} matches {source}".encode() in result.stderr
+
+    def test_unchanged_file_is_compiled(self):
+        """Test that files without comments still get their .pyc."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "module.py"
+            source.write_text("x = 1\n")
+
+            success, message = clean_file(source, in_place=True, pyc="checked-hash")
+
+            assert success
+            assert message.startswith("Unchanged")
+            assert pyc_path(source).exists()
+
+    @pytest.mark.parametrize("in_place", [False, True])
+    def test_cache_hit_rebuilds_missing_pyc(self, in_place):
+        """Test that a cached file whose .pyc was deleted is compiled again."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "module.py"
+            source.write_text("x = 1  # Comment\n")
+            output = source if in_place else Path(temp_dir) / "module_cleaned.py"
+            cache = ResultCache(Path(temp_dir) / "cache")
+
+            assert clean_file(source, in_place=in_place, pyc="timestamp", cache=cache)[0]
+            success, message = clean_file(source, in_place=in_place, pyc="timestamp", cache=cache)
+            assert success and message.startswith("Up to date")
+
+            shutil.rmtree(str(pyc_path(output).parent))
+            success, message = clean_file(source, in_place=in_place, pyc="timestamp", cache=cache)
+
+            assert success, message
+            assert pyc_is_current(output, "timestamp")
+
+    def test_syntax_error(self):
+        """Test that a file that does not compile is reported."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "broken.py"
+            source.write_text("def f(:  # Comment\n")
+
+            success, message = clean_file(source, pyc="timestamp")
+
+            assert not success
+            assert "Cannot compile" in message
+
+    def test_clean_files_threads(self):
+        """Test that a worker pool compiles the outputs next to them."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sources = []
+            for index in range(4):
+                sources.append(Path(temp_dir) / f"m{index}.py")
+                sources[-1].write_text(f"x = {index}  # Comment\n")
+            output_dir = Path(temp_dir) / "out"
+
+            results = clean_files(sources, output_dir=output_dir, jobs=2, backend="thread", pyc="timestamp", optimize=1)
+
+            assert all(success for _, success, _ in results)
+            for index in range(4):
+                assert pyc_path(output_dir / f"m{index}_cleaned.py", 1).exists()
+
+    def test_cli_rejects_stream(self, capsys):
+        """Test that --pyc cannot be combined with --stream."""
+        assert main(["file.py", "--pyc", "--stream"]) == 2
+        assert "--pyc cannot be combined" in capsys.readouterr().err
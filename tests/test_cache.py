@@ -0,0 +1,180 @@
+"""
+Tests for the result cache of pycommentcleaner.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pycommentcleaner.cache import MemoryCache, ResultCache
+from pycommentcleaner.core import clean_code, clean_file, clean_files
+
+
+def _age(path, seconds=60):
+    """Move a file's timestamps into the past, out of the racy window."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns - seconds * 10**9, stat.st_mtime_ns - seconds * 10**9))
+
+
+@pytest.fixture
+def workspace():
+    """Create a source file and a cache in a temporary directory."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = Path(temp_dir) / "test.py"
+        file_path.write_text("x = 1  # Comment\n")
+        _age(file_path)
+        yield file_path, ResultCache(Path(temp_dir) / "cache")
+
+
+class TestCleanFileWithCache:
+    """Test cases for clean_file with a cache."""
+
+    def test_unchanged_file_is_skipped(self, workspace):
+        """Test that a second run neither reads nor rewrites the file."""
+        file_path, cache = workspace
+        output_path = file_path.with_name("test_cleaned.py")
+
+        success, message = clean_file(file_path, cache=cache)
+        assert success and message.startswith("Successfully")
+
+        real_open = open
+
+        def guarded_open(path, *args, **kwargs):
+            assert Path(path) != file_path, "source file was read"
+            return real_open(path, *args, **kwargs)
+
+        with patch("builtins.open", side_effect=guarded_open):
+            success, message = clean_file(file_path, cache=cache)
+
+        assert success and message.startswith("Up to date")
+        assert output_path.read_text() == "x = 1  \n"
+
+    def test_touched_file_is_checked_by_hash(self, workspace):
+        """Test that a file with a new mtime but the same content is skipped."""
+        file_path, cache = workspace
+        clean_file(file_path, cache=cache)
+        os.utime(file_path)
+
+        with patch("pycommentcleaner.core.clean_code", side_effect=clean_code) as mock_clean_code:
+            success, message = clean_file(file_path, cache=cache)
+
+        assert success and message.startswith("Up to date")
+        mock_clean_code.assert_not_called()
+
+    def test_changed_file_is_cleaned_again(self, workspace):
+        """Test that new content is cleaned and written."""
+        file_path, cache = workspace
+        clean_file(file_path, cache=cache)
+        file_path.write_text("y = 2  # Changed\n")
+
+        success, message = clean_file(file_path, cache=cache)
+
+        assert success and message.startswith("Successfully")
+        assert file_path.with_name("test_cleaned.py").read_text() == "y = 2  \n"
+
+    def test_deleted_output_is_restored_from_cache(self, workspace):
+        """Test that a missing output is rewritten without tokenizing again."""
+        file_path, cache = workspace
+        output_path = file_path.with_name("test_cleaned.py")
+        clean_file(file_path, cache=cache)
+        output_path.unlink()
+
+        with patch("pycommentcleaner.core.clean_code") as mock_clean_code:
+            success, _ = clean_file(file_path, cache=cache)
+
+        assert success
+        mock_clean_code.assert_not_called()
+        assert output_path.read_text() == "x = 1  \n"
+
+    def test_options_are_part_of_the_key(self, workspace):
+        """Test that another engine does not reuse the cached output."""
+        file_path, cache = workspace
+        clean_file(file_path, cache=cache)
+
+        success, message = clean_file(file_path, engine="untokenize", cache=cache)
+
+        assert success and message.startswith("Successfully")
+
+    def test_in_place_second_run_is_skipped(self, workspace):
+        """Test that a file cleaned in place is up to date on the next run."""
+        file_path, cache = workspace
+
+        success, message = clean_file(file_path, in_place=True, cache=cache)
+        assert success and message.startswith("Successfully")
+
+        with patch("pycommentcleaner.core.clean_code") as mock_clean_code:
+            success, message = clean_file(file_path, in_place=True, cache=cache)
+
+        assert success and message.startswith("Up to date")
+        mock_clean_code.assert_not_called()
+        assert file_path.read_text() == "x = 1  \n"
+
+    def test_clean_files_with_processes(self, workspace):
+        """Test that the cache works from worker processes."""
+        file_path, cache = workspace
+        other_path = file_path.with_name("other.py")
+        other_path.write_text("z = 3  # Comment\n")
+        _age(other_path)
+
+        first = clean_files([file_path, other_path], jobs=2, cache=cache)
+        second = clean_files([file_path, other_path], jobs=2, cache=cache)
+
+        assert all(message.startswith("Successfully") for _, _, message in first)
+        assert all(message.startswith("Up to date") for _, _, message in second)
+
+
+class TestPrune:
+    """Test cases for the size-bounded eviction."""
+
+    def test_prune_removes_least_recently_used(self):
+        """Test that the oldest cache files are removed first."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResultCache(temp_dir, max_bytes=250)
+            for i in range(5):
+                digest = cache.content_digest(str(i).encode())
+                cache.put_output(digest, "options", b"x" * 100)
+                path = cache._path("objects", cache._hash(digest, "options"))
+                os.utime(path, ns=(i * 10**9, i * 10**9))
+
+            freed = cache.prune()
+
+            assert freed == 300
+            assert cache.get_output(cache.content_digest(b"0"), "options") is None
+            assert cache.get_output(cache.content_digest(b"4"), "options") == b"x" * 100
+
+    def test_prune_empty_cache(self):
+        """Test pruning a cache that was never written."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            assert ResultCache(Path(temp_dir) / "missing").prune() == 0
+
+
+class TestMemoryCache:
+    """Test cases for the in-memory cache."""
+
+    def test_unchanged_file_is_skipped(self):
+        """Test that a second run with a memory cache skips the file."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = 1  # Comment\n")
+            _age(file_path)
+            cache = MemoryCache()
+
+            assert clean_file(file_path, cache=cache)[1].startswith("Successfully")
+            assert clean_file(file_path, cache=cache)[1].startswith("Up to date")
+            assert not (Path(temp_dir) / ".pycommentcleaner_cache").exists()
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the cache stays under max_bytes, dropping old items first."""
+        cache = MemoryCache(max_bytes=1200)
+        digests = [cache.content_digest(str(i).encode()) for i in range(3)]
+        for digest in digests[:2]:
+            cache.put_output(digest, "options", b"x" * 300)
+        cache.get_output(digests[0], "options")
+        cache.put_output(digests[2], "options", b"x" * 300)
+
+        assert cache.size <= 1200
+        assert cache.get_output(digests[1], "options") is None
+        assert cache.get_output(digests[0], "options") == b"x" * 300
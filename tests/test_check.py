@@ -0,0 +1,155 @@
+"""
+Tests for the check mode of pycommentcleaner.
+"""
+
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pycommentcleaner.check import check_file, check_files, has_comments
+from pycommentcleaner.cli import main
+from pycommentcleaner.core import clean_bytes
+
+
+class TestHasComments:
+    """Test cases for the has_comments function."""
+
+    @pytest.mark.parametrize("data, expected", [
+        (b"x = 1\n", False),
+        (b"x = 1  # Comment\n", True),
+        (b"s = '# not a comment'\n", False),
+        (b'"""\n# docstring\n"""\n', False),
+        (b"x = 1\n# Last line", True),
+        (b"", False),
+    ])
+    def test_detection(self, data, expected):
+        """Test that only real comment tokens count."""
+        assert has_comments(data) is expected
+
+    def test_skips_tokenizer_without_hash(self):
+        """Test that sources without '#' are not tokenized."""
+        with patch("tokenize.tokenize") as mock_tokenize:
+            assert has_comments(b"x = 1\n" * 1000) is False
+        mock_tokenize.assert_not_called()
+
+    def test_stops_at_first_comment(self):
+        """Test that tokenizing stops at the first comment."""
+        lines = [b"# First\n", b"x = 1\n", b"y = 2  # Second\n"]
+        read = []
+
+        class Source:
+            def __init__(self, data):
+                pass
+
+            def readline(self):
+                line = lines[len(read)] if len(read) < len(lines) else b""
+                read.append(line)
+                return line
+
+        with patch("pycommentcleaner.check.BytesIO", Source):
+            assert has_comments(b"".join(lines)) is True
+        assert len(read) < len(lines)
+
+    @pytest.mark.parametrize("data", [
+        b"# First\nx = 1\ny = $\n",
+        "x\u0301 = 1  # First\n".encode("utf-8"),
+        b"x = 1  # First\ry = 2\r",
+    ])
+    def test_error_token_is_code(self, data):
+        """Test that error tokens cleaning keeps as code do not hide the comments."""
+        assert clean_bytes(data) != data
+        assert has_comments(data) is True
+
+    def test_error_before_comment(self):
+        """Test that a comment after an unterminated string is not reported, as cleaning keeps it."""
+        data = b"x = 'open\ny = 1  # First\n"
+        assert clean_bytes(data) == data
+        assert has_comments(data) is False
+
+    def test_kept_coding_cookie(self):
+        """Test that a coding cookie cleaning keeps is not reported."""
+        data = "# -*- coding: latin-1 -*-\nx = 'é'\n".encode("latin-1")
+        assert clean_bytes(data) == data
+        assert has_comments(data) is False
+
+    def test_invalid_source(self):
+        """Test that source that cannot be tokenized has no removable comments."""
+        assert has_comments(b'x = "unclosed\n# Comment\n') is False
+
+
+class TestCheckFiles:
+    """Test cases for checking files."""
+
+    def test_stats(self):
+        """Test that comments and their bytes are counted."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir, "test.py")
+            file_path.write_bytes(b"x = 1  # One\n# Two\n")
+
+            result = check_file(file_path, stats=True)
+
+            assert result.has_comments
+            assert (result.comments, result.comment_bytes, result.size) == (2, 10, 19)
+            assert check_file(file_path).comments is None
+
+    def test_errors(self):
+        """Test that unreadable and non-Python files are reported."""
+        assert "File not found" in check_file("missing.py").error
+        assert "Not a Python file" in check_file("notes.txt").error
+
+    @pytest.mark.parametrize("backend", ["serial", "thread"])
+    def test_order(self, backend):
+        """Test that results keep the input order."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for index in range(10):
+                paths.append(Path(temp_dir, f"f{index}.py"))
+                paths[-1].write_text("x = 1  # Comment\n" if index % 2 else "x = 1\n")
+
+            results = check_files(paths, jobs=2, backend=backend)
+
+            assert [result.file_path for result in results] == [str(path) for path in paths]
+            assert [result.has_comments for result in results] == [bool(index % 2) for index in range(10)]
+
+
+class TestCheckCli:
+    """Test cases for --check on the command line."""
+
+    def test_check_writes_nothing(self):
+        """Test that --check lists the offending files and fails."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            Path(temp_dir, "dirty.py").write_text("x = 1  # Comment\n")
+            Path(temp_dir, "clean.py").write_text("y = 2\n")
+
+            with patch("builtins.print") as mock_print:
+                exit_code = main(["--check", temp_dir])
+
+            assert exit_code == 1
+            printed = [call[0][0] for call in mock_print.call_args_list]
+            assert printed == [str(Path(temp_dir, "dirty.py")), "1 of 2 files have comments."]
+            assert sorted(path.name for path in Path(temp_dir).iterdir()) == ["clean.py", "dirty.py"]
+
+    def test_clean_tree_passes(self):
+        """Test that --dry-run succeeds when no file has comments."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            Path(temp_dir, "clean.py").write_text("y = 2\n")
+            with patch("builtins.print"):
+                assert main(["--dry-run", temp_dir]) == 0
+
+    def test_stats(self):
+        """Test the --stats summary."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            Path(temp_dir, "dirty.py").write_text("x = 1  # One\n# Two\n")
+
+            with patch("builtins.print") as mock_print:
+                main(["--check", "--stats", temp_dir])
+
+            mock_print.assert_called_with("Cleaning would remove 2 comments, 10 of 19 bytes (52.6%).")
+
+    def test_invalid_combinations(self):
+        """Test that --check refuses options that write files."""
+        assert main(["file.py", "--stats"]) == 2
+        assert main(["file.py", "--check", "--in-place"]) == 2
+        assert main(["file.py", "--check", "--output-dir", "out"]) == 2
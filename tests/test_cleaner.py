@@ -0,0 +1,69 @@
+"""
+Tests for the reusable Cleaner of pycommentcleaner.
+"""
+
+import pytest
+
+from pycommentcleaner import Cleaner, CleanResult, hooks
+from pycommentcleaner.core import clean_code
+
+
+class TestCleaner:
+    """Test cases for the Cleaner class."""
+
+    @pytest.mark.parametrize("engine", ["splice", "untokenize", "scan"])
+    def test_matches_clean_code(self, engine):
+        """Test that the output is the same as clean_code."""
+        code = 'x = 1  # Comment\n# Another\ns = "# not a comment"\n'
+        result = Cleaner(engine).clean(code)
+
+        assert result.output == clean_code(code, engine=engine)
+        assert result.comments == 2
+
+    def test_byte_delta(self):
+        """Test that byte_delta counts the removed comment bytes in UTF-8."""
+        result = Cleaner().clean("x = 1  # café\n")
+
+        assert result == CleanResult("x = 1  \n", 1, len("# café".encode("utf-8")))
+
+    def test_clean_many_reuses_state(self):
+        """Test that results do not leak between calls."""
+        results = list(Cleaner().clean_many(["# a\n# b\n", "x = 1\n", "y = 2  # c\n"]))
+
+        assert [result.comments for result in results] == [2, 0, 1]
+        assert results[1].output == "x = 1\n"
+
+    def test_invalid_code_is_unchanged(self):
+        """Test that code that cannot be tokenized is returned as is."""
+        code = 'x = "unclosed\n'
+        assert Cleaner().clean(code) == CleanResult(code, 0, 0)
+
+    def test_unknown_engine(self):
+        """Test that an unknown engine is rejected up front."""
+        with pytest.raises(ValueError):
+            Cleaner("fast")
+
+    def test_clean_bytes_keeps_encoding(self):
+        """Test that the source encoding is detected and kept."""
+        data = "# -*- coding: latin-1 -*-\nx = 'é'  # Comment\n".encode("latin-1")
+        result = Cleaner().clean_bytes(data)
+
+        assert result.output == "# -*- coding: latin-1 -*-\nx = 'é'  \n".encode("latin-1")
+        assert result.comments == 1
+        assert result.byte_delta == len(data) - len(result.output)
+
+    def test_clean_bytes_keeps_bom(self):
+        """Test that a UTF-8 BOM survives cleaning."""
+        result = Cleaner().clean_bytes(b"\xef\xbb\xbfx = 1  # Comment\n")
+        assert result.output == b"\xef\xbb\xbfx = 1  \n"
+
+    def test_observers_see_comments(self):
+        """Test that registered observers are still notified."""
+        totals = hooks.register(hooks.Totals())
+        try:
+            result = Cleaner().clean("x = 1  # Comment\n")
+        finally:
+            hooks.unregister(totals)
+
+        assert result.comments == 1
+        assert totals.comments == 1
@@ -2,6 +2,7 @@
 Tests for the command-line interface of pycommentcleaner.
 """
 
+import io
 import os
 import tempfile
 from pathlib import Path
@@ -44,11 +45,21 @@ class TestParseArgs:
         args = parse_args(["file.py", "-vvv"])
         assert args.verbose == 3
 
+    def test_jobs(self):
+        """Test parsing the jobs and backend arguments."""
+        args = parse_args(["file.py"])
+        assert args.jobs == 1
+        assert args.backend == "process"
+        
+        args = parse_args(["file.py", "-j", "4", "--backend", "thread"])
+        assert args.jobs == 4
+        assert args.backend == "thread"
+
 
 class TestMain:
     """Test cases for the main function."""
 
-    @patch("pycommentcleaner.cli.clean_file")
+    @patch("pycommentcleaner.core.clean_file")
     def test_single_file(self, mock_clean_file):
         """Test processing a single file."""
         # Mock clean_file to return success
@@ -65,7 +76,7 @@ class TestMain:
         # Check that the exit code is correct
         assert exit_code == 0
 
-    @patch("pycommentcleaner.cli.clean_file")
+    @patch("pycommentcleaner.core.clean_file")
     def test_single_file_failure(self, mock_clean_file):
         """Test processing a single file that fails."""
         # Mock clean_file to return failure
@@ -80,7 +91,7 @@ class TestMain:
         # Check that the exit code is correct
         assert exit_code == 1
 
-    @patch("pycommentcleaner.cli.clean_files")
+    @patch("pycommentcleaner.core.clean_files")
     def test_multiple_files(self, mock_clean_files):
         """Test processing multiple files."""
         # Mock clean_files to return success for all files
@@ -98,7 +109,7 @@ class TestMain:
         # Check that the exit code is correct
         assert exit_code == 0
 
-    @patch("pycommentcleaner.cli.clean_files")
+    @patch("pycommentcleaner.core.clean_files")
     def test_multiple_files_partial_failure(self, mock_clean_files):
         """Test processing multiple files with partial failure."""
         # Mock clean_files to return mixed success/failure
@@ -116,7 +127,7 @@ class TestMain:
         # Check that the exit code is correct
         assert exit_code == 1
 
-    @patch("pycommentcleaner.cli.clean_files")
+    @patch("pycommentcleaner.core.clean_files")
     def test_output_dir(self, mock_clean_files):
         """Test processing with output directory."""
         # Mock clean_files to return success
@@ -133,4 +144,151 @@ class TestMain:
         assert kwargs["output_dir"] == "output"
         
         # Check that the exit code is correct
-        assert exit_code == 0
\ No newline at end of file
+        assert exit_code == 0
+
+    @patch("pycommentcleaner.core.clean_files")
+    def test_jobs(self, mock_clean_files):
+        """Test that the jobs and backend options reach clean_files."""
+        mock_clean_files.return_value = [
+            ("file1.py", True, "Success message 1"),
+            ("file2.py", True, "Success message 2"),
+        ]
+        
+        exit_code = main(["file1.py", "file2.py", "--jobs", "0", "--backend", "thread"])
+        
+        _, kwargs = mock_clean_files.call_args
+        assert kwargs["jobs"] == 0
+        assert kwargs["backend"] == "thread"
+        assert exit_code == 0
+
+    @patch("pycommentcleaner.core.clean_files")
+    def test_directory(self, mock_clean_files):
+        """Test that a single directory is expanded into its Python files."""
+        mock_clean_files.side_effect = lambda file_paths, **kwargs: [
+            (path.name, True, "Success message") for path in file_paths
+        ]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("a.py", "b.py", "notes.txt"):
+                Path(temp_dir, name).write_text("x = 1\n")
+            
+            with patch("builtins.print") as mock_print:
+                exit_code = main([temp_dir, "--exclude", "b.py"])
+        
+        mock_clean_files.assert_called_once()
+        mock_print.assert_called_with("Successfully processed 1 of 1 files.")
+        assert exit_code == 0
+
+    @patch("pycommentcleaner.core.clean_file")
+    def test_in_place(self, mock_clean_file):
+        """Test that --in-place reaches clean_file and rejects --output-dir."""
+        mock_clean_file.return_value = (True, "Success message")
+        
+        assert main(["file.py", "--in-place", "--fsync"]) == 0
+        _, kwargs = mock_clean_file.call_args
+        assert kwargs["in_place"] is True
+        assert kwargs["fsync"] is True
+        
+        assert main(["file.py", "--in-place", "--output-dir", "out"]) == 2
+
+    @patch("pycommentcleaner.core.clean_files")
+    def test_link_mode(self, mock_clean_files):
+        """Test that --link-mode reaches clean_files and is refused where no file is copied."""
+        mock_clean_files.return_value = [("a.py", True, "Success message")]
+        
+        assert main(["a.py", "b.py", "--link-mode", "hardlink"]) == 0
+        _, kwargs = mock_clean_files.call_args
+        assert kwargs["link_mode"] == "hardlink"
+        
+        assert main(["a.py", "--link-mode", "reflink", "--check"]) == 2
+        assert main(["-", "--link-mode", "hardlink"]) == 2
+
+    @patch("pycommentcleaner.core.clean_files")
+    def test_strip_outputs(self, mock_clean_files):
+        """Test that --strip-outputs reaches clean_files and notebooks are found in directories."""
+        mock_clean_files.return_value = [("a.ipynb", True, "Success message")]
+        
+        assert main(["a.ipynb", "b.ipynb", "--strip-outputs"]) == 0
+        _, kwargs = mock_clean_files.call_args
+        assert kwargs["strip_outputs"] is True
+        
+        assert main(["a.ipynb", "--strip-outputs", "--check"]) == 2
+        assert main(["-", "--strip-outputs"]) == 2
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("a.py", "b.ipynb"):
+                Path(temp_dir, name).write_text("{}")
+            
+            main([temp_dir])
+            args, _ = mock_clean_files.call_args
+            assert sorted(Path(path).name for path in args[0]) == ["a.py", "b.ipynb"]
+            
+            main([temp_dir, "--minify"])
+            args, _ = mock_clean_files.call_args
+            assert [Path(path).name for path in args[0]] == ["a.py"]
+
+    def test_async(self):
+        """Test that --async cleans files through aclean_files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("a.py", "b.py"):
+                Path(temp_dir, name).write_text("x = 1  # Comment\n")
+            
+            with patch("builtins.print") as mock_print:
+                exit_code = main([temp_dir, "--async", "--concurrency", "1"])
+            
+            mock_print.assert_called_with("Successfully processed 2 of 2 files.")
+            assert exit_code == 0
+            assert Path(temp_dir, "a_cleaned.py").read_text() == "x = 1  \n"
+        
+        assert main(["file.py", "--async", "--stream"]) == 2
+        assert main(["file.py", "--async", "--concurrency", "0"]) == 2
+
+    def test_stdin_to_stdout(self):
+        """Test that '-' cleans standard input to standard output."""
+        stdin = io.TextIOWrapper(io.BytesIO(b"x = 1  # Comment\r\n"))
+        stdout = io.TextIOWrapper(io.BytesIO())
+        with patch("sys.stdin", stdin), patch("sys.stdout", stdout):
+            exit_code = main(["-"])
+            stdout.flush()
+            assert stdout.buffer.getvalue() == b"x = 1  \r\n"
+        assert exit_code == 0
+        
+        assert main(["-", "file.py"]) == 2
+        assert main(["-", "--in-place"]) == 2
+
+    def test_files_from(self, monkeypatch):
+        """Test that listed paths are filtered below the current directory and cleaned."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            monkeypatch.chdir(temp_dir)
+            Path(temp_dir, "a.py").write_text("x = 1  # Comment\n")
+            Path(temp_dir, "notes.txt").write_text("# Not Python\n")
+            Path(temp_dir, "build").mkdir()
+            Path(temp_dir, "build", "b.py").write_text("y = 2  # Comment\n")
+            listed = [os.path.join(temp_dir, name) for name in ("a.py", "notes.txt", "build/b.py")]
+            
+            stdin = io.TextIOWrapper(io.BytesIO("\0".join(listed).encode("utf-8")))
+            with patch("sys.stdin", stdin), patch("builtins.print") as mock_print:
+                exit_code = main(["-0", "--files-from", "-"])
+            
+            mock_print.assert_called_with("Successfully processed 1 of 1 files.")
+            assert exit_code == 0
+            assert Path(temp_dir, "a_cleaned.py").read_text() == "x = 1  \n"
+            assert not Path(temp_dir, "build", "b_cleaned.py").exists()
+        
+        assert main(["file.py", "-0"]) == 2
+        assert main(["--files-from", "missing.txt"]) == 1
+
+    def test_files_from_ignores_ancestors(self, monkeypatch):
+        """Test that the directories above the current directory are not matched by --exclude."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project = Path(temp_dir, "build", "proj")
+            project.mkdir(parents=True)
+            Path(project, "a.py").write_text("x = 1  # Comment\n")
+            monkeypatch.chdir(project)
+            
+            for listed in (str(project / "a.py"), "a.py"):
+                stdin = io.TextIOWrapper(io.BytesIO((listed + "\0").encode("utf-8")))
+                with patch("sys.stdin", stdin), patch("builtins.print") as mock_print:
+                    assert main(["-0", "--files-from", "-"]) == 0
+                mock_print.assert_called_with("Successfully processed 1 of 1 files.")
+            assert Path(project, "a_cleaned.py").read_text() == "x = 1  \n"
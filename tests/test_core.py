@@ -2,13 +2,24 @@
 Tests for the core functionality of pycommentcleaner.
 """
 
+import io
 import os
 import tempfile
+import tokenize
 from pathlib import Path
 
 import pytest
 
-from pycommentcleaner.core import clean_code, clean_file
+from pycommentcleaner.core import (
+    _make_chunks,
+    clean_byte_stream,
+    clean_bytes,
+    clean_code,
+    clean_file,
+    clean_files,
+    clean_stream,
+    cleaned_path,
+)
 
 
 class TestCleanCode:
@@ -23,7 +34,7 @@ class TestCleanCode:
     def test_standalone_comment_removal(self):
         """Test removing standalone comments."""
         code = "# This is a standalone comment\nx = 1"
-        expected = " \nx = 1"
+        expected = "\nx = 1"
         assert clean_code(code) == expected
 
     def test_multiline_comment_removal(self):
@@ -59,7 +70,7 @@ class TestCleanCode:
     def test_code_with_only_comments(self):
         """Test handling code with only comments."""
         code = "# Comment 1\n# Comment 2\n# Comment 3"
-        expected = " \n \n "
+        expected = "\n\n"
         assert clean_code(code) == expected
 
     def test_code_with_escaped_quotes(self):
@@ -75,6 +86,192 @@ class TestCleanCode:
         # Should return the original code
         assert clean_code(code) == code
 
+    def test_crlf_line_endings(self):
+        """Test that comments are removed without touching CRLF line endings."""
+        code = "x = 1  # Comment\r\ny = 2\r\n"
+        expected = "x = 1  \r\ny = 2\r\n"
+        assert clean_code(code) == expected
+
+    @pytest.mark.parametrize("engine", ["splice", "untokenize", "scan"])
+    def test_combining_mark_identifier(self, engine):
+        """Test that an identifier with a combining mark, an error token before Python 3.12, is cleaned."""
+        code = "x\u0301 = 1  # Comment\nprint(x\u0301)  # Another\n"
+        cleaned = clean_code(code, engine=engine)
+        assert "#" not in cleaned
+        assert "x\u0301 = 1" in cleaned
+        if engine != "untokenize":
+            assert cleaned == "x\u0301 = 1  \nprint(x\u0301)  \n"
+
+    def test_cr_line_endings(self):
+        """Test that comments are removed from code with old Mac line endings."""
+        code = "x = 1  # a\ry = 2  # b\r"
+        assert clean_code(code) == "x = 1  \ry = 2  \r"
+        assert clean_code(code, engine="scan") == "x = 1  \ry = 2  \r"
+
+    def test_unknown_engine(self):
+        """Test that an unknown engine is rejected."""
+        with pytest.raises(ValueError):
+            clean_code("x = 1", engine="nope")
+
+
+class TestEngines:
+    """Test cases comparing the splice and untokenize engines."""
+
+    SAMPLE = (
+        "# Header comment\n"
+        "import os  # inline\n"
+        "\n"
+        "def f(a,  # argument\n"
+        "      b):\n"
+        "    \"\"\"Docstring # kept\"\"\"\n"
+        "    x = {'k': '#'}  # dict\n"
+        "    return a + \\\n"
+        "        b  # continued\n"
+    )
+
+    @staticmethod
+    def _significant_tokens(code):
+        """Return the (type, string) pairs that define the code's meaning."""
+        ignored = {tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT}
+        return [
+            (tok.type, tok.string)
+            for tok in tokenize.generate_tokens(io.StringIO(code).readline)
+            if tok.type not in ignored
+        ]
+
+    def test_splice_is_input_minus_comments(self):
+        """Test that the splice engine only removes the comment text."""
+        cleaned = clean_code(self.SAMPLE, engine="splice")
+        assert "#" not in cleaned.replace("'#'", "").replace("# kept", "")
+        assert cleaned.splitlines()[3] == "def f(a,  "
+        assert cleaned.splitlines()[5] == '    """Docstring # kept"""'
+
+    def test_engines_match(self):
+        """Test that both engines produce the same token stream."""
+        spliced = clean_code(self.SAMPLE, engine="splice")
+        rebuilt = clean_code(self.SAMPLE, engine="untokenize")
+        assert self._significant_tokens(spliced) == self._significant_tokens(rebuilt)
+
+
+class TestCleanBytes:
+    """Test cases for the clean_bytes function."""
+
+    @pytest.mark.parametrize("engine", ["splice", "untokenize", "scan"])
+    def test_matches_clean_code(self, engine):
+        """Test that UTF-8 source gives the same result as clean_code."""
+        code = 'x = "é"  # ünïcode\n# Another\ns = "# not a comment"  # 注释\n'
+        assert clean_bytes(code.encode("utf-8"), engine=engine) == clean_code(code, engine=engine).encode("utf-8")
+
+    @pytest.mark.parametrize("engine", ["splice", "untokenize", "scan"])
+    def test_coding_cookie(self, engine):
+        """Test that a PEP 263 coding cookie is honoured and kept."""
+        data = "# -*- coding: latin-1 -*-\nx = 'é'  # café\n".encode("latin-1")
+        cleaned = clean_bytes(data, engine=engine)
+        assert cleaned.startswith(b"# -*- coding: latin-1 -*-\n")
+        assert "café".encode("latin-1") not in cleaned
+        compile(cleaned, "<cleaned>", "exec")
+        if engine != "untokenize":
+            assert cleaned == "# -*- coding: latin-1 -*-\nx = 'é'  \n".encode("latin-1")
+
+    def test_utf8_coding_cookie_removed(self):
+        """Test that a UTF-8 coding cookie, which changes nothing, is removed like any comment."""
+        assert clean_bytes(b"# -*- coding: utf-8 -*-\nx = 1  # Comment\n") == b"\nx = 1  \n"
+
+    @pytest.mark.parametrize("engine", ["splice", "untokenize", "scan"])
+    def test_bom_is_kept(self, engine):
+        """Test that a UTF-8 BOM survives cleaning."""
+        cleaned = clean_bytes(b"\xef\xbb\xbfx = 1  # Comment\n", engine=engine)
+        assert cleaned.startswith(b"\xef\xbb\xbfx = 1")
+        assert b"#" not in cleaned
+
+    def test_line_endings_are_kept(self):
+        """Test that CRLF line endings are left alone."""
+        assert clean_bytes(b"x = 1  # a\r\ny = 2\r\n") == b"x = 1  \r\ny = 2\r\n"
+
+    @pytest.mark.parametrize("engine", ["splice", "untokenize", "scan"])
+    def test_error_tokens_kept_as_code(self, engine):
+        """Test that error tokens other than an unterminated string do not stop cleaning."""
+        for data in ("x\u0301 = 1  # Comment\n".encode("utf-8"), b"x = 1  # a\ry = 2  # b\r"):
+            assert b"#" not in clean_bytes(data, engine=engine)
+
+    def test_invalid_source_is_unchanged(self):
+        """Test that undecodable or untokenizable source is returned as is."""
+        for data in (b"x = '\xff'  # Comment\n", b'x = "unclosed\n'):
+            assert clean_bytes(data) == data
+
+
+class TestCleanStream:
+    """Test cases for the clean_stream function."""
+
+    @pytest.mark.parametrize("code", [
+        "x = 1  # Comment\n# Standalone\ny = 2",
+        "def f(a,  # first\n      b):  # sig\n    return a + \\\n        b  # sum\n",
+        '''s = """\n# not a comment\n"""  # comment\n''',
+        "if x:\n    y = 1  # inner\n# dedent comment\nz = 2\n",
+        "x\u0301 = 1  # combining mark\n",
+        "",
+    ])
+    def test_matches_clean_code(self, code):
+        """Test that streaming gives the same result as clean_code."""
+        output = io.StringIO()
+        clean_stream(io.StringIO(code), output)
+        assert output.getvalue() == clean_code(code)
+
+    def test_returns_comment_count(self):
+        """Test that the number of removed comments is returned."""
+        output = io.StringIO()
+        assert clean_stream(io.StringIO("# a\nx = 1  # b\n'# c'\n"), output) == 2
+
+    def test_writes_lines_as_they_complete(self):
+        """Test that output is written before the rest of the input is read."""
+        lines = ['s = """a\n', '# b\n', '"""  # c\n', "z = 4  # d\n", "w = 5\n"]
+        output = io.StringIO()
+        written_before_read = []
+
+        class Reader:
+            def readline(self):
+                written_before_read.append(output.getvalue())
+                return lines.pop(0) if lines else ""
+
+        clean_stream(Reader(), output)
+
+        # Nothing is written while the string is open, then the whole statement
+        assert written_before_read[1:3] == ["", ""]
+        assert written_before_read[3] == 's = """a\n# b\n"""  \n'
+        assert written_before_read[4] == 's = """a\n# b\n"""  \nz = 4  \n'
+        assert output.getvalue() == 's = """a\n# b\n"""  \nz = 4  \nw = 5\n'
+
+    def test_error_copies_the_rest_unchanged(self):
+        """Test that input after a tokenizer error is passed through."""
+        code = "x = 1  # ok\ny = \"unclosed  # kept\nz = 2  # kept\n"
+        output = io.StringIO()
+        clean_stream(io.StringIO(code), output)
+        assert output.getvalue() == "x = 1  \ny = \"unclosed  # kept\nz = 2  # kept\n"
+
+
+class TestCleanByteStream:
+    """Test cases for the clean_byte_stream function."""
+
+    @pytest.mark.parametrize("data", [
+        b"x = 1  # Comment\r\ny = 2\r\n",
+        "\ufeffs = '\u00e9'  # Comment\n".encode("utf-8"),
+        "# -*- coding: latin-1 -*-\ns = '\u00e9'  # Comment\n".encode("latin-1"),
+        "x\u0301 = 1  # Comment\n".encode("utf-8"),
+        b"",
+    ])
+    def test_matches_clean_bytes(self, data):
+        """Test that streaming bytes gives the same result as clean_bytes."""
+        output = io.BytesIO()
+        clean_byte_stream(io.BytesIO(data), output)
+        assert output.getvalue() == clean_bytes(data)
+
+    def test_bad_coding_cookie_is_copied(self):
+        """Test that input with an unknown encoding is passed through."""
+        data = b"# -*- coding: nonexistent -*-\nx = 1  # Comment\n"
+        output = io.BytesIO()
+        assert clean_byte_stream(io.BytesIO(data), output) == 0
+        assert output.getvalue() == data
+
 
 class TestCleanFile:
     """Test cases for the clean_file function."""
@@ -101,7 +298,19 @@ class TestCleanFile:
             with open(output_path, "r") as f:
                 content = f.read()
             
-            assert content == "x = 1  \n \ny = 2"
+            assert content == "x = 1  \n\ny = 2"
+
+    def test_coding_cookie_file(self):
+        """Test that a non-UTF-8 file is cleaned in its own encoding."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_bytes("# coding: cp1252\r\nname = '€'  # Euro\r\n".encode("cp1252"))
+            
+            success, _ = clean_file(file_path)
+            
+            assert success
+            cleaned = (Path(temp_dir) / "test_cleaned.py").read_bytes()
+            assert cleaned == "# coding: cp1252\r\nname = '€'  \r\n".encode("cp1252")
 
     def test_file_cleaning_with_custom_output(self):
         """Test cleaning a file with a custom output path."""
@@ -129,6 +338,146 @@ class TestCleanFile:
             
             assert content == "x = 1  "
 
+    def test_file_cleaning_streamed(self):
+        """Test cleaning a file line by line."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = 1  # Comment\n# Another comment\ny = 2\n")
+            
+            success, _ = clean_file(file_path, stream=True)
+            
+            assert success
+            assert (Path(temp_dir) / "test_cleaned.py").read_text() == "x = 1  \n\ny = 2\n"
+
+    def test_in_place(self):
+        """Test cleaning a file in place, keeping its permissions and mtime."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = 1  # Comment\n")
+            os.chmod(file_path, 0o754)
+            os.utime(file_path, ns=(1_000_000_000, 2_000_000_000))
+            
+            success, message = clean_file(file_path, in_place=True, fsync=True)
+            
+            assert success and message.startswith("Successfully")
+            assert file_path.read_text() == "x = 1  \n"
+            assert file_path.stat().st_mode & 0o777 == 0o754
+            assert file_path.stat().st_mtime_ns == 2_000_000_000
+            assert os.listdir(temp_dir) == ["test.py"]
+
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_in_place_without_comments_writes_nothing(self, stream):
+        """Test that a file without comments is left untouched."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = '# not a comment'\n")
+            before = file_path.stat()
+            
+            success, message = clean_file(file_path, in_place=True, stream=stream)
+            
+            after = file_path.stat()
+            assert success and message.startswith("Unchanged")
+            assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+            assert os.listdir(temp_dir) == ["test.py"]
+
+    def test_in_place_streamed(self):
+        """Test cleaning a file in place line by line."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = 1  # Comment\ny = 2\n")
+            
+            success, _ = clean_file(file_path, in_place=True, stream=True)
+            
+            assert success
+            assert file_path.read_text() == "x = 1  \ny = 2\n"
+            assert os.listdir(temp_dir) == ["test.py"]
+
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_in_place_symlink(self, stream):
+        """Test that cleaning a symbolic link in place cleans its target and keeps the link."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target = Path(temp_dir) / "real.py"
+            target.write_text("x = 1  # Comment\n")
+            link = Path(temp_dir) / "link.py"
+            link.symlink_to(target)
+            
+            success, message = clean_file(link, in_place=True, stream=stream)
+            
+            assert success, message
+            assert link.is_symlink()
+            assert target.read_text() == "x = 1  \n"
+            assert sorted(os.listdir(temp_dir)) == ["link.py", "real.py"]
+
+    @pytest.mark.parametrize("in_place", [False, True])
+    def test_streamed_keeps_crlf(self, in_place):
+        """Test that streaming a file keeps its CRLF line endings."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_bytes(b"x = 1  # Comment\r\n# Only a comment\r\ny = 2\r\n")
+            output_path = None if in_place else Path(temp_dir) / "out.py"
+            
+            success, message = clean_file(file_path, output_path, in_place=in_place, stream=True)
+            
+            assert success, message
+            assert (output_path or file_path).read_bytes() == b"x = 1  \r\n\r\ny = 2\r\n"
+
+    @pytest.mark.parametrize("stream", [False, True])
+    def test_combining_mark_identifier(self, stream):
+        """Test that a file using a combining mark in a name is cleaned, not copied."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x\u0301 = 1  # Comment\n", encoding="utf-8")
+            
+            success, message = clean_file(file_path, in_place=True, stream=stream)
+            
+            assert success, message
+            assert file_path.read_text(encoding="utf-8") == "x\u0301 = 1  \n"
+
+    def test_in_place_with_output_path(self):
+        """Test that in_place and an output path cannot be combined."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = 1  # Comment\n")
+            
+            success, _ = clean_file(file_path, Path(temp_dir) / "out.py", in_place=True)
+            
+            assert not success
+            assert file_path.read_text() == "x = 1  # Comment\n"
+
+    @pytest.mark.parametrize("link_mode", ["copy", "reflink", "hardlink"])
+    @pytest.mark.parametrize("mmap_threshold", [1, 1024 * 1024])
+    def test_without_hash_is_not_tokenized(self, monkeypatch, link_mode, mmap_threshold):
+        """Test that a file without a '#' byte is copied as it is."""
+        monkeypatch.setattr("pycommentcleaner.core.MMAP_THRESHOLD", mmap_threshold)
+        monkeypatch.setattr("pycommentcleaner.core.clean_bytes", None)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_bytes(b"x = 1\r\ny = 'caf\xc3\xa9'\r\n")
+            output_path = Path(temp_dir) / "out.py"
+
+            success, message = clean_file(file_path, output_path, link_mode=link_mode)
+
+            assert success, message
+            assert output_path.read_bytes() == file_path.read_bytes()
+            assert output_path.samefile(file_path) == (link_mode == "hardlink")
+
+    def test_hardlinked_output_is_not_written_through(self):
+        """Test that writing an output hard-linked to its input leaves the input alone."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = 1\n")
+            output_path = Path(temp_dir) / "out.py"
+            clean_file(file_path, output_path, link_mode="hardlink")
+
+            # Edited in place, so the output sees the edit too
+            with open(file_path, "a") as file:
+                file.write("y = 2  # Comment\n")
+            success, _ = clean_file(file_path, output_path)
+
+            assert success
+            assert file_path.read_text() == "x = 1\ny = 2  # Comment\n"
+            assert output_path.read_text() == "x = 1\ny = 2  \n"
+
     def test_nonexistent_file(self):
         """Test handling a nonexistent file."""
         file_path = Path("nonexistent_file.py")
@@ -151,4 +500,104 @@ class TestCleanFile:
             success, _ = clean_file(file_path)
             
             # Check that the operation failed
-            assert not success
\ No newline at end of file
+            assert not success
+
+
+class TestCleanFiles:
+    """Test cases for the clean_files function."""
+
+    @staticmethod
+    def _write_files(temp_dir, count):
+        """Create Python files of increasing size and return their paths."""
+        paths = []
+        for i in range(count):
+            file_path = Path(temp_dir) / f"module_{i}.py"
+            with open(file_path, "w") as f:
+                f.write(f"x = {i}  # Comment\n" * (i + 1))
+            paths.append(file_path)
+        return paths
+
+    def test_serial(self):
+        """Test cleaning files one at a time."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = self._write_files(temp_dir, 3)
+            
+            results = clean_files(paths)
+            
+            assert [result[0] for result in results] == [str(path) for path in paths]
+            assert all(success for _, success, _ in results)
+            with open(Path(temp_dir) / "module_2_cleaned.py", "r") as f:
+                assert f.read() == "x = 2  \n" * 3
+
+    @pytest.mark.parametrize("backend", ["thread", "process"])
+    def test_parallel_keeps_input_order(self, backend):
+        """Test that parallel backends return results in input order."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = self._write_files(temp_dir, 10)
+            paths.append(Path(temp_dir) / "missing.py")
+            output_dir = Path(temp_dir) / "out"
+            
+            results = clean_files(paths, output_dir=output_dir, jobs=3, backend=backend)
+            
+            assert [result[0] for result in results] == [str(path) for path in paths]
+            assert [success for _, success, _ in results] == [True] * 10 + [False]
+            assert (output_dir / "module_9_cleaned.py").exists()
+
+    @pytest.mark.parametrize("jobs, backend", [(None, "process"), (2, "thread")])
+    def test_same_output_refused(self, jobs, backend):
+        """Test that a file whose output would overwrite another file's output fails."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = [Path(temp_dir) / "a" / "__init__.py", Path(temp_dir) / "b" / "__init__.py"]
+            for index, path in enumerate(paths):
+                path.parent.mkdir()
+                path.write_text(f"x = {index}  # Comment\n")
+            output_dir = Path(temp_dir) / "out"
+            
+            results = clean_files(paths, output_dir=output_dir, jobs=jobs, backend=backend)
+            
+            assert [success for _, success, _ in results] == [True, False]
+            assert "is the output of" in results[1][2]
+            assert (output_dir / "__init___cleaned.py").read_text() == "x = 0  \n"
+
+    def test_cleaned_path(self):
+        """Test that outputs keep their directory below the outermost root."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir) / "src"
+            file_path = root / "pkg" / "mod.py"
+            output_dir = Path(temp_dir) / "out"
+            
+            assert cleaned_path(file_path) == root / "pkg" / "mod_cleaned.py"
+            assert cleaned_path(file_path, output_dir) == output_dir / "mod_cleaned.py"
+            assert cleaned_path(file_path, output_dir, [root / "pkg", root]) == output_dir / "pkg" / "mod_cleaned.py"
+            assert cleaned_path(file_path, output_dir, [root / "other"]) == output_dir / "mod_cleaned.py"
+
+    def test_in_place_with_output_dir(self):
+        """Test that in_place and output_dir cannot be combined."""
+        with pytest.raises(ValueError):
+            clean_files([], output_dir="out", in_place=True)
+
+    def test_invalid_backend(self):
+        """Test that an unknown backend is rejected."""
+        with pytest.raises(ValueError):
+            clean_files([], jobs=2, backend="nope")
+
+
+class TestMakeChunks:
+    """Test cases for the size-balanced chunking helper."""
+
+    def test_chunks_are_balanced_and_heaviest_first(self):
+        """Test that files are spread so chunk totals stay close."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sizes = [800, 100, 400, 300, 200, 700]
+            tasks = []
+            for index, size in enumerate(sizes):
+                file_path = Path(temp_dir) / f"f{index}.py"
+                file_path.write_text("x" * size)
+                tasks.append((index, file_path, None))
+            
+            chunks = _make_chunks(tasks, 3)
+            
+            totals = [sum(sizes[index] for index, _, _ in chunk) for chunk in chunks]
+            assert sorted(index for chunk in chunks for index, _, _ in chunk) == list(range(6))
+            assert totals == sorted(totals, reverse=True)
+            assert max(totals) - min(totals) <= 200
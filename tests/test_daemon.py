@@ -0,0 +1,194 @@
+"""
+Tests for the daemon mode of pycommentcleaner.
+"""
+
+import os
+import socket
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pycommentcleaner import __version__
+from pycommentcleaner.cli import main
+from pycommentcleaner.daemon import CleanerServer, Client, default_socket_path
+
+
+@pytest.fixture
+def server():
+    """Run a daemon in a background thread."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server = CleanerServer(Path(temp_dir) / "d.sock", idle_timeout=None)
+        thread = threading.Thread(target=server.serve)
+        thread.start()
+        try:
+            yield server
+        finally:
+            if thread.is_alive():
+                with Client(server.socket_path) as client:
+                    client.shutdown()
+            thread.join(5)
+
+
+def _as_version(server, version):
+    """Make a daemon report another version."""
+    dispatch = server.dispatch
+
+    def dispatch_as(line):
+        response = dispatch(line)
+        if "version" in response:
+            response["version"] = version
+        return response
+
+    return patch.object(server, "dispatch", dispatch_as)
+
+
+class TestSocketPath:
+    """Test cases for the default socket path."""
+
+    def test_runtime_dir(self, monkeypatch):
+        """Test that $XDG_RUNTIME_DIR is used when set."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            monkeypatch.setenv("XDG_RUNTIME_DIR", temp_dir)
+
+            assert default_socket_path() == os.path.join(temp_dir, "pycommentcleaner.sock")
+
+    def test_private_directory(self, monkeypatch):
+        """Test that the socket is put in a directory only its owner can use."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+            monkeypatch.setattr(tempfile, "gettempdir", lambda: temp_dir)
+
+            socket_path = default_socket_path()
+
+            directory = Path(temp_dir, f"pycommentcleaner-{os.getuid()}")
+            assert Path(socket_path).parent == directory
+            assert directory.stat().st_mode & 0o777 == 0o700
+            assert default_socket_path() == socket_path
+
+    def test_unsafe_directory(self, monkeypatch):
+        """Test that a directory others can use or own is refused."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+            monkeypatch.setattr(tempfile, "gettempdir", lambda: temp_dir)
+            directory = Path(temp_dir, f"pycommentcleaner-{os.getuid()}")
+            directory.mkdir(mode=0o755)
+            directory.chmod(0o755)
+
+            with pytest.raises(OSError):
+                default_socket_path()
+
+            directory.chmod(0o700)
+            with patch("os.getuid", return_value=os.getuid() + 1):
+                with pytest.raises(OSError):
+                    default_socket_path()
+
+
+class TestDaemon:
+    """Test cases for the daemon and its client."""
+
+    def test_clean_code(self, server):
+        """Test that source is cleaned and its output cached."""
+        with Client(server.socket_path) as client:
+            assert client.clean_code("x = 1  # Comment\n") == "x = 1  \n"
+            assert client.clean_code("x = 1  # Comment\n") == "x = 1  \n"
+            assert client.request("ping")["pid"] == os.getpid()
+
+        assert len(server.cache) == 1
+
+    def test_clean_files(self, server):
+        """Test that files are cleaned, then skipped while unchanged."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("# Comment\nx = 1\n")
+            stat = file_path.stat()
+            os.utime(file_path, ns=(stat.st_atime_ns - 60 * 10**9, stat.st_mtime_ns - 60 * 10**9))
+
+            with Client(server.socket_path) as client:
+                [(path, success, message)] = client.clean_files([file_path])
+                [(_, _, second)] = client.clean_files([file_path])
+
+            assert (path, success) == (str(file_path), True)
+            assert message.startswith("Successfully")
+            assert second.startswith("Up to date")
+            assert (Path(temp_dir) / "test_cleaned.py").read_text() == "\nx = 1\n"
+
+    def test_errors_are_reported(self, server):
+        """Test that bad requests get an error response."""
+        with Client(server.socket_path) as client:
+            with pytest.raises(RuntimeError):
+                client.request("explode")
+            with pytest.raises(RuntimeError):
+                client.request("clean_code")
+
+    def test_other_user_socket_is_refused(self, server):
+        """Test that the client does not connect to a socket of another user."""
+        with patch("os.getuid", return_value=os.getuid() + 1):
+            with pytest.raises(PermissionError):
+                Client(server.socket_path, start=True)
+
+    def test_other_version_is_refused(self, server):
+        """Test that client and daemon of different versions do not talk."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(server.socket_path)
+            connection.sendall(b'{"op": "clean_code", "code": "", "version": "0.0"}\n')
+            assert b'"ok": false' in connection.makefile("rb").readline()
+
+        with _as_version(server, "0.0"):
+            with pytest.raises(OSError, match="version 0.0"):
+                Client(server.socket_path)
+
+    def test_other_version_is_restarted(self, server):
+        """Test that a client that may start a daemon replaces one of another version."""
+        started = []
+
+        def start_daemon(socket_path, idle_timeout):
+            thread = threading.Thread(target=CleanerServer(socket_path, idle_timeout=None).serve)
+            thread.start()
+            started.append(thread)
+
+        with _as_version(server, "0.0"), patch("pycommentcleaner.daemon._start_daemon", start_daemon):
+            with Client(server.socket_path, start=True) as client:
+                assert client.request("ping")["version"] == __version__
+                client.shutdown()
+
+        started[0].join(5)
+        assert not started[0].is_alive()
+
+    def test_second_daemon_is_refused(self, server):
+        """Test that a live socket is not taken over."""
+        with pytest.raises(OSError):
+            CleanerServer(server.socket_path)
+
+    def test_stale_socket_is_replaced(self):
+        """Test that a socket left by a dead daemon is removed."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            socket_path = str(Path(temp_dir) / "d.sock")
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(socket_path)
+            stale.close()
+
+            CleanerServer(socket_path).server_close()
+
+    def test_idle_timeout(self):
+        """Test that an idle daemon stops and removes its socket."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            server = CleanerServer(Path(temp_dir) / "d.sock", idle_timeout=0.1)
+            server.serve()
+
+            assert not os.path.exists(server.socket_path)
+
+    def test_cli_client(self, server):
+        """Test that --client sends the files to the daemon."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = 1  # Comment\n")
+
+            with patch("builtins.print") as mock_print:
+                exit_code = main([str(file_path), "--client", "--socket", server.socket_path, "--in-place"])
+
+            assert exit_code == 0
+            mock_print.assert_called_with("Successfully processed 1 of 1 files.")
+            assert file_path.read_text() == "x = 1  \n"
@@ -0,0 +1,181 @@
+"""
+Tests for the file discovery of pycommentcleaner.
+"""
+
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from pycommentcleaner.cli import main
+from pycommentcleaner.core import clean_paths
+from pycommentcleaner.discovery import GitIgnore, iter_python_files, read_path_list
+
+
+def _touch(root, *relative_paths):
+    """Create empty files (and their parent directories) under root."""
+    for relative_path in relative_paths:
+        path = Path(root) / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x = 1  # Comment\n")
+
+
+def _found(root, **kwargs):
+    """Return the discovered files as sorted '/'-separated relative paths."""
+    return sorted(
+        path.relative_to(root).as_posix()
+        for path in iter_python_files([root], **kwargs)
+    )
+
+
+class TestGitIgnore:
+    """Test cases for the GitIgnore rules."""
+
+    def test_name_patterns_match_at_any_depth(self):
+        """Test that patterns without a slash match names anywhere."""
+        ignore = GitIgnore(".", ["*.gen.py", "tmp/"])
+        assert ignore.match("a/b/c.gen.py", False)
+        assert ignore.match("a/tmp", True)
+        assert ignore.match("a/tmp", False) is None
+        assert ignore.match("a/c.py", False) is None
+
+    def test_anchored_patterns(self):
+        """Test that patterns with a slash match from the .gitignore directory."""
+        ignore = GitIgnore(".", ["/top.py", "docs/*.py", "**/deep/x.py", "out/**"])
+        assert ignore.match("top.py", False)
+        assert ignore.match("sub/top.py", False) is None
+        assert ignore.match("docs/a.py", False)
+        assert ignore.match("docs/sub/a.py", False) is None
+        assert ignore.match("a/b/deep/x.py", False)
+        assert ignore.match("deep/x.py", False)
+        assert ignore.match("out/a/b.py", False)
+
+    def test_negation_and_comments(self):
+        """Test that later '!' rules re-include paths and comments are skipped."""
+        ignore = GitIgnore(".", ["# comment", "", "*.py", "!keep.py"])
+        assert ignore.match("drop.py", False)
+        assert ignore.match("keep.py", False) is False
+
+
+class TestIterPythonFiles:
+    """Test cases for the iter_python_files function."""
+
+    def test_default_excludes_are_pruned(self):
+        """Test that VCS, virtualenv and build directories are skipped."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            _touch(
+                temp_dir,
+                "a.py",
+                "pkg/b.py",
+                "pkg/notes.txt",
+                "pkg/b_cleaned.py",
+                ".git/hooks/c.py",
+                "venv/lib/d.py",
+                "build/lib/e.py",
+            )
+
+            assert _found(temp_dir) == ["a.py", "pkg/b.py"]
+
+    def test_include_and_exclude(self):
+        """Test custom include and exclude globs."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            _touch(temp_dir, "a.py", "b.pyi", "tests/test_a.py", "gen/c.py")
+
+            found = _found(temp_dir, include=("*.py", "*.pyi"), exclude=("tests", "gen/*.py"))
+
+            assert found == ["a.py", "b.pyi"]
+
+    def test_gitignore(self):
+        """Test that .gitignore files prune directories and skip files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            _touch(temp_dir, "a.py", "generated/b.py", "pkg/c.py", "pkg/skip.py", "pkg/keep.py")
+            Path(temp_dir, ".gitignore").write_text("generated/\nskip.py\n")
+            Path(temp_dir, "pkg", ".gitignore").write_text("*.py\n!keep.py\n")
+
+            assert _found(temp_dir) == ["a.py", "pkg/keep.py"]
+            assert len(_found(temp_dir, use_gitignore=False)) == 5
+
+    def test_parent_gitignore_in_repository(self):
+        """Test that .gitignore files above the walked directory apply."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.mkdir(Path(temp_dir, ".git"))
+            Path(temp_dir, ".gitignore").write_text("src/vendor/\n")
+            _touch(temp_dir, "src/a.py", "src/vendor/b.py")
+
+            assert _found(Path(temp_dir, "src")) == ["a.py"]
+
+    def test_explicit_files_are_not_filtered(self):
+        """Test that explicitly named files are yielded unchanged."""
+        paths = list(iter_python_files(["missing.py", "notes.txt"]))
+        assert paths == [Path("missing.py"), Path("notes.txt")]
+
+    def test_stable_order(self):
+        """Test that files are yielded in name order, directory by directory."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            _touch(temp_dir, "b.py", "a.py", "sub/z.py", "sub/y.py")
+
+            found = [
+                path.relative_to(temp_dir).as_posix()
+                for path in iter_python_files([temp_dir])
+            ]
+
+            assert found == ["a.py", "b.py", "sub/y.py", "sub/z.py"]
+
+
+class TestReadPathList:
+    """Test cases for reading path lists."""
+
+    def test_lines(self):
+        """Test newline-separated lists, with CRLF and blank lines."""
+        readable = io.BytesIO(b"a.py\r\nsub/b c.py\n\nlast.py")
+        assert list(read_path_list(readable)) == ["a.py", "sub/b c.py", "last.py"]
+
+    def test_null(self):
+        """Test NUL-separated lists, with paths split across reads."""
+        class Reader:
+            chunks = [b"a.py\0sub/b", b"\nc.py\0", b"\0last.py"]
+
+            def read1(self, size):
+                return self.chunks.pop(0) if self.chunks else b""
+
+        assert list(read_path_list(Reader(), null=True)) == ["a.py", "sub/b\nc.py", "last.py"]
+
+
+class TestCleanPaths:
+    """Test cases for the clean_paths function."""
+
+    def test_directory(self):
+        """Test cleaning every Python file under a directory."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            _touch(temp_dir, "a.py", "pkg/b.py")
+
+            results = clean_paths([temp_dir])
+
+            assert [success for _, success, _ in results] == [True, True]
+            assert Path(temp_dir, "pkg", "b_cleaned.py").read_text() == "x = 1  \n"
+
+    def test_output_dir_keeps_layout(self):
+        """Test that files with the same name in different directories do not overwrite each other."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "src"
+            _touch(source, "a/__init__.py", "b/__init__.py", "top.py")
+            output_dir = Path(temp_dir) / "out"
+
+            results = clean_paths([source], output_dir=output_dir)
+
+            assert [success for _, success, _ in results] == [True, True, True]
+            assert sorted(path.relative_to(output_dir).as_posix() for path in output_dir.rglob("*.py")) == [
+                "a/__init___cleaned.py", "b/__init___cleaned.py", "top_cleaned.py",
+            ]
+
+    def test_cli_output_dir_keeps_layout(self, capsys):
+        """Test that the command line keeps the layout of a directory walked into --output-dir."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "src"
+            _touch(source, "a/__init__.py", "b/__init__.py")
+            output_dir = Path(temp_dir) / "out"
+
+            for extra in ([], ["--async"]):
+                assert main([str(source), "-o", str(output_dir)] + extra) == 0
+                assert (output_dir / "a" / "__init___cleaned.py").read_text() == "x = 1  \n"
+                assert (output_dir / "b" / "__init___cleaned.py").read_text() == "x = 1  \n"
@@ -0,0 +1,158 @@
+"""
+Tests for the file helpers of pycommentcleaner.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from pycommentcleaner.fileio import AtomicFile, atomic_write, break_link, copy_file
+
+
+class TestAtomicFile:
+    """Test cases for the AtomicFile class."""
+
+    def test_replaces_destination(self):
+        """Test that the destination is replaced and no temporary file is left."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "out.py"
+            path.write_text("old")
+            
+            atomic_write(path, b"new", fsync=True)
+            
+            assert path.read_text() == "new"
+            assert os.listdir(temp_dir) == ["out.py"]
+
+    def test_exception_keeps_destination(self):
+        """Test that an error while writing leaves the destination untouched."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "out.py"
+            path.write_text("old")
+            
+            with pytest.raises(RuntimeError):
+                with AtomicFile(path) as atomic_file:
+                    atomic_file.file.write(b"partial")
+                    raise RuntimeError("failed")
+            
+            assert path.read_text() == "old"
+            assert os.listdir(temp_dir) == ["out.py"]
+
+    def test_discard_keeps_destination(self):
+        """Test that a discarded file does not replace the destination."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "out.py"
+            path.write_text("old")
+            
+            with AtomicFile(path, "w", encoding="utf-8") as atomic_file:
+                atomic_file.file.write("new")
+                atomic_file.discard()
+            
+            assert path.read_text() == "old"
+            assert os.listdir(temp_dir) == ["out.py"]
+
+    def test_symlink_destination_kept(self):
+        """Test that a symbolic link destination stays a link to the replaced file."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            target = Path(temp_dir) / "real" / "out.py"
+            target.parent.mkdir()
+            target.write_text("old")
+            link = Path(temp_dir) / "link.py"
+            link.symlink_to(target)
+            
+            atomic_write(link, b"new")
+            
+            assert link.is_symlink()
+            assert target.read_text() == "new"
+            assert os.listdir(target.parent) == ["out.py"]
+
+    def test_new_file_follows_umask(self):
+        """Test that a new file gets the mode the umask gives any new file."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "out.py"
+            old_umask = os.umask(0o027)
+            try:
+                atomic_write(path, b"new")
+            finally:
+                os.umask(old_umask)
+            
+            assert path.stat().st_mode & 0o777 == 0o640
+
+    def test_preserve_permissions_and_mtime(self):
+        """Test that the permissions and mtime of a stat result are applied."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "script.py"
+            path.write_text("old")
+            os.chmod(path, 0o751)
+            os.utime(path, ns=(1_000_000_000, 2_000_000_000))
+            
+            atomic_write(path, b"new", preserve=path.stat())
+            
+            stat = path.stat()
+            assert stat.st_mode & 0o777 == 0o751
+            assert stat.st_mtime_ns == 2_000_000_000
+
+
+class TestCopyFile:
+    """Test cases for the copy_file function."""
+
+    @pytest.mark.parametrize("link_mode", ["copy", "reflink", "hardlink"])
+    def test_replaces_target(self, link_mode):
+        """Test that the target gets the source's content in every link mode."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "in.py"
+            source.write_bytes(b"x = 1\n" * 1000)
+            target = Path(temp_dir) / "out.py"
+            target.write_text("old")
+            
+            method = copy_file(source, target, link_mode)
+            
+            assert target.read_bytes() == source.read_bytes()
+            assert (method == "hardlink") == target.samefile(source)
+
+    def test_copy_breaks_hard_link(self):
+        """Test that copying over a hard link to the source leaves the source alone."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "in.py"
+            source.write_text("x = 1\n")
+            target = Path(temp_dir) / "out.py"
+            copy_file(source, target, "hardlink")
+            
+            assert copy_file(source, target) != "hardlink"
+            
+            assert not target.samefile(source)
+            assert source.read_text() == target.read_text() == "x = 1\n"
+
+    def test_refused(self):
+        """Test that a file is never copied onto itself, nor with an unknown mode."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "in.py"
+            source.write_text("x = 1\n")
+            
+            with pytest.raises(ValueError):
+                copy_file(source, Path(temp_dir) / "." / "in.py")
+            with pytest.raises(ValueError):
+                copy_file(source, Path(temp_dir) / "out.py", "symlink")
+            assert source.read_text() == "x = 1\n"
+
+
+class TestBreakLink:
+    """Test cases for the break_link function."""
+
+    def test_only_links_to_the_source(self):
+        """Test that only a hard link to the source is removed, never the source itself."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "in.py"
+            source.write_text("x = 1\n")
+            other = Path(temp_dir) / "other.py"
+            other.write_text("y = 2\n")
+            link = Path(temp_dir) / "link.py"
+            os.link(source, link)
+            
+            break_link(source, other)
+            break_link(source, source)
+            assert other.exists() and source.exists()
+            
+            break_link(source, link)
+            assert not link.exists()
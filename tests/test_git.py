@@ -0,0 +1,127 @@
+"""
+Tests for the git integration of pycommentcleaner.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pycommentcleaner.cli import main
+from pycommentcleaner.git import BlobReader, GitError, changed_files, clean_staged
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def _git(repo, *args):
+    """Run a git command in a test repository."""
+    subprocess.run(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com"] + list(args),
+        cwd=str(repo), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+@pytest.fixture
+def repo():
+    """Create a repository with one commit on main and a feature branch."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo = Path(os.path.realpath(temp_dir))
+        _git(repo, "init", "-q", "-b", "main")
+        (repo / "old.py").write_text("x = 1  # Old\n")
+        (repo / "gone.py").write_text("y = 2\n")
+        _git(repo, "add", ".")
+        _git(repo, "commit", "-q", "-m", "Initial")
+        _git(repo, "checkout", "-q", "-b", "feature")
+        yield repo
+
+
+class TestChangedFiles:
+    """Test cases for listing changed files."""
+
+    def test_since(self, repo):
+        """Test committed and uncommitted changes since a ref."""
+        (repo / "pkg").mkdir()
+        (repo / "pkg" / "new.py").write_text("z = 3  # New\n")
+        (repo / "notes.txt").write_text("# Not Python\n")
+        _git(repo, "add", ".")
+        _git(repo, "commit", "-q", "-m", "Add")
+        (repo / "old.py").write_text("x = 2  # Changed\n")
+        _git(repo, "rm", "-q", "gone.py")
+
+        assert changed_files(since="main", cwd=repo) == [repo / "old.py", repo / "pkg" / "new.py"]
+        assert changed_files(since="main", pathspecs=["pkg"], cwd=repo) == [repo / "pkg" / "new.py"]
+        assert changed_files(since="main", exclude=["pkg"], cwd=repo) == [repo / "old.py"]
+
+    def test_staged(self, repo):
+        """Test that only staged changes are listed."""
+        (repo / "old.py").write_text("x = 2  # Unstaged\n")
+        (repo / "new.py").write_text("z = 3\n")
+        _git(repo, "add", "new.py")
+
+        assert changed_files(staged=True, cwd=repo) == [repo / "new.py"]
+
+    def test_errors(self, repo):
+        """Test unknown refs and invalid arguments."""
+        with pytest.raises(GitError):
+            changed_files(since="no-such-ref", cwd=repo)
+        with pytest.raises(ValueError):
+            changed_files(cwd=repo)
+
+
+class TestStaged:
+    """Test cases for cleaning staged contents."""
+
+    def test_blob_reader(self, repo):
+        """Test reading several objects through one process."""
+        with BlobReader(repo) as reader:
+            assert reader.read(":old.py") == b"x = 1  # Old\n"
+            assert reader.read(":missing.py") is None
+            assert reader.read("HEAD:gone.py") == b"y = 2\n"
+
+    def test_clean_staged(self, repo):
+        """Test that the staged content is cleaned, not the working tree."""
+        (repo / "old.py").write_text("x = 2  # Staged\n")
+        _git(repo, "add", "old.py")
+        (repo / "old.py").write_text("x = 3  # Unstaged\n")
+
+        [(path, success, message)] = clean_staged(changed_files(staged=True, cwd=repo), cwd=repo)
+
+        assert success, message
+        assert (repo / "old_cleaned.py").read_text() == "x = 2  \n"
+        assert (repo / "old.py").read_text() == "x = 3  # Unstaged\n"
+
+    def test_hardlinked_output_is_not_written_through(self, repo):
+        """Test that writing an output hard-linked to its file leaves the file alone."""
+        (repo / "old.py").write_text("x = 2  # Staged\n")
+        _git(repo, "add", "old.py")
+        os.link(str(repo / "old.py"), str(repo / "old_cleaned.py"))
+
+        [(path, success, message)] = clean_staged([repo / "old.py"], cwd=repo)
+
+        assert success, message
+        assert (repo / "old_cleaned.py").read_text() == "x = 2  \n"
+        assert (repo / "old.py").read_text() == "x = 2  # Staged\n"
+
+    def test_cli(self, repo):
+        """Test the --staged and --since command-line modes."""
+        (repo / "old.py").write_text("x = 2  # Changed\n")
+        _git(repo, "add", "old.py")
+        output_dir = repo / "out"
+
+        cwd = os.getcwd()
+        os.chdir(str(repo))
+        try:
+            with patch("builtins.print") as mock_print:
+                assert main(["--staged", "-o", str(output_dir)]) == 0
+                mock_print.assert_called_with("Successfully processed 1 of 1 files.")
+                assert main(["--since", "main", "--in-place"]) == 0
+            assert main(["--staged", "--in-place"]) == 2
+        finally:
+            os.chdir(cwd)
+
+        assert (output_dir / "old_cleaned.py").read_text() == "x = 2  \n"
+        assert (repo / "old.py").read_text() == "x = 2  \n"
@@ -0,0 +1,125 @@
+"""
+Tests for the instrumentation hooks of pycommentcleaner.
+"""
+
+import io
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from pycommentcleaner import hooks
+from pycommentcleaner.core import clean_code, clean_file, clean_stream
+
+
+class Recorder(hooks.Observer):
+    """Observer that records every callback."""
+
+    def __init__(self):
+        self.events = []
+
+    def file_start(self, path):
+        self.events.append(("file_start", path.name))
+
+    def file_end(self, path, success):
+        self.events.append(("file_end", path.name, success))
+
+    def comment_removed(self, path, row, col, text):
+        self.events.append(("comment", path.name if path else None, row, col, text))
+
+    def bytes_processed(self, path, bytes_in, bytes_out):
+        self.events.append(("bytes", path.name, bytes_in, bytes_out))
+
+    def phase(self, path, name, seconds):
+        assert seconds >= 0
+        self.events.append(("phase", name))
+
+
+@pytest.fixture
+def recorder():
+    """Register a recording observer for the duration of a test."""
+    observer = hooks.register(Recorder())
+    yield observer
+    hooks.unregister(observer)
+
+
+class TestHooks:
+    """Test cases for the observer callbacks."""
+
+    def test_clean_file_events(self, recorder):
+        """Test the events reported while cleaning a file."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "test.py"
+            file_path.write_text("x = 1  # Comment\n# Another\n")
+
+            success, _ = clean_file(file_path)
+
+        assert success
+        assert recorder.events == [
+            ("file_start", "test.py"),
+            ("phase", "read"),
+            ("phase", "tokenize"),
+            ("phase", "rebuild"),
+            ("comment", "test.py", 1, 7, "# Comment"),
+            ("comment", "test.py", 2, 0, "# Another"),
+            ("phase", "write"),
+            ("bytes", "test.py", 27, 9),
+            ("file_end", "test.py", True),
+        ]
+
+    def test_failed_file(self, recorder):
+        """Test that a failing file is still reported as ended."""
+        success, _ = clean_file("missing.py")
+
+        assert not success
+        assert recorder.events == [
+            ("file_start", "missing.py"),
+            ("file_end", "missing.py", False),
+        ]
+
+    @pytest.mark.parametrize("engine", ["splice", "untokenize", "scan"])
+    def test_clean_code_without_file(self, recorder, engine):
+        """Test that comments from clean_code have no path."""
+        clean_code("x = 1  # Comment\n", engine=engine)
+
+        assert ("comment", None, 1, 7, "# Comment") in recorder.events
+
+    def test_clean_stream(self, recorder):
+        """Test that streamed comments are reported."""
+        clean_stream(io.StringIO("# a\nx = 1  # b\n"), io.StringIO())
+
+        comments = [event for event in recorder.events if event[0] == "comment"]
+        assert comments == [("comment", None, 1, 0, "# a"), ("comment", None, 2, 7, "# b")]
+
+    def test_unregistered_observer_is_not_called(self):
+        """Test that observers stop receiving events once unregistered."""
+        observer = hooks.register(Recorder())
+        hooks.unregister(observer)
+
+        clean_code("x = 1  # Comment\n")
+
+        assert observer.events == []
+        assert hooks.observers == []
+
+
+class TestTotals:
+    """Test cases for the Totals observer."""
+
+    def test_totals(self):
+        """Test that files, comments and bytes are added up."""
+        totals = hooks.register(hooks.Totals())
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                for name in ("a.py", "b.py"):
+                    file_path = Path(temp_dir) / name
+                    file_path.write_text("x = 1  # Comment\n")
+                    clean_file(file_path)
+        finally:
+            hooks.unregister(totals)
+
+        assert totals.files == 2
+        assert totals.failed == 0
+        assert totals.comments == 2
+        assert (totals.bytes_in, totals.bytes_out) == (34, 16)
+        assert set(totals.seconds) == set(hooks.PHASES)
+        assert "Comments removed: 2" in totals.summary()
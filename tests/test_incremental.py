@@ -0,0 +1,110 @@
+"""
+Tests for the incremental cleaning of pycommentcleaner.
+"""
+
+import random
+
+import pytest
+
+from pycommentcleaner.core import clean_code
+from pycommentcleaner.incremental import IncrementalCleaner
+
+SAMPLE = '''import os  # Comment
+
+
+class Example:
+    """Docstring with # not a comment."""
+
+    def method(self, value):
+        # Standalone comment
+        total = (value +  # Inside brackets
+                 1)
+        text = "# not a comment"
+        return total, text
+
+
+def function():
+    return [
+        1,  # One
+        2,  # Two
+    ]
+'''
+
+
+class TestIncrementalCleaner:
+    """Test cases for IncrementalCleaner."""
+
+    def test_initial_output(self):
+        """Test that the first output is clean_code's."""
+        assert IncrementalCleaner(SAMPLE).cleaned == clean_code(SAMPLE)
+
+    def test_edit_tokenizes_few_lines(self):
+        """Test that a one-line edit only tokenizes the lines around it."""
+        cleaner = IncrementalCleaner(SAMPLE * 50)
+        before = cleaner.lines_tokenized
+
+        cleaned = cleaner.edit((12, 26), (12, 26), "  # New comment")
+
+        assert cleaned == clean_code(cleaner.code)
+        assert cleaner.lines_tokenized - before < 5
+
+    def test_edit_opens_string(self):
+        """Test that opening a string turns later comments into string content."""
+        cleaner = IncrementalCleaner(SAMPLE)
+
+        cleaned = cleaner.edit((7, 0), (7, 0), 'x = """\n')
+        assert cleaned == clean_code(cleaner.code)
+        assert "# Inside brackets" in cleaned
+
+        cleaned = cleaner.edit((7, 0), (8, 0), "")
+        assert cleaned == clean_code(SAMPLE)
+
+    def test_edit_joins_lines(self):
+        """Test that deleting a newline joins the next line."""
+        cleaner = IncrementalCleaner("x = 1  # a\ny = 2  # b\n")
+
+        assert cleaner.edit((1, 5), (1, 11), "") == "x = 1y = 2  \n"
+        assert cleaner.code == "x = 1y = 2  # b\n"
+
+    def test_invalid_code_unchanged(self):
+        """Test that code that cannot be tokenized is returned unchanged until fixed."""
+        cleaner = IncrementalCleaner("x = 1  # a\n")
+
+        assert cleaner.update("x = (1  # a\n") == "x = (1  # a\n"
+        assert cleaner.update("x = (1)  # a\n") == "x = (1)  \n"
+
+    def test_error_token_is_code(self):
+        """Test that an error token that does not open a string is kept as code."""
+        code = "x\u0301 = 1  # a\ny = 2  # b\n"
+        cleaner = IncrementalCleaner(code)
+
+        assert cleaner.update(code) == clean_code(code) == "x\u0301 = 1  \ny = 2  \n"
+
+    def test_update(self):
+        """Test that whole-text updates match clean_code."""
+        cleaner = IncrementalCleaner(SAMPLE)
+        changed = SAMPLE.replace("        text = ", "        # Added\n        text = ")
+
+        assert cleaner.update(changed) == clean_code(changed)
+        assert cleaner.update("") == ""
+        assert cleaner.update(SAMPLE) == clean_code(SAMPLE)
+
+    def test_invalid_range(self):
+        """Test that ranges outside the code are refused."""
+        cleaner = IncrementalCleaner("x = 1\n")
+        with pytest.raises(ValueError):
+            cleaner.edit((2, 0), (2, 0), "y = 2\n")
+        with pytest.raises(ValueError):
+            cleaner.edit((1, 3), (1, 1), "")
+
+    def test_random_edits(self):
+        """Test that random edits keep the output equal to clean_code's."""
+        rng = random.Random(0)
+        pieces = ["# c", "'", '"""', "(", ")", "\n", "    ", "\\\n", "if x:\n", "f'{a}'", "]", "#"]
+        cleaner = IncrementalCleaner(SAMPLE)
+        for _ in range(300):
+            code = cleaner.code
+            start = rng.randint(0, len(code))
+            end = min(len(code), start + rng.choice([0, 1, 5, 20]))
+            code = code[:start] + "".join(rng.choice(pieces) for _ in range(rng.randint(0, 3))) + code[end:]
+            assert cleaner.update(code) == clean_code(code)
@@ -0,0 +1,107 @@
+"""
+Tests for the SQLite comment index of pycommentcleaner.
+"""
+
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pycommentcleaner import hooks
+from pycommentcleaner.cli import main
+from pycommentcleaner.core import clean_files
+from pycommentcleaner.index import CommentIndex
+
+
+@pytest.fixture
+def temp_dir():
+    """Provide a temporary directory."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield Path(temp_dir)
+
+
+def _rows(database, query="SELECT path, line, col, text FROM comments ORDER BY id"):
+    """Query a comment index."""
+    connection = sqlite3.connect(str(database))
+    try:
+        return connection.execute(query).fetchall()
+    finally:
+        connection.close()
+
+
+class TestCommentIndex:
+    """Test cases for the CommentIndex observer."""
+
+    def test_records_removed_comments(self, temp_dir):
+        """Test that each removed comment is stored with its file and position."""
+        file_path = temp_dir / "test.py"
+        file_path.write_text("# License\nx = 1  # type: ignore\ns = '# not a comment'\n")
+        database = temp_dir / "comments.db"
+
+        with CommentIndex(database) as index:
+            hooks.register(index)
+            try:
+                clean_files([file_path], backend="serial")
+            finally:
+                hooks.unregister(index)
+
+        assert _rows(database) == [
+            (str(file_path), 1, 0, "# License"),
+            (str(file_path), 2, 7, "# type: ignore"),
+        ]
+
+    def test_batches(self, temp_dir):
+        """Test that comments are written once a batch is full and on close."""
+        database = temp_dir / "comments.db"
+        index = CommentIndex(database, batch_size=2)
+        for row in range(1, 4):
+            index.comment_removed(Path("a.py"), row, 0, f"# {row}")
+
+        assert index.recorded == 2
+        assert len(_rows(database)) == 2
+
+        index.close()
+        assert index.recorded == 3
+        assert len(_rows(database)) == 3
+
+    def test_runs(self, temp_dir):
+        """Test that each index opened on a database starts a new run."""
+        database = temp_dir / "comments.db"
+        for _ in range(2):
+            with CommentIndex(database) as index:
+                index.comment_removed(None, 1, 0, "# Comment")
+
+        assert _rows(database, "SELECT run_id, path FROM comments ORDER BY id") == [(1, None), (2, None)]
+
+    def test_not_a_database(self, temp_dir):
+        """Test that a file that is not SQLite is rejected."""
+        database = temp_dir / "comments.db"
+        database.write_bytes(b"not a database" * 100)
+        with pytest.raises(sqlite3.Error):
+            CommentIndex(database)
+
+
+class TestCommentIndexCli:
+    """Test cases for --comment-index on the command line."""
+
+    def test_cli(self, temp_dir):
+        """Test that cleaning with --comment-index fills the database."""
+        for name in ("a.py", "b.py"):
+            (temp_dir / name).write_text(f"{name[0]} = 1  # TODO {name}\n")
+        database = temp_dir / "comments.db"
+
+        with patch("builtins.print"):
+            assert main([str(temp_dir), "--comment-index", str(database), "-j", "2", "--backend", "thread"]) == 0
+
+        assert sorted(_rows(database, "SELECT text FROM comments")) == [("# TODO a.py",), ("# TODO b.py",)]
+        assert not hooks.observers
+
+    def test_process_workers_are_refused(self, temp_dir):
+        """Test that runs whose comments would be lost in other processes are refused."""
+        database = str(temp_dir / "comments.db")
+        assert main(["file.py", "--comment-index", database, "-j", "2"]) == 2
+        assert main(["file.py", "--comment-index", database, "--cache-dir"]) == 2
+        assert not os.path.exists(database)
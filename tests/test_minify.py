@@ -0,0 +1,117 @@
+"""
+Tests for the minify mode of pycommentcleaner.
+"""
+
+import ast
+import tempfile
+import zipfile
+from pathlib import Path
+
+from pycommentcleaner.archive import clean_archive
+from pycommentcleaner.cli import main
+from pycommentcleaner.core import clean_file
+from pycommentcleaner.minify import minify_bytes, minify_code
+
+
+class TestMinifyCode:
+    """Test cases for minify_code."""
+
+    def test_docstrings_removed(self):
+        """Test that module, class and function docstrings are removed."""
+        code = '''"""Module."""
+
+import os  # Comment
+
+
+class A:
+    """Class."""
+
+    x = 1
+
+    def f(self):
+        """Method."""
+        return os.sep
+'''
+        assert minify_code(code) == "import os\nclass A:\n    x = 1\n    def f(self):\n        return os.sep\n"
+
+    def test_empty_body_gets_pass(self):
+        """Test that a body made of a docstring only becomes 'pass'."""
+        code = 'def f():\n    """Only a docstring."""\n\nclass B: "inline"\n'
+        minified = minify_code(code)
+        assert minified == "def f():\n    pass\nclass B: pass\n"
+        ast.parse(minified)
+
+    def test_other_strings_kept(self):
+        """Test that strings that are not docstrings are left alone."""
+        code = 'x = 1\n"""Not a docstring."""\ndef f():\n    y = """a\n\n  b  \n"""\n    return y\n'
+        assert minify_code(code) == code
+
+    def test_fstring_not_docstring(self):
+        """Test that a leading f-string is kept."""
+        code = 'f"""{__name__}"""\nx = 1\n'
+        assert minify_code(code) == code
+
+    def test_doc_users_keep_docstrings(self):
+        """Test that files reading __doc__ keep their docstrings."""
+        code = 'def f():\n    """Help."""\n\n\nprint(f.__doc__)\n'
+        assert minify_code(code) == 'def f():\n    """Help."""\nprint(f.__doc__)\n'
+
+    def test_line_endings_kept(self):
+        """Test that CRLF line endings survive."""
+        assert minify_code('"""doc"""\r\nx = 1  # c\r\n\r\n') == "x = 1\r\n"
+
+    def test_invalid_code_unchanged(self):
+        """Test that code that cannot be tokenized is returned as it is."""
+        code = 'x = (\n'
+        assert minify_code(code) == code
+
+
+class TestMinifyFiles:
+    """Test cases for minifying files and archives."""
+
+    def test_minify_bytes_encoding(self):
+        """Test that the output is UTF-8 whatever the source encoding."""
+        data = '# -*- coding: latin-1 -*-\n"""Doc."""\nname = "caf\xe9"\n'.encode("latin-1")
+        assert minify_bytes(data) == 'name = "caf\xe9"\n'.encode("utf-8")
+
+    def test_clean_file_reports_savings(self):
+        """Test that the message reports the bytes saved."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "module.py"
+            source.write_text('"""Doc."""\n\nx = 1\n')
+
+            success, message = clean_file(source, minify=True)
+
+            assert success
+            assert (Path(temp_dir) / "module_cleaned.py").read_text() == "x = 1\n"
+            assert "saved 12 bytes, 66.7%" in message
+
+    def test_archive(self):
+        """Test that Python members of archives are minified."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "app.zip"
+            with zipfile.ZipFile(source, "w") as archive:
+                archive.writestr("app.py", '"""Doc."""\nx = 1  # Comment\n')
+
+            success, _ = clean_archive(source, minify=True)
+
+            assert success
+            with zipfile.ZipFile(Path(temp_dir) / "app_cleaned.zip") as archive:
+                assert archive.read("app.py") == b"x = 1\n"
+
+    def test_cli(self, capsys):
+        """Test that the command line prints the savings of every file."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ("a.py", "b.py"):
+                (Path(temp_dir) / name).write_text('"""Doc."""\nx = 1\n')
+
+            assert main([temp_dir, "--minify"]) == 0
+
+            output = capsys.readouterr().out
+            assert output.count("Successfully minified") == 2
+            assert "saved 11 bytes" in output
+
+    def test_cli_rejects_check(self, capsys):
+        """Test that --minify cannot be combined with --check."""
+        assert main(["file.py", "--minify", "--check"]) == 2
+        assert "--minify cannot be combined" in capsys.readouterr().err
@@ -0,0 +1,224 @@
+"""
+Tests for the Jupyter notebook support of pycommentcleaner.
+"""
+
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from pycommentcleaner.cache import MemoryCache, ResultCache
+from pycommentcleaner.check import check_file
+from pycommentcleaner.core import clean_code, clean_file, clean_files
+from pycommentcleaner.notebook import _clean_cells, clean_notebook, is_notebook
+
+
+def make_notebook(*sources, language="python", indent=1):
+    """Build notebook bytes with one code cell per source, with an output each."""
+    cells = [{"cell_type": "markdown", "metadata": {}, "source": ["# Title\n"]}]
+    for source in sources:
+        cells.append({
+            "cell_type": "code",
+            "execution_count": 1,
+            "metadata": {},
+            "outputs": [{"name": "stdout", "output_type": "stream", "text": ["1\n"]}],
+            "source": source,
+        })
+    notebook = {
+        "cells": cells,
+        "metadata": {"kernelspec": {"display_name": "Kernel", "language": language, "name": "kernel"}},
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+    return (json.dumps(notebook, indent=indent, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def cell_sources(data):
+    """Return the sources of the code cells of notebook bytes, joined."""
+    cells = json.loads(data.decode("utf-8"))["cells"]
+    return ["".join(cell["source"]) for cell in cells if cell["cell_type"] == "code"]
+
+
+class TestCleanNotebook:
+    """Test cases for the clean_notebook function."""
+
+    @pytest.mark.parametrize("engine", ["splice", "untokenize", "scan"])
+    def test_code_cells(self, engine):
+        """Test that comments are removed from code cells only, in list and string sources."""
+        data = make_notebook(["x = 1  # Comment\n", "y = 2\n"], "# Only a comment\nz = 3")
+
+        cleaned = clean_notebook(data, engine=engine)
+
+        expected = [clean_code("x = 1  # Comment\ny = 2\n", engine), clean_code("# Only a comment\nz = 3", engine)]
+        assert cell_sources(cleaned) == expected
+        notebook = json.loads(cleaned.decode("utf-8"))
+        assert notebook["cells"][0]["source"] == ["# Title\n"]
+        assert isinstance(notebook["cells"][1]["source"], list)
+        assert isinstance(notebook["cells"][2]["source"], str)
+        assert notebook["cells"][1]["outputs"]
+
+    def test_formatting_kept(self):
+        """Test that the output is written with the notebook's indentation and key order."""
+        data = make_notebook("x = 'ü'  # Comment\n", indent=2)
+
+        cleaned = clean_notebook(data)
+
+        assert cleaned == make_notebook("x = 'ü'  \n", indent=2)
+
+    def test_unchanged_returns_input(self):
+        """Test that a notebook with nothing to clean comes back byte for byte."""
+        data = make_notebook("x = '# not a comment'\n").replace(b'"nbformat"', b'"nbformat"  ')
+
+        assert clean_notebook(data) is data
+
+    def test_magics(self):
+        """Test that IPython lines are kept while the Python around them is cleaned."""
+        source = (
+            "%matplotlib inline  # not Python\n"
+            "files = !ls  # passed to the shell\n"
+            "len?\n"
+            "def f():\n"
+            "    !echo \\\n"
+            "        more  # continued\n"
+            "    return 1  # Comment\n"
+            "text = '''\n"
+            "%notmagic  # in a string\n"
+            "'''\n"
+        )
+        expected = source.replace("    return 1  # Comment\n", "    return 1  \n")
+
+        assert cell_sources(clean_notebook(make_notebook(source))) == [expected]
+
+    @pytest.mark.parametrize("source", ["%%bash\necho  # Comment\n", "%%time\nx = 1  # Comment\n"])
+    def test_cell_magic_untouched(self, source):
+        """Test that cells starting with a cell magic are left alone."""
+        data = make_notebook(source)
+
+        assert clean_notebook(data) == data
+
+    def test_other_language_untouched(self):
+        """Test that the code cells of notebooks for other kernels are left alone."""
+        data = make_notebook("x <- 1  # Comment\n", language="R")
+
+        assert clean_notebook(data) == data
+
+    def test_strip_outputs(self):
+        """Test that outputs and execution counts are cleared on request."""
+        data = make_notebook("x = 1\n")
+
+        notebook = json.loads(clean_notebook(data, strip_outputs=True).decode("utf-8"))
+
+        assert notebook["cells"][1]["outputs"] == []
+        assert notebook["cells"][1]["execution_count"] is None
+
+    @pytest.mark.parametrize("data", [b"not json", b"[1, 2]", b'{"cells": 1}', b"\xff"])
+    def test_invalid_unchanged(self, data):
+        """Test that files that are not notebooks are returned unchanged."""
+        assert clean_notebook(data) == data
+
+    def test_cell_cache(self):
+        """Test that cells found in the cache are not cleaned again."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResultCache(temp_dir)
+            first = make_notebook("x = 1  # Comment\n", "y = 2  # Comment\n")
+            clean_notebook(first, cache=cache, key="analysis.ipynb")
+
+            edited = make_notebook("x = 1  # Comment\n", "y = 3  # Comment\n")
+            with patch("pycommentcleaner.notebook._clean_cells", wraps=_clean_cells) as clean_cells:
+                cleaned = clean_notebook(edited, cache=cache, key="analysis.ipynb")
+
+            clean_cells.assert_called_once_with(["y = 3  # Comment\n"], "splice")
+            assert cell_sources(cleaned) == ["x = 1  \n", "y = 3  \n"]
+
+    def test_cell_cache_one_entry_per_notebook(self):
+        """Test that all the cleaned cells of a notebook are stored in one cache entry."""
+        cache = MemoryCache()
+        data = make_notebook(*(f"x = {index}  # Comment\n" for index in range(10)))
+
+        with patch.object(cache, "put_output", wraps=cache.put_output) as put_output:
+            clean_notebook(data, cache=cache)
+            clean_notebook(data, cache=cache)
+
+        assert put_output.call_count == 1
+        assert len(cache) == 1
+
+    def test_is_notebook(self):
+        """Test that notebooks are recognized by their suffix."""
+        assert is_notebook("analysis.ipynb") and is_notebook(Path("A.IPYNB"))
+        assert not is_notebook("module.py")
+
+
+class TestNotebookFiles:
+    """Test cases for cleaning notebook files through the file functions."""
+
+    def test_clean_file(self):
+        """Test that a notebook is cleaned to a '_cleaned.ipynb' file."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "analysis.ipynb"
+            path.write_bytes(make_notebook("x = 1  # Comment\n"))
+
+            success, message = clean_file(path, strip_outputs=True)
+
+            assert success, message
+            notebook = json.loads((Path(temp_dir) / "analysis_cleaned.ipynb").read_text(encoding="utf-8"))
+            assert notebook["cells"][1]["source"] == "x = 1  \n"
+            assert notebook["cells"][1]["outputs"] == []
+
+    def test_clean_files_with_cache(self):
+        """Test that a batch of notebooks is cleaned into an output directory, through the cache."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for index in range(3):
+                path = Path(temp_dir) / f"nb{index}.ipynb"
+                path.write_bytes(make_notebook(f"x = {index}  # Comment\n"))
+                paths.append(path)
+            output_dir = Path(temp_dir) / "out"
+            cache = ResultCache(Path(temp_dir) / "cache")
+
+            results = clean_files(paths, output_dir=output_dir, cache=cache)
+
+            assert all(success for _, success, _ in results)
+            for index in range(3):
+                assert cell_sources((output_dir / f"nb{index}_cleaned.ipynb").read_bytes()) == [f"x = {index}  \n"]
+
+    def test_edited_file_uses_cell_cache(self):
+        """Test that an edited notebook file finds the cells of its last version in the cache."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "analysis.ipynb"
+            path.write_bytes(make_notebook("x = 1  # Comment\n", "y = 2  # Comment\n"))
+            cache = ResultCache(Path(temp_dir) / "cache")
+            assert clean_file(path, cache=cache)[0]
+
+            path.write_bytes(make_notebook("x = 1  # Comment\n", "y = 3  # Comment\n"))
+            with patch("pycommentcleaner.notebook._clean_cells", wraps=_clean_cells) as clean_cells:
+                success, message = clean_file(path, cache=cache)
+
+            assert success, message
+            clean_cells.assert_called_once_with(["y = 3  # Comment\n"], "splice")
+            assert cell_sources((Path(temp_dir) / "analysis_cleaned.ipynb").read_bytes()) == ["x = 1  \n", "y = 3  \n"]
+
+    @pytest.mark.parametrize("options", [{"stream": True}, {"minify": True}, {"pyc": "timestamp"}])
+    def test_refused_modes(self, options):
+        """Test that notebooks cannot be streamed, minified or compiled."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "analysis.ipynb"
+            path.write_bytes(make_notebook("x = 1  # Comment\n"))
+
+            success, message = clean_file(path, **options)
+
+            assert not success
+            assert "notebook" in message
+
+    def test_check(self):
+        """Test that check counts the comments of the code cells."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "analysis.ipynb"
+            path.write_bytes(make_notebook("x = 1  # Comment\n# More\n"))
+
+            result = check_file(path)
+
+            assert result.has_comments
+            assert result.comments == 2
+            assert result.comment_bytes == len("# Comment# More")
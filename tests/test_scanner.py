@@ -0,0 +1,128 @@
+"""
+Tests for the comment scanner behind the "scan" engine.
+"""
+
+import random
+import sys
+
+import pytest
+
+from pycommentcleaner.cleaner import Cleaner
+from pycommentcleaner.core import _comment_byte_spans, _comment_spans, clean_bytes, clean_code
+from pycommentcleaner.scanner import scan_comment_bytes, scan_comments
+
+# Lines put together by the differential test, valid or not
+PIECES = [
+    "x = 1", "# c", "  # indented", "def f(a, b):", "    return a  # r", "if x:", "\tx = 1", "    pass",
+    "s = 'a # b'", 's = "a # b"', "s = '''a\n# b\n'''", 's = """x"y""z"""', "s = 'it\\'s # x'", "s = r'\\'#'",
+    "t = (1,  # one\n 2)", "u = [\n# c\n]", "w = x \\\n  + 1  # e", "f'{x}'  # f", "f'{x!r:>{w}}'  # g",
+    "f'{x:{y}}#'", "f'{{#}}'", "f\"{'#'}\"", "f'{x[\"#\"]}'", "f'''\n{x}\n# no\n'''", "rf'\\{x}'", "f'\\N{DASH}'",
+    "f'{f\"{1}\"}'", "b'#'", "x = 0b2", "x = 1_", "x = 0x1F  # h", "x = 1abc", "x = $", "x = a != b", "x = )",
+    "x = (", "'unterminated", '"""open', "é = 1", "s = 'é # ü'  # ç", "\x0cx = 1", "  x = 2", "class A:", "\\",
+    "x = 1 \\", "f'{x=}'", "f'{x #}'", "f'{x:\"}'", "f'{ {1:2}[1] }'", "elif'x'", "x = 01", "\x00", "x = 1\r",
+    "x = '''a'''''", "x = [1,\n  2]  # o", "    ", "",
+]
+
+SAMPLE = '''import os  # Comment
+
+
+class Example:
+    """Docstring with # not a comment."""
+
+    def method(self, value):
+        # Standalone comment
+        total = (value +  # Inside brackets
+                 1)
+        text = f"{value!r:>{10}} # not a comment"
+        return total, text \\
+            + 1  # After a continuation
+'''
+
+
+def _offsets(code, spans):
+    """Convert tokenize's (row, col) spans to offsets."""
+    starts = [0, 0]
+    for line in code.split("\n"):
+        starts.append(starts[-1] + len(line) + 1)
+    return [(starts[start[0]] + start[1], starts[end[0]] + end[1]) for start, end in spans]
+
+
+class TestScanComments:
+    """Test cases for scan_comments."""
+
+    def test_finds_comments(self):
+        """Test that the comment offsets and positions are tokenize's."""
+        comments = []
+        spans = scan_comments(SAMPLE, comments)
+
+        expected = []
+        assert spans == _offsets(SAMPLE, _comment_spans(SAMPLE, expected))
+        assert comments == expected
+
+    @pytest.mark.parametrize("code", [
+        "x = $\n",  # Stray character
+        "x = (1\n",  # Open bracket at the end
+        "x = 'open\n",  # Unterminated string
+        "é = 1  # c\n",  # Non-ASCII name
+        "if x:\n\ty = 1\n",  # Tab in indentation
+        "if x:\n    y = 1\n  z = 2\n",  # Dedent to an unknown level
+        "x = 1 \\",  # Continuation at the end
+        "x = 1\ry = 2\n",  # Lone carriage return
+    ])
+    def test_ambiguous_code(self, code):
+        """Test that code only tokenize can decide on is not scanned."""
+        assert scan_comments(code) is None
+
+    @pytest.mark.skipif(sys.version_info < (3, 12), reason="f-strings nest from Python 3.12")
+    def test_nested_fstrings(self):
+        """Test that quotes inside replacement fields do not end the f-string."""
+        code = "x = f\"{d[\"#\"]:{f'{w}'}}\"  # Comment\n"
+
+        assert scan_comments(code) == [(code.index("  #") + 2, len(code) - 1)]
+
+    def test_bytes(self):
+        """Test that byte offsets and character columns are tokenize's."""
+        data = b"\xef\xbb\xbfs = '\xc3\xa9'  # \xc3\xbc\r\nx = 1  # b\r\n"
+        comments = []
+        spans = scan_comment_bytes(data, comments)
+
+        expected = []
+        assert spans == _comment_byte_spans(data, expected)
+        assert comments == expected
+
+    def test_other_encodings_not_scanned(self):
+        """Test that source in other encodings is left to tokenize."""
+        assert scan_comment_bytes(b"# -*- coding: latin-1 -*-\nx = '\xe9'  # c\n") is None
+        assert scan_comment_bytes(b"x = '\xff'  # c\n") is None
+
+
+class TestScanEngine:
+    """Test cases for the "scan" engine."""
+
+    def test_matches_splice(self):
+        """Test that the output is the splice engine's."""
+        assert clean_code(SAMPLE, engine="scan") == clean_code(SAMPLE)
+        data = SAMPLE.encode("utf-8")
+        assert clean_bytes(data, engine="scan") == clean_bytes(data)
+
+    def test_fallback(self):
+        """Test that ambiguous code is cleaned by the tokenize engine."""
+        code = "if x:\n\ty = 1  # Comment\n"
+        assert clean_code(code, engine="scan") == "if x:\n\ty = 1  \n"
+        assert clean_code("x = (1  # Open\n", engine="scan") == "x = (1  # Open\n"
+
+    def test_cleaner_counts(self):
+        """Test that a scan Cleaner reports the same counts as a splice one."""
+        assert Cleaner("scan").clean(SAMPLE) == Cleaner().clean(SAMPLE)
+        data = SAMPLE.encode("utf-8")
+        assert Cleaner("scan").clean_bytes(data) == Cleaner().clean_bytes(data)
+
+    def test_differential(self):
+        """Test that random, often invalid, code gets the splice engine's output."""
+        rng = random.Random(0)
+        for _ in range(2000):
+            code = "\n".join(rng.choice(PIECES) for _ in range(rng.randint(1, 6))) + rng.choice(["\n", "", "  # t"])
+
+            assert clean_code(code, engine="scan") == clean_code(code)
+            data = code.replace("\n", "\r\n").encode("utf-8")
+            assert clean_bytes(data, engine="scan") == clean_bytes(data)
@@ -0,0 +1,152 @@
+"""
+Tests for the sharding of pycommentcleaner.
+"""
+
+import json
+import random
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from pycommentcleaner.cli import main
+from pycommentcleaner.core import clean_paths
+from pycommentcleaner.shard import merge_manifests, partition_files, shard_files, write_manifest
+
+
+def make_tree(temp_dir, sizes):
+    """Create one file per size and return their paths."""
+    paths = []
+    for index, size in enumerate(sizes):
+        path = Path(temp_dir) / f"m{index}.py"
+        path.write_text("x = 1  # Comment\n" + "#" * size)
+        paths.append(path)
+    return paths
+
+
+class TestPartitionFiles:
+    """Test cases for the partition_files and shard_files functions."""
+
+    def test_disjoint_cover_and_stable(self):
+        """Test that the shards cover every file once, whatever order the files come in."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            generator = random.Random(0)
+            paths = make_tree(temp_dir, [generator.randint(0, 5000) for _ in range(50)] + [100] * 10)
+            shards = partition_files(paths, 4)
+
+            shuffled = paths + paths[:5]
+            generator.shuffle(shuffled)
+            assert partition_files(shuffled, 4) == shards
+
+            files = [path for shard in shards for path in shard.files]
+            assert sorted(files) == sorted(paths)
+            assert [shard.index for shard in shards] == [1, 2, 3, 4]
+            assert sum(shard.size for shard in shards) == shards[0].total_size
+
+    def test_balanced_by_bytes(self):
+        """Test that shards get about the same bytes rather than the same number of files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = make_tree(temp_dir, [30000, 10000, 10000, 10000] + [100] * 20)
+
+            shards = partition_files(paths, 2)
+
+            assert abs(shards[0].size - shards[1].size) < 200
+            assert len(shards[0].files) != len(shards[1].files)
+
+    def test_more_shards_than_files(self):
+        """Test that extra shards are empty."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = make_tree(temp_dir, [10])
+
+            assert [len(shard.files) for shard in partition_files(paths, 3)] == [1, 0, 0]
+
+    @pytest.mark.parametrize("index, count", [(0, 2), (3, 2), (1, 0)])
+    def test_invalid(self, index, count):
+        """Test that shards that do not exist are refused."""
+        with pytest.raises(ValueError):
+            shard_files([], index, count)
+
+
+class TestManifests:
+    """Test cases for the write_manifest and merge_manifests functions."""
+
+    def test_merge(self):
+        """Test that the manifests of all shards add up."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = make_tree(temp_dir, [100, 200, 300])
+            manifests = []
+            for shard in partition_files(paths, 2):
+                results = [(str(path), path.name != "m0.py", f"Failed {path.name}") for path in shard.files]
+                manifest_path = Path(temp_dir) / f"shard{shard.index}.json"
+                write_manifest(manifest_path, shard, results, shard.index * 1.5)
+                manifests.append(manifest_path)
+
+            merged = merge_manifests(manifests)
+
+            assert merged["missing"] == []
+            assert merged["files"] == merged["total_files"] == 3
+            assert merged["failed"] == 1
+            assert merged["failures"] == [{"path": str(paths[0]), "message": "Failed m0.py"}]
+            assert merged["seconds"] == 3.0
+            assert merged["total_seconds"] == 4.5
+            assert merged["bytes"] == sum(path.stat().st_size for path in paths)
+
+            assert merge_manifests(manifests[1:])["missing"] == [1]
+
+    def test_refused(self):
+        """Test that manifests from different runs, or twice the same shard, are refused."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = make_tree(temp_dir, [100, 200, 300])
+            first = Path(temp_dir) / "first.json"
+            write_manifest(first, partition_files(paths, 2)[0], [], 1.0)
+            other = Path(temp_dir) / "other.json"
+            write_manifest(other, partition_files(paths, 3)[1], [], 1.0)
+            broken = Path(temp_dir) / "broken.json"
+            broken.write_text("[]")
+
+            for manifest_paths in ([first, other], [first, first], [broken], [Path(temp_dir) / "missing.json"], []):
+                with pytest.raises(ValueError):
+                    merge_manifests(manifest_paths)
+
+
+class TestShardedRuns:
+    """Test cases for sharded cleaning through clean_paths and the command line."""
+
+    def test_clean_paths(self):
+        """Test that the shards of clean_paths clean every file once."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            make_tree(temp_dir, [100, 200, 300, 400, 500])
+            output_dir = Path(temp_dir) / "out"
+
+            cleaned = []
+            for index in (1, 2, 3):
+                results = clean_paths([temp_dir], output_dir=output_dir, shard=(index, 3))
+                cleaned.extend(file_path for file_path, success, _ in results if success)
+
+            assert len(cleaned) == len(set(cleaned)) == 5
+            assert len(list(output_dir.iterdir())) == 5
+
+    def test_cli(self, capsys):
+        """Test that each --shard run writes a manifest and --merge-manifests combines them."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "src"
+            source.mkdir()
+            make_tree(source, [100, 200, 300, 400])
+            manifests = [str(Path(temp_dir) / f"shard{index}.json") for index in (1, 2)]
+
+            for index, manifest in zip((1, 2), manifests):
+                arguments = [str(source), "-o", str(Path(temp_dir) / "out"), "--shard", f"{index}/2"]
+                assert main(arguments + ["--shard-manifest", manifest]) == 0
+            capsys.readouterr()
+
+            assert main(["--merge-manifests"] + manifests) == 0
+            assert "Merged 2 of 2 shards: 4 of 4 files, 0 failed" in capsys.readouterr().out
+            assert json.loads(Path(manifests[0]).read_text())["files"] == 2
+            assert all(path.read_text() == "x = 1  \n" for path in (Path(temp_dir) / "out").iterdir())
+
+            assert main(["--merge-manifests", manifests[0]]) == 1
+
+        with pytest.raises(SystemExit):
+            main(["src", "--shard", "3/2"])
+        assert main(["src", "--shard-manifest", "shard.json"]) == 2
+        assert main(["-", "--shard", "1/2"]) == 2
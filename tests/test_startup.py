@@ -0,0 +1,85 @@
+"""
+Tests for the startup cost of pycommentcleaner.
+
+The budgets are generous so the tests only catch real regressions, such
+as a heavy module imported again at the top of the package or the CLI.
+"""
+
+import subprocess
+import sys
+import time
+
+import pytest
+
+import pycommentcleaner
+
+# Cumulative import time of pycommentcleaner.cli, in microseconds
+IMPORT_BUDGET_US = 50000
+
+# Wall time of "pycommentcleaner --version" beyond a bare interpreter start, in seconds
+VERSION_BUDGET_S = 0.15
+
+# Modules that --help and --version must not load
+HEAVY_MODULES = ("asyncio", "concurrent.futures", "logging", "tokenize", "pycommentcleaner.core")
+
+
+def _python(*args):
+    """Run a fresh interpreter and return its completed process."""
+    return subprocess.run([sys.executable] + list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+def _best_time(*args, runs=3):
+    """Return the fastest wall time of several interpreter runs."""
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        _python(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+class TestLazyImports:
+    """Test cases for the lazily loaded package attributes."""
+
+    def test_cli_import_skips_heavy_modules(self):
+        """Test that importing the CLI does not load the cleaner."""
+        code = (
+            "import sys; before = set(sys.modules); import pycommentcleaner.cli; "
+            "print('\\n'.join(sorted(set(sys.modules) - before)))"
+        )
+        loaded = set(_python("-c", code).stdout.split())
+
+        assert loaded.isdisjoint(HEAVY_MODULES)
+
+    def test_attributes_are_loaded_on_access(self):
+        """Test that public names resolve and unknown names still fail."""
+        assert pycommentcleaner.clean_code("x = 1  # Comment\n") == "x = 1  \n"
+        assert "clean_file" in dir(pycommentcleaner)
+        assert set(pycommentcleaner.__all__) <= set(dir(pycommentcleaner))
+        with pytest.raises(AttributeError):
+            pycommentcleaner.missing_name
+
+
+class TestStartupBudget:
+    """Test cases for the startup time budgets."""
+
+    def test_import_time(self):
+        """Test the import time reported by python -X importtime."""
+        stderr = _python("-X", "importtime", "-c", "import pycommentcleaner.cli").stderr
+        cumulative = {}
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, total, name = line.split("|")
+            if total.strip().isdigit():
+                cumulative[name.strip()] = int(total)
+
+        assert cumulative["pycommentcleaner.cli"] <= IMPORT_BUDGET_US
+
+    def test_version_wall_time(self):
+        """Test the wall time of a cold --version."""
+        baseline = _best_time("-c", "pass")
+        elapsed = _best_time("-m", "pycommentcleaner.cli", "--version")
+
+        assert elapsed - baseline <= VERSION_BUDGET_S